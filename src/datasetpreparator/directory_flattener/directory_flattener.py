@@ -1,64 +1,76 @@
 import hashlib
-import json
 import logging
-import shutil
-from concurrent.futures import ThreadPoolExecutor
-from multiprocessing import freeze_support
+import queue
+import threading
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from multiprocessing import Manager, freeze_support
 from pathlib import Path
 
 import click
 from tqdm import tqdm
 
+from datasetpreparator.directory_flattener.utils.deduplication import (
+    DeduplicationIndex,
+    calculate_content_hash,
+)
+from datasetpreparator.directory_flattener.utils.manifest import (
+    MANIFEST_FILENAME,
+    FlattenerManifest,
+    ManifestEntry,
+)
+from datasetpreparator.directory_flattener.utils.mapping_writer import (
+    DUPLICATES_FILENAME,
+    MAPPING_FILENAME,
+    MAPPING_JOURNAL_FILENAME,
+    MappingWriter,
+    prune_duplicates,
+)
+from datasetpreparator.directory_flattener.utils.placement import (
+    PLACEMENT_STRATEGIES,
+    place_file,
+    remove_partial_files,
+    resolve_placement,
+)
 from datasetpreparator.utils.logging import initialize_logging
+from datasetpreparator.utils.scandir_walker import list_subdirectories, scandir_walk
 from datasetpreparator.utils.user_prompt import (
     create_directory,
     user_prompt_overwrite_ok,
 )
 
-
-class MultiprocessFlattenArguments:
-    def __init__(
-        self,
-        dir_output_path: Path,
-        maybe_dir: Path,
-        files_with_extension: list[Path],
-    ):
-        self.dir_output_path = dir_output_path
-        self.maybe_dir = maybe_dir
-        self.files_with_extension = files_with_extension
+# Number of files flattened by a worker in a single task:
+FLATTEN_BATCH_SIZE = 256
+# Number of batches that can wait for each of the workers:
+FLATTEN_BATCHES_PER_WORKER = 4
 
 
-class DirectoryCreationArguments:
+class MultiprocessFlattenArguments:
     def __init__(
         self,
         dir_output_path: Path,
         maybe_dir: Path,
-        files_with_extension: list[Path],
+        file_extension: str,
         force_overwrite: bool,
+        hash_mode: str = "path",
+        deduplication_index: DeduplicationIndex | None = None,
+        placement: str = "copy",
+        manifest: FlattenerManifest | None = None,
+        incremental: bool = False,
     ):
         self.dir_output_path = dir_output_path
         self.maybe_dir = maybe_dir
-        self.files_with_extension = files_with_extension
+        self.file_extension = file_extension
         self.force_overwrite = force_overwrite
-
-
-def save_dir_mapping(output_path: Path, dir_mapping: dict) -> None:
-    """
-    Saves a JSON file containing the mapping of the
-    directory structure before it was "flattened".
-
-    Parameters
-    ----------
-    output_path : Path
-        Specifies the path where the mapping will be saved.
-    dir_mapping : dict
-        Specifies the directory mapping dict.
-    """
-
-    path_to_mapping = Path(output_path, "processed_mapping.json").resolve()
-
-    with path_to_mapping.open("w") as json_file:
-        json.dump(dir_mapping, json_file)
+        self.hash_mode = hash_mode
+        self.deduplication_index = deduplication_index
+        self.placement = placement
+        self.manifest = manifest
+        self.incremental = incremental
 
 
 def calculate_file_hash(file_path: Path) -> str:
@@ -84,105 +96,382 @@ def calculate_file_hash(file_path: Path) -> str:
     return path_hash
 
 
-def directory_flatten(
+def flatten_file(
+    file: Path,
     root_directory: Path,
-    list_of_files: list[Path],
     dir_output_path: Path,
-) -> dict[str, str]:
+    hash_mode: str,
+    deduplication_index: DeduplicationIndex | None,
+    placement: str,
+    previous_entry: ManifestEntry | None = None,
+) -> ManifestEntry | None:
     """
-    Flattens a single directory and copies the contents
-    to the specified output directory.
+    Places a single file in the flattened output directory.
 
     Parameters
     ----------
-    list_of_files : list[Path]
-        list of files which were detected to be moved.
+    file : Path
+        Path to the file that will be placed.
+    root_directory : Path
+        Path to the root of the directory that is being flattened.
     dir_output_path : Path
-        Path to the output directory where the files will be copied.
+        Path to the output directory where the file will be placed.
+    hash_mode : str
+        Specifies what is hashed to get the unique filename, "path" or "content".
+    deduplication_index : DeduplicationIndex | None
+        Index shared across all of the flattened directories,
+        required if the hash_mode is set to "content".
+    placement : str
+        Specifies how the file is placed in the output directory.
+    previous_entry : ManifestEntry | None, optional
+        Entry recorded for the file in a previous run, if the file did not change
+        since then, it is not placed again, by default None
 
     Returns
     -------
-    dict[str, str]
-        Returns a directory mapping from the current unique filename
-        to the previous path relative to the root of the not-flattened directory.
+    ManifestEntry | None
+        Returns the entry describing the placed file,
+        or None if the file does not exist.
     """
 
-    # Walk over the directory
-    dir_structure_mapping = {}
-    for file in tqdm(
-        list_of_files,
-        desc=f"Flattening {root_directory.name:<35}",
-        unit="file",
+    # Getting the ReplayPack/directory/structure/file.SC2Replay path,
+    # this is needed to calculate the hash of the filepath:
+    root_dir_name_and_file = root_directory.name / file.relative_to(root_directory)
+    original_path = str(root_dir_name_and_file)
+
+    current_file = Path(root_directory, file).resolve()
+    logging.debug(f"Current file: {str(current_file)}")
+
+    try:
+        file_stat = current_file.stat()
+    except FileNotFoundError:
+        logging.error(f"File does not exist. Path len: {len(str(current_file))}")
+        return None
+
+    # The file did not change since the previous run:
+    if (
+        previous_entry is not None
+        and previous_entry.is_unchanged(
+            size=file_stat.st_size,
+            mtime_ns=file_stat.st_mtime_ns,
+            hash_mode=hash_mode,
+        )
+        and Path(dir_output_path, previous_entry.output_name).exists()
     ):
-        # Getting the ReplayPack/directory/structure/file.SC2Replay path,
-        # this is needed to calculate the hash of the filepath:
-        root_dir_name_and_file = root_directory.name / file.relative_to(root_directory)
+        logging.debug(f"Skipping {original_path}, unchanged since the previous run.")
+        if hash_mode != "content":
+            return previous_entry
+
+        # The owner of the content within the directory has to be claimed again:
+        previous_output_file = Path(dir_output_path, previous_entry.output_name)
+        _, owner_original_path = deduplication_index.claim(
+            key=str(previous_output_file),
+            output_file=previous_output_file,
+            original_path=original_path,
+        )
+        is_owner = owner_original_path == original_path
+        if is_owner == (previous_entry.placement != "duplicate"):
+            return previous_entry
+
+        return ManifestEntry(
+            source=original_path,
+            size=file_stat.st_size,
+            mtime_ns=file_stat.st_mtime_ns,
+            output_name=previous_entry.output_name,
+            hash_mode=hash_mode,
+            placement="copy" if is_owner else "duplicate",
+        )
 
-        # Get unique filename:
+    # Get unique filename:
+    if hash_mode == "content":
+        unique_filename = calculate_content_hash(current_file)
+    else:
         unique_filename = calculate_file_hash(root_dir_name_and_file)
-        original_extension = file.suffix
-        new_path_and_filename = Path(dir_output_path, unique_filename).with_suffix(
-            original_extension
+    original_extension = file.suffix
+    new_path_and_filename = Path(dir_output_path, unique_filename).with_suffix(
+        original_extension
+    )
+    logging.debug(f"New path and filename! {str(new_path_and_filename)}")
+
+    entry = ManifestEntry(
+        source=original_path,
+        size=file_stat.st_size,
+        mtime_ns=file_stat.st_mtime_ns,
+        output_name=new_path_and_filename.name,
+        hash_mode=hash_mode,
+        placement=placement,
+        moved=placement == "move",
+    )
+
+    if hash_mode != "content":
+        entry.placement = place_file(
+            source=current_file,
+            destination=new_path_and_filename,
+            placement=placement,
         )
-        logging.debug(f"New path and filename! {str(new_path_and_filename)}")
+        return entry
 
-        current_file = Path(root_directory, file).resolve()
-        logging.debug(f"Current file: {str(current_file)}")
+    # The same content was already placed in this directory:
+    _, owner_original_path = deduplication_index.claim(
+        key=str(new_path_and_filename),
+        output_file=new_path_and_filename,
+        original_path=original_path,
+    )
+    if owner_original_path != original_path:
+        logging.debug(f"Skipping {original_path}, duplicate of {owner_original_path}")
+        entry.placement = "duplicate"
+        if placement == "move":
+            current_file.unlink()
+        return entry
+
+    # The same content was already placed in another directory:
+    canonical_file, canonical_original_path = deduplication_index.claim(
+        key=unique_filename,
+        output_file=new_path_and_filename,
+        original_path=original_path,
+    )
+    if canonical_original_path == original_path:
+        placed = False
+        try:
+            entry.placement = place_file(
+                source=current_file,
+                destination=new_path_and_filename,
+                placement=placement,
+            )
+            placed = True
+        finally:
+            deduplication_index.complete(key=unique_filename, placed=placed)
+        return entry
+
+    entry.duplicate_of = canonical_original_path
+
+    # Copies do not share the data, other duplicates share it with the first copy
+    # once it is placed, if it could not be placed, the file is placed on its own:
+    if placement == "copy" or not deduplication_index.wait(key=unique_filename):
+        entry.placement = place_file(
+            source=current_file,
+            destination=new_path_and_filename,
+            placement=placement,
+        )
+        return entry
 
-        # Copying files:
-        if not current_file.exists():
-            logging.error(f"File does not exist. Path len: {len(current_file)}")
-            continue
+    entry.placement = place_file(
+        source=canonical_file,
+        destination=new_path_and_filename,
+        placement="hardlink" if placement == "move" else placement,
+        fallback_source=current_file,
+    )
+    if placement == "move":
+        current_file.unlink()
 
-        shutil.copy(current_file, new_path_and_filename)
-        logging.debug(f"File copied to {str(new_path_and_filename)}")
+    return entry
 
-        # Finding the relative path from the root directory to the file:
-        dir_structure_mapping[new_path_and_filename.name] = str(root_dir_name_and_file)
 
-    return dir_structure_mapping
+class FlattenBatchArguments:
+    def __init__(
+        self,
+        root_directory: Path,
+        dir_output_path: Path,
+        files: list[tuple[Path, ManifestEntry | None]],
+        hash_mode: str,
+        deduplication_index: DeduplicationIndex | None,
+        placement: str,
+    ):
+        self.root_directory = root_directory
+        self.dir_output_path = dir_output_path
+        self.files = files
+        self.hash_mode = hash_mode
+        self.deduplication_index = deduplication_index
+        self.placement = placement
 
 
-def multiprocess_directory_flattener(
-    directories_to_process: list[MultiprocessFlattenArguments],
-    n_processes: int,
-) -> list[Path]:
+class DirectoryFlattenJob:
     """
-    Multiprocesses the directory flattening.
+    State of a single directory that is being flattened. The files of the
+    directory are flattened in batches by the workers, and the results of
+    the batches are merged into the directory mapping by the scheduler.
 
     Parameters
     ----------
-    directories_to_process : list[MultiprocessFlattenArguments]
-        list of the arguments corresponding to the directories that will be processed.
-    n_processes : int
-        Number of processes that will be spawned.
+    arguments : MultiprocessFlattenArguments
+        Specifies the arguments as per the MultiprocessFlattenArguments class fields.
+    """
+
+    def __init__(self, arguments: MultiprocessFlattenArguments):
+        self.arguments = arguments
+        self.has_files = False
+        self.discovery_done = False
+        self.submitted_batches = 0
+        self.completed_batches = 0
+        self.mapping_writer: MappingWriter | None = None
+        self.seen_sources: set[str] = set()
+
+    @property
+    def finished(self) -> bool:
+        return self.discovery_done and self.completed_batches == self.submitted_batches
+
+    def get_mapping_writer(self) -> MappingWriter:
+        if self.mapping_writer is None:
+            self.mapping_writer = MappingWriter(
+                output_path=self.arguments.dir_output_path
+            )
+        return self.mapping_writer
+
+    def add_results(self, results: list[tuple[ManifestEntry, bool]]) -> None:
+        """
+        Streams the results of a flattened batch into the directory mapping,
+        the entries that were updated are recorded in the manifest.
+
+        Parameters
+        ----------
+        results : list[tuple[ManifestEntry, bool]]
+            Entries of the flattened files, and flags that specify
+            if the entry was updated in this run.
+        """
+
+        directory_name = self.arguments.maybe_dir.name
+        mapping_writer = self.get_mapping_writer()
+        manifest = self.arguments.manifest
+        for entry, updated in results:
+            if manifest is not None:
+                self.seen_sources.add(entry.source)
+                if updated:
+                    manifest.record(directory_name=directory_name, entry=entry)
+
+            mapping_writer.add(entry=entry)
+        mapping_writer.flush()
+
+
+def flatten_file_batch(
+    arguments: FlattenBatchArguments,
+) -> list[tuple[ManifestEntry, bool]]:
+    """
+    Flattens a batch of files from a single directory.
+
+    Parameters
+    ----------
+    arguments : FlattenBatchArguments
+        Specifies the arguments as per the FlattenBatchArguments class fields.
 
     Returns
     -------
-    list[Path]
-        Returns a list of paths to the output directories.
+    list[tuple[ManifestEntry, bool]]
+        Returns the entries of the flattened files, and flags that specify
+        if the entry was updated, or if it was unchanged since the previous run.
     """
 
-    with ThreadPoolExecutor(
-        max_workers=n_processes,
-        initializer=tqdm.set_lock,
-        initargs=(tqdm.get_lock(),),
-    ) as executor:
-        results = list(executor.map(flatten_save_dir_mapping, directories_to_process))
+    results = []
+    for file, previous_entry in arguments.files:
+        entry = flatten_file(
+            file=file,
+            root_directory=arguments.root_directory,
+            dir_output_path=arguments.dir_output_path,
+            hash_mode=arguments.hash_mode,
+            deduplication_index=arguments.deduplication_index,
+            placement=arguments.placement,
+            previous_entry=previous_entry,
+        )
+        if entry is None:
+            continue
+
+        results.append((entry, entry is not previous_entry))
 
-    return list(results)
+    return results
 
 
-def flatten_save_dir_mapping(
-    arguments: MultiprocessFlattenArguments,
-) -> Path:
+def discover_directory(
+    job: DirectoryFlattenJob,
+    executor: Executor,
+    batch_slots: threading.Semaphore,
+    completed: queue.Queue,
+) -> bool:
     """
-    Flattens the directory and saves the mapping.
+    Walks the directory and submits the discovered files to the workers in
+    batches, so the flattening starts as soon as the first batch is found.
+    The output directory is created when the first file is found.
 
     Parameters
     ----------
-    arguments : MultiprocessFlattenArguments
-        Specifies the arguments as per the MultiprocessFlattenArguments class fields.
+    job : DirectoryFlattenJob
+        Job of the directory that will be walked.
+    executor : Executor
+        Executor whose workers flatten the batches.
+    batch_slots : threading.Semaphore
+        Limits the number of batches that are submitted and not yet merged.
+    completed : queue.Queue
+        Queue that receives the batches that were flattened.
+
+    Returns
+    -------
+    bool
+        Returns True if the directory contained any files with the selected extension.
+    """
+
+    arguments = job.arguments
+    previous_entries = {}
+    if arguments.manifest is not None and arguments.incremental:
+        previous_entries = arguments.manifest.get_directory(
+            directory_name=arguments.maybe_dir.name
+        )
+
+    def submit_batch(files: list[tuple[Path, ManifestEntry | None]]) -> None:
+        batch_slots.acquire()
+        job.submitted_batches += 1
+        future = executor.submit(
+            flatten_file_batch,
+            FlattenBatchArguments(
+                root_directory=arguments.maybe_dir,
+                dir_output_path=arguments.dir_output_path,
+                files=files,
+                hash_mode=arguments.hash_mode,
+                deduplication_index=arguments.deduplication_index,
+                placement=placement,
+            ),
+        )
+
+        def batch_done(batch_future: Future) -> None:
+            batch_slots.release()
+            completed.put((job, batch_future, False))
+
+        future.add_done_callback(batch_done)
+
+    placement = arguments.placement
+    batch = []
+    for entry in scandir_walk(
+        root_directory=arguments.maybe_dir,
+        file_extension=arguments.file_extension,
+    ):
+        if not job.has_files:
+            create_output_directory(arguments=arguments)
+            placement = resolve_placement(
+                placement=arguments.placement,
+                source_directory=arguments.maybe_dir,
+                destination_directory=arguments.dir_output_path,
+            )
+            job.has_files = True
+
+        file = Path(entry.path)
+        source = str(arguments.maybe_dir.name / file.relative_to(arguments.maybe_dir))
+        batch.append((file, previous_entries.get(source)))
+        if len(batch) >= FLATTEN_BATCH_SIZE:
+            submit_batch(files=batch)
+            batch = []
+
+    if batch:
+        submit_batch(files=batch)
+
+    return job.has_files
+
+
+def finalize_directory(job: DirectoryFlattenJob) -> Path:
+    """
+    Finishes the flattening of a directory once all of its batches were merged.
+    Prunes the files that are gone and saves the mapping.
+
+    Parameters
+    ----------
+    job : DirectoryFlattenJob
+        Job of the directory that was flattened.
 
     Returns
     -------
@@ -190,40 +479,116 @@ def flatten_save_dir_mapping(
         Returns the path to the output directory.
     """
 
-    dir_structure_mapping = directory_flatten(
-        root_directory=arguments.maybe_dir,
-        list_of_files=arguments.files_with_extension,
-        dir_output_path=arguments.dir_output_path,
-    )
+    arguments = job.arguments
+    mapping_writer = job.get_mapping_writer()
+    if arguments.manifest is not None:
+        retained_entries = arguments.manifest.prune_directory(
+            directory_name=arguments.maybe_dir.name,
+            seen_sources=job.seen_sources,
+            dir_output_path=arguments.dir_output_path,
+        )
+        for entry in retained_entries:
+            mapping_writer.add(entry=entry)
 
-    save_dir_mapping(
-        output_path=arguments.dir_output_path,
-        dir_mapping=dir_structure_mapping,
-    )
+    mapping_writer.finalize()
 
     return arguments.dir_output_path
 
 
-def create_output_directory(
-    arguments: DirectoryCreationArguments,
-) -> MultiprocessFlattenArguments:
+def multiprocess_directory_flattener(
+    directories_to_process: list[MultiprocessFlattenArguments],
+    n_processes: int,
+    backend: str = "thread",
+) -> list[Path]:
     """
-    Creates the output directory if it doesn't exist.
-    Returns the arguments for the directory flattening.
+    Multiprocesses the directory flattening. The directories are walked in
+    parallel and the discovered files are split into batches which are placed
+    in a single shared queue. Idle workers take the next batch regardless of
+    the directory it came from, so a single large directory is flattened
+    by all of the workers. The results of the batches are merged
+    into the per-directory mappings.
 
     Parameters
     ----------
-    arguments : DirectoryCreationArguments
-        Specifies the arguments as per the DirectoryCreationArguments class fields.
-        These arguments are used to create the output directory.
+    directories_to_process : list[MultiprocessFlattenArguments]
+        list of the arguments corresponding to the directories that will be processed.
+    n_processes : int
+        Number of workers that will be spawned.
+    backend : str, optional
+        Specifies if the workers are threads or processes, by default "thread".
 
     Returns
     -------
-    MultiprocessFlattenArguments
-        Returns the arguments for the directory flattening.
+    list[Path]
+        Returns a list of paths to the output directories,
+        directories without any files with the selected extension are omitted.
+    """
+
+    executor_class = ProcessPoolExecutor if backend == "process" else ThreadPoolExecutor
+    completed = queue.Queue()
+    batch_slots = threading.Semaphore(FLATTEN_BATCHES_PER_WORKER * n_processes)
+    jobs = [
+        DirectoryFlattenJob(arguments=arguments) for arguments in directories_to_process
+    ]
+
+    with (
+        executor_class(max_workers=n_processes) as executor,
+        ThreadPoolExecutor(max_workers=n_processes) as discovery_executor,
+        tqdm(desc="Flattening", unit="file") as progress_bar,
+    ):
+        for job in jobs:
+            future = discovery_executor.submit(
+                discover_directory, job, executor, batch_slots, completed
+            )
+            future.add_done_callback(
+                lambda discovery_future, job=job: completed.put(
+                    (job, discovery_future, True)
+                )
+            )
+
+        n_pending_jobs = len(jobs)
+        while n_pending_jobs:
+            job, future, is_discovery = completed.get()
+            if is_discovery:
+                job.discovery_done = True
+                if not future.result():
+                    logging.debug(
+                        f"Skipping {str(job.arguments.maybe_dir)}, no files with selected extension."
+                    )
+                    n_pending_jobs -= 1
+                    continue
+            else:
+                job.completed_batches += 1
+                results = future.result()
+                job.add_results(results=results)
+                progress_bar.update(len(results))
+
+            if job.finished:
+                finalize_directory(job=job)
+                n_pending_jobs -= 1
+
+    return [job.arguments.dir_output_path for job in jobs if job.has_files]
+
+
+def create_output_directory(
+    arguments: MultiprocessFlattenArguments,
+) -> None:
+    """
+    Creates the output directory if it doesn't exist.
+
+    Parameters
+    ----------
+    arguments : MultiprocessFlattenArguments
+        Specifies the arguments as per the MultiprocessFlattenArguments class fields.
+        These arguments are used to create the output directory.
     """
 
-    if user_prompt_overwrite_ok(
+    # Incremental runs update the output directories of the previous runs:
+    if (
+        arguments.incremental
+        and arguments.manifest is not None
+        and arguments.manifest.has_directory(directory_name=arguments.maybe_dir.name)
+    ) or user_prompt_overwrite_ok(
         path=arguments.dir_output_path,
         force_overwrite=arguments.force_overwrite,
     ):
@@ -232,11 +597,37 @@ def create_output_directory(
         )
         arguments.dir_output_path.mkdir(exist_ok=True)
 
-    return MultiprocessFlattenArguments(
-        dir_output_path=arguments.dir_output_path,
-        maybe_dir=arguments.maybe_dir,
-        files_with_extension=arguments.files_with_extension,
+
+def remove_flattened_directory(
+    manifest: FlattenerManifest,
+    dir_output_path: Path,
+) -> None:
+    """
+    Removes the output of a directory that is no longer present in the input.
+
+    Parameters
+    ----------
+    manifest : FlattenerManifest
+        Manifest holding the entries of the flattened directory.
+    dir_output_path : Path
+        Path to the flattened output directory.
+    """
+
+    logging.info(f"Source of {str(dir_output_path)} is gone, removing its output.")
+    retained_entries = manifest.prune_directory(
+        directory_name=dir_output_path.name,
+        seen_sources=set(),
+        dir_output_path=dir_output_path,
     )
+    if retained_entries:
+        return
+
+    del manifest.entries[dir_output_path.name]
+    Path(dir_output_path, MAPPING_FILENAME).unlink(missing_ok=True)
+    Path(dir_output_path, MAPPING_JOURNAL_FILENAME).unlink(missing_ok=True)
+    Path(dir_output_path, DUPLICATES_FILENAME).unlink(missing_ok=True)
+    if dir_output_path.exists() and not any(dir_output_path.iterdir()):
+        dir_output_path.rmdir()
 
 
 def multiple_directory_flattener(
@@ -245,6 +636,10 @@ def multiple_directory_flattener(
     file_extension: str,
     n_threads: int,
     force_overwrite: bool,
+    hash_mode: str = "path",
+    placement: str = "copy",
+    incremental: bool = False,
+    backend: str = "thread",
 ) -> tuple[bool, list[Path]]:
     """
     Provides the main logic for "directory flattening".
@@ -266,11 +661,31 @@ def multiple_directory_flattener(
     file_extension : str
         Specifies extension for which the detected files will be brought \
         up to the top level of the "flattened" directory
-    n_processes : int
-        Specifies the number of processes that will be spawned.
+    n_threads : int
+        Specifies the number of workers that will be spawned.
     force : bool
         Specifies if the user wants to overwrite the output directory without \
         being prompted.
+    hash_mode : str, optional
+        Specifies what is hashed to get the unique filenames, either "path" or \
+        "content", by default "path". In "content" mode the duplicated files \
+        are written once across all of the directories.
+    placement : str, optional
+        Specifies how the files are placed in the output directories, \
+        one of "copy", "hardlink", "reflink", "symlink" or "move", by default "copy". \
+        Hardlinks and reflinks fall back to copying if the input and output \
+        are on different devices.
+    incremental : bool, optional
+        Specifies if only the new or changed files should be placed, by default False. \
+        Incremental runs record every placed file in a manifest stored in the output \
+        path, so the following incremental runs skip the files that did not change since \
+        they were recorded, delete the outputs of the files that are gone, \
+        and resume the runs that were interrupted. The output directories \
+        recorded in the manifest are updated without the overwrite prompt.
+    backend : str, optional
+        Specifies if the files are flattened by a pool of threads or \
+        processes, by default "thread". Both split the work at the file level, \
+        so all of the workers are busy even if the directory sizes are skewed.
 
     Returns
     -------
@@ -289,51 +704,102 @@ def multiple_directory_flattener(
         logging.error(f"Input path must exist! {str(input_path.resolve())}")
         return (False, [Path()])
 
-    # Output path must be an existing directory:
-    if user_prompt_overwrite_ok(path=output_path, force_overwrite=force_overwrite):
-        output_path.mkdir(exist_ok=True)
-
-    directories_to_create = []
-
-    # Iterate over directories:
-    # TODO: this can be sped up:
-    directory_contants = list(input_path.iterdir())
-    for item in tqdm(
-        directory_contants,
-        desc="Creating output directories",
-        unit="dir",
+    # Output path must be an existing directory,
+    # incremental runs update the output of the previous runs:
+    if (incremental and Path(output_path, MANIFEST_FILENAME).exists()) or (
+        user_prompt_overwrite_ok(path=output_path, force_overwrite=force_overwrite)
     ):
-        maybe_dir = Path(input_path, item).resolve()
-        if not maybe_dir.is_dir():
-            logging.debug(f"Skipping {str(maybe_dir)}, not a directory.")
-            continue
+        output_path.mkdir(exist_ok=True)
 
-        files_with_extension = list(maybe_dir.glob(f"**/*{file_extension}"))
-        if not files_with_extension:
-            logging.debug(
-                f"Skipping {str(maybe_dir)}, no files with selected extension."
+    # Only the incremental runs record the placed files, the manifest
+    # of the previous runs would go stale in the other runs:
+    manifest = None
+    if incremental:
+        manifest = FlattenerManifest.load(output_path=output_path)
+    else:
+        Path(output_path, MANIFEST_FILENAME).unlink(missing_ok=True)
+
+    # Worker processes share the deduplication index through a manager process:
+    manager = None
+    deduplication_index = None
+    if hash_mode == "content":
+        if backend == "process":
+            manager = Manager()
+            deduplication_index = DeduplicationIndex(
+                index=manager.dict(), completed=manager.dict()
             )
-            continue
-
-        dir_output_path = Path(output_path, item.name).resolve()
-        directories_to_create.append(
-            DirectoryCreationArguments(
+        else:
+            deduplication_index = DeduplicationIndex()
+
+    if deduplication_index is not None and incremental:
+        # Contents placed in the previous runs are linked instead of written again:
+        previous_claims = {}
+        for directory_name, directory_entries in manifest.entries.items():
+            for entry in directory_entries.values():
+                if entry.hash_mode != "content" or entry.placement == "duplicate":
+                    continue
+                previous_claims.setdefault(
+                    Path(entry.output_name).stem,
+                    (
+                        str(Path(output_path, directory_name, entry.output_name)),
+                        entry.source,
+                    ),
+                )
+        deduplication_index.seed(claims=previous_claims)
+
+    directories_to_process = []
+
+    # Iterate over directories, the files within are discovered by the workers:
+    input_directories = list_subdirectories(input_path=input_path)
+    for maybe_dir in input_directories:
+        dir_output_path = Path(output_path, maybe_dir.name).resolve()
+        # Copies of an interrupted run are placed again:
+        remove_partial_files(directory=dir_output_path)
+        directories_to_process.append(
+            MultiprocessFlattenArguments(
                 dir_output_path=dir_output_path,
-                maybe_dir=maybe_dir,
-                files_with_extension=files_with_extension,
+                maybe_dir=maybe_dir.resolve(),
+                file_extension=file_extension,
                 force_overwrite=force_overwrite,
+                hash_mode=hash_mode,
+                deduplication_index=deduplication_index,
+                placement=placement,
+                manifest=manifest,
+                incremental=incremental,
             )
         )
 
-    with ThreadPoolExecutor(max_workers=n_threads) as executor:
-        multiprocess_flatten_arguments = list(
-            executor.map(create_output_directory, directories_to_create)
+    try:
+        output_directories = multiprocess_directory_flattener(
+            directories_to_process=directories_to_process,
+            n_processes=n_threads,
+            backend=backend,
         )
+    finally:
+        if manager is not None:
+            manager.shutdown()
 
-    output_directories = multiprocess_directory_flattener(
-        directories_to_process=multiprocess_flatten_arguments,
-        n_processes=n_threads,
-    )
+    if manifest is None:
+        return (True, output_directories)
+
+    # Directories that were removed from the input entirely:
+    input_directory_names = {maybe_dir.name for maybe_dir in input_directories}
+    for directory_name in list(manifest.entries):
+        if directory_name in input_directory_names:
+            continue
+        remove_flattened_directory(
+            manifest=manifest,
+            dir_output_path=Path(output_path, directory_name).resolve(),
+        )
+
+    # Duplicates can refer to the sources of other directories that are gone:
+    for directory_name in manifest.entries:
+        prune_duplicates(
+            dir_output_path=Path(output_path, directory_name).resolve(),
+            is_live_source=manifest.has_source,
+        )
+
+    manifest.compact()
 
     return (True, output_directories)
 
@@ -377,7 +843,35 @@ def multiple_directory_flattener(
     type=int,
     default=1,
     required=False,
-    help="Number of threads to use for directory flattening.",
+    help="Number of threads or processes to use for directory flattening.",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(["thread", "process"], case_sensitive=False),
+    default="thread",
+    required=False,
+    help="Specifies if the files are flattened by a pool of threads or processes. Default is 'thread'.",
+)
+@click.option(
+    "--hash_mode",
+    type=click.Choice(["path", "content"], case_sensitive=False),
+    default="path",
+    required=False,
+    help="Specifies what is hashed to get the unique filenames. 'path' hashes the original filepath, 'content' hashes the file contents, writes every duplicated file once per directory and links the duplicates found in other directories to the first copy with the selected placement, unless the files are copied. Default is 'path'.",
+)
+@click.option(
+    "--placement",
+    type=click.Choice(PLACEMENT_STRATEGIES, case_sensitive=False),
+    default="copy",
+    required=False,
+    help="Specifies how the files are placed in the output directories. 'hardlink', 'reflink' and 'move' avoid rewriting the data when the input and output are on the same device, otherwise the files are copied. 'move' removes the files from the input directory. Default is 'copy'.",
+)
+@click.option(
+    "--incremental",
+    type=bool,
+    default=False,
+    required=False,
+    help="Flag that specifies if only the new or changed files should be placed. Uses the manifest stored in the output path to skip unchanged files, delete the outputs of files that are gone, and resume interrupted runs. The output directories written by the previous runs are updated without the overwrite prompt. Default is False.",
 )
 @click.option(
     "--force_overwrite",
@@ -397,6 +891,10 @@ def main(
     output_path: Path,
     file_extension: str,
     n_threads: int,
+    backend: str,
+    hash_mode: str,
+    placement: str,
+    incremental: bool,
     log: str,
     force_overwrite: bool,
 ) -> None:
@@ -409,6 +907,10 @@ def main(
         file_extension=file_extension,
         n_threads=n_threads,
         force_overwrite=force_overwrite,
+        hash_mode=hash_mode.lower(),
+        placement=placement.lower(),
+        incremental=incremental,
+        backend=backend.lower(),
     )
 
 
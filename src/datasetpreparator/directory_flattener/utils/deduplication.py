@@ -0,0 +1,150 @@
+import hashlib
+import time
+from collections.abc import MutableMapping
+from pathlib import Path
+
+# Interval in seconds between the checks if the owner of a key placed its file:
+WAIT_POLL_INTERVAL = 0.01
+
+
+def calculate_content_hash(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Calculates the BLAKE2b hash of the file contents. The file is read in chunks
+    into a single reusable buffer, so the memory usage does not depend on the file size.
+
+    Parameters
+    ----------
+    file_path : Path
+        Path to the file which will be hashed.
+    chunk_size : int, optional
+        Specifies the size of the chunks in bytes, by default 1024 * 1024
+
+    Returns
+    -------
+    str
+        Returns the hex digest of the file contents.
+    """
+
+    content_hash = hashlib.blake2b(digest_size=16)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with file_path.open("rb") as input_file:
+        while bytes_read := input_file.readinto(buffer):
+            content_hash.update(view[:bytes_read])
+
+    return content_hash.hexdigest()
+
+
+class DeduplicationIndex:
+    """
+    Index of the files that were already placed in the output, shared across all
+    of the flattened directories. Claims are performed with a single
+    setdefault call, so the first claim of a key always wins, even when
+    multiple workers are flattening at the same time. Owners record when
+    their file was placed, so the other claimants can wait before linking to it.
+
+    Parameters
+    ----------
+    index : MutableMapping | None, optional
+        Mapping used to store the claims, by default a new dict is created.
+    completed : MutableMapping | None, optional
+        Mapping used to store the keys whose owner finished placing its file,
+        by default a new dict is created.
+    """
+
+    def __init__(
+        self,
+        index: MutableMapping | None = None,
+        completed: MutableMapping | None = None,
+    ):
+        self.index = {} if index is None else index
+        self.completed = {} if completed is None else completed
+
+    def claim(
+        self,
+        key: str,
+        output_file: Path,
+        original_path: str,
+    ) -> tuple[Path, str]:
+        """
+        Claims the key for the output file.
+
+        Parameters
+        ----------
+        key : str
+            Key that is claimed, either a content hash or an output filepath.
+        output_file : Path
+            Path to the output file that will hold the content.
+        original_path : str
+            Original path of the file relative to the root of the not-flattened directory.
+
+        Returns
+        -------
+        tuple[Path, str]
+            Returns the output file and the original path of the first claim.
+            If these are equal to the arguments, the key was claimed by the caller.
+        """
+
+        owner_output_file, owner_original_path = self.index.setdefault(
+            key, (str(output_file), original_path)
+        )
+
+        return Path(owner_output_file), owner_original_path
+
+    def complete(self, key: str, placed: bool) -> None:
+        """
+        Records that the owner of the key finished placing its output file.
+
+        Parameters
+        ----------
+        key : str
+            Key that was claimed by the caller.
+        placed : bool
+            Specifies if the output file was placed successfully.
+        """
+
+        self.completed[key] = placed
+
+    def wait(self, key: str, poll_interval: float = WAIT_POLL_INTERVAL) -> bool:
+        """
+        Waits until the owner of the key finished placing its output file.
+        The owner is placing its file as soon as the key is claimed,
+        so the wait is bounded by a single placement. The mapping is polled,
+        because a mapping shared through a manager process cannot notify the waiting workers.
+
+        Parameters
+        ----------
+        key : str
+            Key that was claimed by another caller.
+        poll_interval : float, optional
+            Interval in seconds between the checks, by default WAIT_POLL_INTERVAL
+
+        Returns
+        -------
+        bool
+            Returns True if the output file of the owner was placed, False otherwise.
+        """
+
+        while (placed := self.completed.get(key)) is None:
+            time.sleep(poll_interval)
+
+        return placed
+
+    def seed(self, claims: dict[str, tuple[str, str]]) -> None:
+        """
+        Adds the claims that were made before the index was created,
+        for example in the previous runs. Existing claims are not overridden,
+        the added claims are already completed.
+
+        Parameters
+        ----------
+        claims : dict[str, tuple[str, str]]
+            Claims mapping the key to the output file and the original path.
+        """
+
+        existing_keys = set(self.index.keys())
+        new_claims = {
+            key: claim for key, claim in claims.items() if key not in existing_keys
+        }
+        self.index.update(new_claims)
+        self.completed.update(dict.fromkeys(new_claims, True))
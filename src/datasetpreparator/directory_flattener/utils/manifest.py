@@ -0,0 +1,323 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+MANIFEST_FILENAME = ".directory_flattener_manifest.jsonl"
+
+
+class ManifestEntry:
+    """
+    State of a single source file that was flattened.
+
+    Parameters
+    ----------
+    source : str
+        Path of the source file relative to the root of the not-flattened directory,
+        including the name of the directory.
+    size : int
+        Size of the source file in bytes.
+    mtime_ns : int
+        Modification time of the source file in nanoseconds.
+    output_name : str
+        Name of the file within the flattened output directory.
+    hash_mode : str
+        Hash mode that was used to get the output name.
+    placement : str
+        Placement strategy that was used, or "duplicate" if the source
+        was not placed because the same content was already in the output directory.
+    duplicate_of : str | None, optional
+        Source of the file holding the same content in another directory, by default None
+    moved : bool, optional
+        Specifies if the source was removed when it was placed, by default False
+    """
+
+    def __init__(
+        self,
+        source: str,
+        size: int,
+        mtime_ns: int,
+        output_name: str,
+        hash_mode: str,
+        placement: str,
+        duplicate_of: str | None = None,
+        moved: bool = False,
+    ):
+        self.source = source
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.output_name = output_name
+        self.hash_mode = hash_mode
+        self.placement = placement
+        self.duplicate_of = duplicate_of
+        self.moved = moved
+
+    def is_unchanged(self, size: int, mtime_ns: int, hash_mode: str) -> bool:
+        """
+        Checks if the source file is the same as when it was flattened.
+
+        Parameters
+        ----------
+        size : int
+            Current size of the source file in bytes.
+        mtime_ns : int
+            Current modification time of the source file in nanoseconds.
+        hash_mode : str
+            Hash mode of the current run.
+
+        Returns
+        -------
+        bool
+            True if the source file did not change, False otherwise.
+        """
+
+        return (
+            self.size == size
+            and self.mtime_ns == mtime_ns
+            and self.hash_mode == hash_mode
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "output_name": self.output_name,
+            "hash_mode": self.hash_mode,
+            "placement": self.placement,
+            "duplicate_of": self.duplicate_of,
+            "moved": self.moved,
+        }
+
+    @staticmethod
+    def from_dict(entry: dict) -> "ManifestEntry":
+        return ManifestEntry(
+            source=entry["source"],
+            size=entry["size"],
+            mtime_ns=entry["mtime_ns"],
+            output_name=entry["output_name"],
+            hash_mode=entry["hash_mode"],
+            placement=entry["placement"],
+            duplicate_of=entry.get("duplicate_of"),
+            moved=entry.get("moved", False),
+        )
+
+
+class FlattenerManifest:
+    """
+    Persistent manifest of all of the flattened files, stored as an append-only
+    JSON Lines journal in the output path. Every placed file is appended
+    as soon as it is placed, so an interrupted run can be resumed.
+    The journal is compacted at the end of the run.
+
+    Parameters
+    ----------
+    manifest_path : Path
+        Path to the manifest file.
+    """
+
+    def __init__(self, manifest_path: Path):
+        self.manifest_path = manifest_path
+        self.entries: dict[str, dict[str, ManifestEntry]] = {}
+        self.replaced_output_names: dict[str, set[str]] = {}
+        self.lock = threading.Lock()
+        self.journal = None
+
+    @staticmethod
+    def load(output_path: Path) -> "FlattenerManifest":
+        """
+        Loads the manifest from the output path. Later lines of the journal
+        override the earlier ones, a truncated last line left by an interrupted
+        run is skipped.
+
+        Parameters
+        ----------
+        output_path : Path
+            Output path of the directory flattener.
+
+        Returns
+        -------
+        FlattenerManifest
+            Returns the loaded manifest, empty if it did not exist.
+        """
+
+        manifest = FlattenerManifest(
+            manifest_path=Path(output_path, MANIFEST_FILENAME).resolve()
+        )
+        if not manifest.manifest_path.exists():
+            return manifest
+
+        with manifest.manifest_path.open("r", encoding="utf-8") as manifest_file:
+            for line in manifest_file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(
+                        f"Skipping malformed manifest line in {str(manifest.manifest_path)}"
+                    )
+                    continue
+
+                entry = ManifestEntry.from_dict(record["entry"])
+                manifest.entries.setdefault(record["directory"], {})[entry.source] = (
+                    entry
+                )
+
+        return manifest
+
+    def get_directory(self, directory_name: str) -> dict[str, ManifestEntry]:
+        """
+        Returns a snapshot of the entries recorded for a directory.
+
+        Parameters
+        ----------
+        directory_name : str
+            Name of the flattened directory.
+
+        Returns
+        -------
+        dict[str, ManifestEntry]
+            Returns the entries keyed by their source.
+        """
+
+        return dict(self.entries.get(directory_name, {}))
+
+    def has_directory(self, directory_name: str) -> bool:
+        """
+        Checks if any of the files of a directory are recorded in the manifest.
+
+        Parameters
+        ----------
+        directory_name : str
+            Name of the flattened directory.
+
+        Returns
+        -------
+        bool
+            True if the directory was flattened before, False otherwise.
+        """
+
+        with self.lock:
+            return bool(self.entries.get(directory_name))
+
+    def has_source(self, source: str) -> bool:
+        """
+        Checks if a source file is recorded in the manifest.
+
+        Parameters
+        ----------
+        source : str
+            Path of the source file relative to the root of the not-flattened
+            directory, including the name of the directory.
+
+        Returns
+        -------
+        bool
+            True if the source is recorded, False otherwise.
+        """
+
+        directory_name = Path(source).parts[0]
+        with self.lock:
+            return source in self.entries.get(directory_name, {})
+
+    def record(self, directory_name: str, entry: ManifestEntry) -> None:
+        """
+        Records the entry and appends it to the journal.
+
+        Parameters
+        ----------
+        directory_name : str
+            Name of the flattened directory.
+        entry : ManifestEntry
+            Entry that will be recorded.
+        """
+
+        line = json.dumps({"directory": directory_name, "entry": entry.to_dict()})
+        with self.lock:
+            directory_entries = self.entries.setdefault(directory_name, {})
+            previous_entry = directory_entries.get(entry.source)
+            if previous_entry and previous_entry.output_name != entry.output_name:
+                self.replaced_output_names.setdefault(directory_name, set()).add(
+                    previous_entry.output_name
+                )
+            directory_entries[entry.source] = entry
+
+            if self.journal is None:
+                self.journal = self.manifest_path.open("a", encoding="utf-8")
+            self.journal.write(line + "\n")
+            self.journal.flush()
+
+    def prune_directory(
+        self,
+        directory_name: str,
+        seen_sources: set[str],
+        dir_output_path: Path,
+    ) -> list[ManifestEntry]:
+        """
+        Removes the entries whose source is gone and deletes
+        the output files that are no longer referenced by any entry.
+        Entries of the sources that were moved are retained
+        as long as their output file exists.
+
+        Parameters
+        ----------
+        directory_name : str
+            Name of the flattened directory.
+        seen_sources : set[str]
+            Sources that were found in the current run.
+        dir_output_path : Path
+            Path to the flattened output directory.
+
+        Returns
+        -------
+        list[ManifestEntry]
+            Returns the retained entries whose source was moved.
+        """
+
+        with self.lock:
+            directory_entries = self.entries.get(directory_name, {})
+            retained_entries = []
+            stale_output_names = self.replaced_output_names.pop(directory_name, set())
+            for source, entry in list(directory_entries.items()):
+                if source in seen_sources:
+                    continue
+
+                if entry.moved and Path(dir_output_path, entry.output_name).exists():
+                    retained_entries.append(entry)
+                    continue
+
+                logging.debug(f"Source {source} is gone, removing from the manifest.")
+                stale_output_names.add(entry.output_name)
+                del directory_entries[source]
+
+            live_output_names = {
+                entry.output_name for entry in directory_entries.values()
+            }
+
+        for output_name in stale_output_names - live_output_names:
+            logging.debug(f"Deleting {output_name}, the source is gone.")
+            Path(dir_output_path, output_name).unlink(missing_ok=True)
+
+        return retained_entries
+
+    def compact(self) -> None:
+        """
+        Rewrites the journal so that it holds a single line per entry.
+        The new manifest atomically replaces the journal.
+        """
+
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+
+            temporary_path = self.manifest_path.with_name(
+                f"{self.manifest_path.name}.tmp"
+            )
+            with temporary_path.open("w", encoding="utf-8") as manifest_file:
+                for directory_name, directory_entries in self.entries.items():
+                    for entry in directory_entries.values():
+                        record = {"directory": directory_name, "entry": entry.to_dict()}
+                        manifest_file.write(json.dumps(record) + "\n")
+
+            os.replace(temporary_path, self.manifest_path)
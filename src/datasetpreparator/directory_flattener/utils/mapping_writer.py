@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+from datasetpreparator.directory_flattener.utils.manifest import ManifestEntry
+
+MAPPING_FILENAME = "processed_mapping.json"
+MAPPING_JOURNAL_FILENAME = "processed_mapping.jsonl"
+DUPLICATES_FILENAME = "duplicate_mapping.json"
+
+
+def write_duplicates(duplicates_path: Path, duplicates: dict[str, list[str]]) -> None:
+    """
+    Atomically replaces the duplicates file, or removes it if there are
+    no duplicates.
+
+    Parameters
+    ----------
+    duplicates_path : Path
+        Path to the duplicates file.
+    duplicates : dict[str, list[str]]
+        Original paths of the duplicates, keyed by the name of the flattened file.
+    """
+
+    if not duplicates:
+        duplicates_path.unlink(missing_ok=True)
+        return
+
+    temporary_path = duplicates_path.with_name(f"{duplicates_path.name}.tmp")
+    with temporary_path.open("w", encoding="utf-8") as json_file:
+        json.dump(duplicates, json_file)
+    os.replace(temporary_path, duplicates_path)
+
+
+def prune_duplicates(
+    dir_output_path: Path,
+    is_live_source: Callable[[str], bool],
+) -> None:
+    """
+    Removes the references to the duplicates whose source is gone, e.g. the first
+    copy of the content was in another directory that was removed from the input.
+
+    Parameters
+    ----------
+    dir_output_path : Path
+        Path to the flattened output directory.
+    is_live_source : Callable[[str], bool]
+        Function that checks if an original path is still flattened.
+    """
+
+    duplicates_path = Path(dir_output_path, DUPLICATES_FILENAME)
+    if not duplicates_path.exists():
+        return
+
+    with duplicates_path.open("r", encoding="utf-8") as json_file:
+        duplicates: dict[str, list[str]] = json.load(json_file)
+
+    live_duplicates = {}
+    for output_name, sources in duplicates.items():
+        live_sources = [source for source in sources if is_live_source(source)]
+        if live_sources:
+            live_duplicates[output_name] = live_sources
+
+    if live_duplicates != duplicates:
+        write_duplicates(duplicates_path=duplicates_path, duplicates=live_duplicates)
+
+
+def convert_mapping_journal(output_path: Path) -> Path | None:
+    """
+    Converts the journal of the mapping into processed_mapping.json,
+    which atomically replaces the previous mapping. The mapping is streamed
+    from the journal, only the duplicates are collected in memory to be
+    written to duplicate_mapping.json. Also recovers the partial mapping
+    from the journal of an interrupted run, a truncated last line
+    of the journal is skipped.
+
+    Parameters
+    ----------
+    output_path : Path
+        Path to the flattened output directory.
+
+    Returns
+    -------
+    Path | None
+        Returns the path to the saved mapping, or None if there is no journal.
+    """
+
+    mapping_path = Path(output_path, MAPPING_FILENAME).resolve()
+    journal_path = Path(output_path, MAPPING_JOURNAL_FILENAME).resolve()
+    if not journal_path.exists():
+        return None
+
+    duplicates: dict[str, list[str]] = {}
+    temporary_path = mapping_path.with_name(f"{MAPPING_FILENAME}.tmp")
+    with (
+        journal_path.open("r", encoding="utf-8") as journal_file,
+        temporary_path.open("w", encoding="utf-8") as json_file,
+    ):
+        separator = ""
+        json_file.write("{")
+        for line in journal_file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(
+                    f"Skipping malformed mapping line in {str(journal_path)}"
+                )
+                continue
+
+            if "duplicate" in record:
+                duplicates.setdefault(record["output_name"], []).append(
+                    record["duplicate"]
+                )
+            if "source" not in record:
+                continue
+
+            json_file.write(
+                f"{separator}{json.dumps(record['output_name'])}: {json.dumps(record['source'])}"
+            )
+            separator = ", "
+
+        json_file.write("}")
+
+    os.replace(temporary_path, mapping_path)
+    write_duplicates(
+        duplicates_path=Path(output_path, DUPLICATES_FILENAME).resolve(),
+        duplicates=duplicates,
+    )
+    journal_path.unlink()
+
+    return mapping_path
+
+
+class MappingWriter:
+    """
+    Streams the mapping of the directory structure before it was "flattened"
+    to disk. The entries are appended to a JSON Lines journal as soon as the
+    files are placed, so the memory usage does not grow with the number of
+    files and an interrupted run leaves a usable partial mapping.
+    Once the directory is flattened, the journal is converted into
+    processed_mapping.json, which atomically replaces the previous mapping,
+    the journal of an interrupted run is converted with convert_mapping_journal.
+    The original paths of the duplicated files are written separately
+    to duplicate_mapping.json, so the mapping holds only the flattened files.
+
+    Parameters
+    ----------
+    output_path : Path
+        Specifies the path where the mapping will be saved.
+    """
+
+    def __init__(self, output_path: Path):
+        self.output_path = output_path
+        self.journal_path = Path(output_path, MAPPING_JOURNAL_FILENAME).resolve()
+        self.journal = self.journal_path.open("w", encoding="utf-8")
+
+    def add(self, entry: ManifestEntry) -> None:
+        """
+        Appends the flattened file to the journal.
+
+        Parameters
+        ----------
+        entry : ManifestEntry
+            Entry describing the flattened file.
+        """
+
+        if entry.placement == "duplicate":
+            record = {"output_name": entry.output_name, "duplicate": entry.source}
+        else:
+            record = {"output_name": entry.output_name, "source": entry.source}
+            if entry.duplicate_of:
+                record["duplicate"] = entry.duplicate_of
+
+        self.journal.write(json.dumps(record) + "\n")
+
+    def flush(self) -> None:
+        """
+        Flushes the journal, the entries written so far survive a crash.
+        """
+
+        self.journal.flush()
+
+    def finalize(self) -> Path:
+        """
+        Closes the journal and converts it into processed_mapping.json.
+
+        Returns
+        -------
+        Path
+            Returns the path to the saved mapping.
+        """
+
+        self.journal.close()
+
+        return convert_mapping_journal(output_path=self.output_path)
@@ -0,0 +1,199 @@
+import logging
+import os
+import shutil
+from pathlib import Path
+
+PLACEMENT_STRATEGIES = ["copy", "hardlink", "reflink", "symlink", "move"]
+
+# Linux ioctl request number used to clone the extents of a file:
+FICLONE = 0x40049409
+# Suffix of the temporary files that are copied before replacing the destination:
+PARTIAL_SUFFIX = ".part"
+
+
+def is_same_device(source: Path, destination: Path) -> bool:
+    """
+    Checks if both of the paths reside on the same device.
+
+    Parameters
+    ----------
+    source : Path
+        Path to the source file or directory.
+    destination : Path
+        Path to the destination file or directory, must exist.
+
+    Returns
+    -------
+    bool
+        True if both paths are on the same device, False otherwise.
+    """
+
+    return os.stat(source).st_dev == os.stat(destination).st_dev
+
+
+def resolve_placement(
+    placement: str,
+    source_directory: Path,
+    destination_directory: Path,
+) -> str:
+    """
+    Verifies if the selected placement strategy is possible between the two
+    directories. Hardlinks and reflinks require both directories to be on the
+    same device, if they are not, the placement falls back to copying.
+
+    Parameters
+    ----------
+    placement : str
+        Placement strategy selected by the user.
+    source_directory : Path
+        Directory holding the source files.
+    destination_directory : Path
+        Directory where the files will be placed, must exist.
+
+    Returns
+    -------
+    str
+        Returns the placement strategy that will be used.
+    """
+
+    if placement not in PLACEMENT_STRATEGIES:
+        raise ValueError(f"Unknown placement strategy: {placement}")
+
+    if placement not in ("hardlink", "reflink"):
+        return placement
+
+    if not is_same_device(source_directory, destination_directory):
+        logging.warning(
+            f"{str(source_directory)} and {str(destination_directory)} are on different devices, cannot use {placement}, falling back to copy."
+        )
+        return "copy"
+
+    return placement
+
+
+def reflink_file(source: Path, destination: Path) -> None:
+    """
+    Creates a copy-on-write clone of the source file. Only supported on Linux
+    with filesystems that implement the FICLONE ioctl (Btrfs, XFS, bcachefs).
+
+    Parameters
+    ----------
+    source : Path
+        Path to the file that will be cloned.
+    destination : Path
+        Path where the clone will be created.
+
+    Raises
+    ------
+    OSError
+        Raises an error if the clone cannot be created.
+    """
+
+    try:
+        import fcntl
+    except ImportError as e:
+        raise OSError("Reflinks are not supported on this platform.") from e
+
+    with source.open("rb") as source_file, destination.open("wb") as destination_file:
+        fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+    shutil.copymode(source, destination)
+
+
+def copy_file(source: Path, destination: Path, reflink: bool = False) -> None:
+    """
+    Copies the file data and permission bits into a temporary file
+    which then atomically replaces the destination. A destination that exists
+    is therefore always complete.
+
+    Parameters
+    ----------
+    source : Path
+        Path to the file that will be copied.
+    destination : Path
+        Path where the copy will be placed.
+    reflink : bool, optional
+        Specifies if the copy should be a copy-on-write clone, by default False
+    """
+
+    temporary_destination = destination.with_name(f"{destination.name}{PARTIAL_SUFFIX}")
+    try:
+        if reflink:
+            reflink_file(source=source, destination=temporary_destination)
+        else:
+            shutil.copy(source, temporary_destination)
+        os.replace(temporary_destination, destination)
+    finally:
+        temporary_destination.unlink(missing_ok=True)
+
+
+def remove_partial_files(directory: Path) -> None:
+    """
+    Removes the temporary files left in a flattened output directory
+    by the copies of an interrupted run.
+
+    Parameters
+    ----------
+    directory : Path
+        Path to the flattened output directory.
+    """
+
+    if not directory.is_dir():
+        return
+
+    for partial_file in directory.glob(f"*{PARTIAL_SUFFIX}"):
+        logging.debug(f"Removing {str(partial_file)} left by an interrupted copy.")
+        partial_file.unlink(missing_ok=True)
+
+
+def place_file(
+    source: Path,
+    destination: Path,
+    placement: str,
+    fallback_source: Path | None = None,
+) -> str:
+    """
+    Places the source file at the destination with the selected strategy.
+    If the strategy fails, the file is copied instead.
+
+    Parameters
+    ----------
+    source : Path
+        Path to the file that will be placed.
+    destination : Path
+        Path where the file will be placed.
+    placement : str
+        Placement strategy, one of PLACEMENT_STRATEGIES.
+    fallback_source : Path | None, optional
+        File that is copied if the placement fails, by default the source is used.
+
+    Returns
+    -------
+    str
+        Returns the placement strategy that was used.
+    """
+
+    try:
+        if placement == "copy":
+            copy_file(source=source, destination=destination)
+        elif placement == "reflink":
+            copy_file(source=source, destination=destination, reflink=True)
+        elif placement == "move":
+            shutil.move(source, destination)
+        elif placement in ("hardlink", "symlink"):
+            destination.unlink(missing_ok=True)
+            if placement == "hardlink":
+                os.link(source, destination)
+            else:
+                destination.symlink_to(source.resolve())
+        else:
+            raise ValueError(f"Unknown placement strategy: {placement}")
+    except OSError as e:
+        if placement == "copy":
+            raise
+
+        logging.debug(f"Could not {placement} {str(destination)}: {e}, copying.")
+        copy_file(source=fallback_source or source, destination=destination)
+        return "copy"
+
+    logging.debug(f"Placed {str(destination)} with {placement}.")
+    return placement
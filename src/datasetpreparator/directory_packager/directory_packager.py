@@ -1,33 +1,98 @@
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+from collections import deque
+from concurrent.futures import (
+    CancelledError,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from concurrent.futures.process import BrokenProcessPool
 from multiprocessing import freeze_support
 from pathlib import Path
-from zipfile import ZIP_BZIP2, ZipFile
+from zipfile import ZipFile
 
 import click
 from tqdm import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
+from datasetpreparator.directory_packager.utils.archive_update import (
+    ArchiveUpdatePlan,
+    plan_archive_update,
+)
+from datasetpreparator.directory_packager.utils.compression import (
+    COMPRESSION_CHOICES,
+    is_zstandard_installed,
+    is_zstd_native,
+)
+from datasetpreparator.directory_packager.utils.parallel_zip import (
+    compress_member,
+    write_compressed_member,
+)
+from datasetpreparator.directory_packager.utils.tar_zstd import (
+    write_tar_zstd_archive,
+)
+from datasetpreparator.directory_packager.utils.zipfile_internals import (
+    mark_modified,
+)
 from datasetpreparator.utils.logging import initialize_logging
 from datasetpreparator.utils.user_prompt import (
     create_directory,
     user_prompt_overwrite_ok,
 )
 
+# Number of compressed members that can wait to be written for each of the workers:
+PACKAGING_MEMBERS_PER_WORKER = 4
+# Fraction of an updated archive that can be taken by the removed
+# or replaced members before the archive is rebuilt:
+UPDATE_MAX_WASTED_FRACTION = 0.25
+
+# Extensions of the archives for each of the supported archive formats:
+ARCHIVE_FORMATS = {
+    "zip": ".zip",
+    "tar.zst": ".tar.zst",
+}
+
 
 class DirectoryPackagerArguments:
-    def __init__(self, directory_path: Path, force_overwrite: bool):
+    def __init__(
+        self,
+        directory_path: Path,
+        force_overwrite: bool,
+        executor: Executor,
+        max_pending_members: int,
+        compression: str = "bzip2",
+        compression_level: int | None = None,
+        update: bool = False,
+        archive_format: str = "zip",
+        n_threads: int = 1,
+    ):
         self.directory_path = directory_path
         self.force_overwrite = force_overwrite
+        self.executor = executor
+        self.max_pending_members = max_pending_members
+        self.compression = compression
+        self.compression_level = compression_level
+        self.update = update
+        self.archive_format = archive_format
+        self.n_threads = n_threads
 
 
 def multiple_dir_packager(
     input_path: Path,
     n_threads: int,
     force_overwrite: bool,
+    compression: str = "bzip2",
+    compression_level: int | None = None,
+    update: bool = False,
+    archive_format: str = "zip",
 ) -> list[Path]:
     """
-    Packages the specified directory into a .zip archive.
+    Packages the specified directory into a .zip archive. The files of all
+    of the archives are compressed by a shared pool of worker processes,
+    so a single large directory uses all of the workers.
 
     Parameters
     ----------
@@ -35,9 +100,23 @@ def multiple_dir_packager(
         Specifies the path to a directoryu for which each of its directories
         will be turned into a .zip archive.
     n_threads : int
-        Specifies the number of threads to use for packaging.
+        Specifies the number of worker processes that compress the files,
+        and the number of archives that are written at the same time.
     force_overwrite : bool
         Specifies if the user wants to overwrite files or directories without being prompted
+    compression : str, optional
+        Compression method of the archive members, one of COMPRESSION_CHOICES,
+        by default "bzip2". The "auto" method stores the already compressed files
+        and deflates the rest. The "zstd" method requires Python 3.14.
+    compression_level : int | None, optional
+        Compression level, by default None which uses the default of the method.
+    update : bool, optional
+        Specifies if the existing archives are updated instead of
+        being rebuilt, by default False. Only supported by the "zip" format.
+    archive_format : str, optional
+        Format of the archives, one of ARCHIVE_FORMATS, by default "zip".
+        The "tar.zst" format is compressed with Zstandard using n_threads threads
+        per archive, the compression method is ignored.
 
     Returns
     -------
@@ -45,6 +124,19 @@ def multiple_dir_packager(
         Returns a list of Paths to packaged archives.
     """
 
+    if archive_format == "tar.zst" and not is_zstandard_installed():
+        logging.error(
+            "tar.zst archives require the zstandard package, install it with: pip install datasetpreparator[zstd]"
+        )
+        return []
+
+    if compression == "zstd" and archive_format == "zip" and not is_zstd_native():
+        logging.error(
+            "zstd compressed .zip members require Python 3.14, the zipfile module of older versions cannot read them. "
+            "Use --archive_format tar.zst for Zstandard compressed archives."
+        )
+        return []
+
     dirs_to_package = []
 
     directory_contents = list(input_path.iterdir())
@@ -52,35 +144,301 @@ def multiple_dir_packager(
         logging.error(f"The input path {str(input_path)} is empty!")
         return []
 
-    for directory in directory_contents:
-        logging.debug(f"Processing directory: {str(directory)}")
+    with (
+        ProcessPoolExecutor(max_workers=n_threads) as compression_executor,
+        ThreadPoolExecutor(
+            max_workers=n_threads,
+            initializer=tqdm.set_lock,
+            initargs=(tqdm.get_lock(),),
+        ) as executor,
+    ):
+        for directory in directory_contents:
+            logging.debug(f"Processing directory: {str(directory)}")
 
-        directory_path = Path(input_path, directory.name).resolve()
-        if not directory_path.is_dir():
-            continue
+            directory_path = Path(input_path, directory.name).resolve()
+            if not directory_path.is_dir():
+                continue
 
-        dirs_to_package.append(
-            DirectoryPackagerArguments(
-                directory_path=directory_path,
-                force_overwrite=force_overwrite,
+            dirs_to_package.append(
+                DirectoryPackagerArguments(
+                    directory_path=directory_path,
+                    force_overwrite=force_overwrite,
+                    executor=compression_executor,
+                    max_pending_members=PACKAGING_MEMBERS_PER_WORKER * n_threads,
+                    compression=compression,
+                    compression_level=compression_level,
+                    update=update,
+                    archive_format=archive_format,
+                    n_threads=n_threads,
+                )
             )
-        )
 
-    with ThreadPoolExecutor(
-        max_workers=n_threads,
-        initializer=tqdm.set_lock,
-        initargs=(tqdm.get_lock(),),
-    ) as executor:
         output_archives = list(executor.map(dir_packager, dirs_to_package))
 
     return output_archives
 
 
+def write_next_member(
+    zip_file: ZipFile,
+    directory_path: Path,
+    pending_members: deque[tuple[Path, Future | None]],
+) -> None:
+    """
+    Writes the oldest pending member into the archive, waits for its compression
+    if it was not finished yet.
+
+    Parameters
+    ----------
+    zip_file : ZipFile
+        Archive opened for writing.
+    directory_path : Path
+        Path to the directory that is being packaged.
+    pending_members : deque[tuple[Path, Future | None]]
+        Files in the order they are written, together with the futures
+        of their compressed members, None for directories.
+    """
+
+    file, future = pending_members.popleft()
+    arcname = str(file.relative_to(directory_path))
+    logging.debug(f"Adding file: {str(file)}")
+    if future is None:
+        zip_file.write(filename=str(file), arcname=arcname)
+        return
+
+    write_compressed_member(
+        zip_file=zip_file,
+        file_path=file,
+        arcname=arcname,
+        member=future.result(),
+    )
+
+
+def write_members(
+    zip_file: ZipFile,
+    arguments: DirectoryPackagerArguments,
+    files: list[Path],
+    description: str,
+) -> None:
+    """
+    Compresses the files with the workers of the executor and writes
+    the compressed members in the order of the files. The number of members
+    that are compressed and not yet written is limited, so the memory usage
+    does not depend on the size of the directory.
+
+    Parameters
+    ----------
+    zip_file : ZipFile
+        Archive opened for writing or appending.
+    arguments : DirectoryPackagerArguments
+        Specifies the arguments as per the DirectoryPackagerArguments class fields.
+    files : list[Path]
+        Files and directories that will be written.
+    description : str
+        Description of the progress bar.
+    """
+
+    pending_members = deque()
+    try:
+        for file in tqdm(files, desc=description, unit="files"):
+            if len(pending_members) >= arguments.max_pending_members:
+                write_next_member(
+                    zip_file=zip_file,
+                    directory_path=arguments.directory_path,
+                    pending_members=pending_members,
+                )
+
+            future = None
+            if not file.is_dir():
+                # Large members are spilled next to the archive:
+                future = arguments.executor.submit(
+                    compress_member,
+                    file.resolve(),
+                    arguments.compression,
+                    arguments.compression_level,
+                    arguments.directory_path.parent,
+                )
+            pending_members.append((file, future))
+
+        while pending_members:
+            write_next_member(
+                zip_file=zip_file,
+                directory_path=arguments.directory_path,
+                pending_members=pending_members,
+            )
+    finally:
+        discard_pending_members(pending_members=pending_members)
+
+
+def discard_pending_members(pending_members: deque[tuple[Path, Future | None]]) -> None:
+    """
+    Cancels the compression of the members that were not written,
+    and removes the temporary files of the members that were already compressed.
+
+    Parameters
+    ----------
+    pending_members : deque[tuple[Path, Future | None]]
+        Files that were not written, together with the futures
+        of their compressed members, None for directories.
+    """
+
+    for _, future in pending_members:
+        if future is None or future.cancel():
+            continue
+        try:
+            future.result().discard()
+        except (CancelledError, BrokenProcessPool, OSError):
+            # The member was not compressed, there is nothing to remove:
+            continue
+    pending_members.clear()
+
+
+def build_zip_archive(
+    arguments: DirectoryPackagerArguments,
+    archive_path: Path,
+    files: list[Path],
+) -> None:
+    """
+    Writes a new .zip archive of the directory. The archive is written to
+    a temporary file that replaces the final archive once it is complete.
+
+    Parameters
+    ----------
+    arguments : DirectoryPackagerArguments
+        Specifies the arguments as per the DirectoryPackagerArguments class fields.
+    archive_path : Path
+        Path to the final archive.
+    files : list[Path]
+        Files and directories that will be archived.
+    """
+
+    temporary_archive_path = archive_path.with_name(f"{archive_path.name}.part")
+    try:
+        with (
+            ZipFile(str(temporary_archive_path), "w") as zip_file,
+            logging_redirect_tqdm(),
+        ):
+            write_members(
+                zip_file=zip_file,
+                arguments=arguments,
+                files=files,
+                description=f"Packaging {archive_path.name:<30}",
+            )
+
+        os.replace(temporary_archive_path, archive_path)
+    finally:
+        temporary_archive_path.unlink(missing_ok=True)
+
+
+def build_tar_zstd_archive(
+    arguments: DirectoryPackagerArguments,
+    archive_path: Path,
+    files: list[Path],
+) -> None:
+    """
+    Writes a new .tar.zst archive of the directory. The archive is written to
+    a temporary file that replaces the final archive once it is complete.
+
+    Parameters
+    ----------
+    arguments : DirectoryPackagerArguments
+        Specifies the arguments as per the DirectoryPackagerArguments class fields.
+    archive_path : Path
+        Path to the final archive.
+    files : list[Path]
+        Files and directories that will be archived.
+    """
+
+    temporary_archive_path = archive_path.with_name(f"{archive_path.name}.part")
+    try:
+        with logging_redirect_tqdm():
+            write_tar_zstd_archive(
+                archive_path=temporary_archive_path,
+                directory_path=arguments.directory_path,
+                files=files,
+                description=f"Packaging {archive_path.name:<30}",
+                compression_level=arguments.compression_level,
+                n_threads=arguments.n_threads,
+            )
+
+        os.replace(temporary_archive_path, archive_path)
+    finally:
+        temporary_archive_path.unlink(missing_ok=True)
+
+
+# Functions that write a new archive in each of the archive formats:
+ARCHIVE_BUILDERS = {
+    "zip": build_zip_archive,
+    "tar.zst": build_tar_zstd_archive,
+}
+
+
+def update_archive(
+    arguments: DirectoryPackagerArguments,
+    archive_path: Path,
+    plan: ArchiveUpdatePlan,
+) -> None:
+    """
+    Updates the existing archive. The removed and changed members are
+    dropped from the central directory, the new and changed files are appended
+    in place of the previous central directory. The update is written to
+    a temporary copy of the archive that replaces it once it is complete,
+    so an interrupted update leaves the previous archive intact.
+
+    Parameters
+    ----------
+    arguments : DirectoryPackagerArguments
+        Specifies the arguments as per the DirectoryPackagerArguments class fields.
+    archive_path : Path
+        Path to the existing archive.
+    plan : ArchiveUpdatePlan
+        Plan of the update returned by plan_archive_update.
+    """
+
+    if plan.is_up_to_date:
+        logging.info(f"Archive {str(archive_path)} is up to date.")
+        return
+
+    logging.info(
+        f"Updating {str(archive_path)}, writing {len(plan.files_to_write)} files, dropping {len(plan.stale_members)} members."
+    )
+    temporary_archive_path = archive_path.with_name(f"{archive_path.name}.part")
+    try:
+        shutil.copyfile(archive_path, temporary_archive_path)
+        with (
+            ZipFile(str(temporary_archive_path), "a") as zip_file,
+            logging_redirect_tqdm(),
+        ):
+            stale_members = set(plan.stale_members)
+            zip_file.filelist = [
+                zinfo
+                for zinfo in zip_file.filelist
+                if zinfo.filename not in stale_members
+            ]
+            for arcname in stale_members:
+                zip_file.NameToInfo.pop(arcname, None)
+            mark_modified(zip_file=zip_file)
+
+            write_members(
+                zip_file=zip_file,
+                arguments=arguments,
+                files=plan.files_to_write,
+                description=f"Updating {archive_path.name:<31}",
+            )
+
+        os.replace(temporary_archive_path, archive_path)
+    finally:
+        temporary_archive_path.unlink(missing_ok=True)
+
+
 def dir_packager(arguments: DirectoryPackagerArguments) -> Path:
     """
-    Archives a single input directory.
+    Archives a single input directory in the selected archive format.
     Archive is stored in the same directory as the input.
 
+    In update mode, an existing archive is compared with the directory and only
+    the new or changed files are appended. The archive is rebuilt if the removed
+    and replaced members would take more than UPDATE_MAX_WASTED_FRACTION of it.
+
     Parameters
     ----------
     arguments : DirectoryPackagerArguments
@@ -92,27 +450,44 @@ def dir_packager(arguments: DirectoryPackagerArguments) -> Path:
         Returns a Path to the archive.
     """
 
-    final_archive_path = arguments.directory_path.with_suffix(".zip")
+    final_archive_path = arguments.directory_path.with_suffix(
+        ARCHIVE_FORMATS[arguments.archive_format]
+    )
+    files = list(arguments.directory_path.rglob("*"))
 
-    if user_prompt_overwrite_ok(
+    if arguments.update and arguments.archive_format != "zip":
+        logging.warning(
+            f"{arguments.archive_format} archives cannot be updated, rebuilding {str(final_archive_path)}."
+        )
+    elif arguments.update:
+        plan = plan_archive_update(
+            archive_path=final_archive_path,
+            directory_path=arguments.directory_path,
+            files=files,
+        )
+        if plan is not None and plan.wasted_fraction <= UPDATE_MAX_WASTED_FRACTION:
+            update_archive(
+                arguments=arguments,
+                archive_path=final_archive_path,
+                plan=plan,
+            )
+            return final_archive_path
+
+        if plan is not None:
+            logging.info(
+                f"Rebuilding {str(final_archive_path)}, {plan.wasted_fraction:.0%} of it would be wasted."
+            )
+    elif not user_prompt_overwrite_ok(
         path=final_archive_path, force_overwrite=arguments.force_overwrite
     ):
-        logging.info(f"Set final archive name to: {str(final_archive_path)}")
-        with ZipFile(str(final_archive_path), "w") as zip_file:
-            with logging_redirect_tqdm():
-                for file in tqdm(
-                    list(arguments.directory_path.rglob("*")),
-                    desc=f"Packaging {final_archive_path.name:<30}",
-                    unit="files",
-                ):
-                    abs_filepath = str(file.resolve())
-
-                    logging.debug(f"Adding file: {abs_filepath}")
-                    zip_file.write(
-                        filename=abs_filepath,
-                        arcname=file.relative_to(arguments.directory_path),
-                        compress_type=ZIP_BZIP2,
-                    )
+        return final_archive_path
+
+    logging.info(f"Set final archive name to: {str(final_archive_path)}")
+    ARCHIVE_BUILDERS[arguments.archive_format](
+        arguments=arguments,
+        archive_path=final_archive_path,
+        files=files,
+    )
 
     return final_archive_path
 
@@ -137,7 +512,7 @@ def dir_packager(arguments: DirectoryPackagerArguments) -> Path:
     type=int,
     default=1,
     required=False,
-    help="Number of threads to use for packaging. Default is 1.",
+    help="Number of worker processes that compress the files, and the number of archives that are written at the same time. Default is 1.",
 )
 @click.option(
     "--force_overwrite",
@@ -146,13 +521,50 @@ def dir_packager(arguments: DirectoryPackagerArguments) -> Path:
     required=True,
     help="Flag that specifies if the user wants to overwrite files or directories without being prompted.",
 )
+@click.option(
+    "--compression",
+    type=click.Choice(COMPRESSION_CHOICES, case_sensitive=False),
+    default="bzip2",
+    required=False,
+    help="Compression method of the archived files. 'auto' stores the files that are already compressed (.SC2Replay, .s2ma) or do not compress well, and deflates the rest. 'zstd' requires Python 3.14, older versions cannot read its members, use --archive_format tar.zst instead. Default is 'bzip2'.",
+)
+@click.option(
+    "--compression_level",
+    type=int,
+    default=None,
+    required=False,
+    help="Compression level of the selected method, 0-9 for deflate, 1-9 for bzip2, 1-22 for zstd, ignored for lzma and store. Default is the default level of the method.",
+)
+@click.option(
+    "--update",
+    type=bool,
+    default=False,
+    required=False,
+    help="Flag that specifies if the existing archives are updated instead of being rebuilt. Only the new or changed files are compressed, the members of the removed files are dropped. Archives are rebuilt when the dropped members take more than a quarter of their size. Default is False.",
+)
+@click.option(
+    "--archive_format",
+    type=click.Choice(list(ARCHIVE_FORMATS), case_sensitive=False),
+    default="zip",
+    required=False,
+    help="Format of the archives. 'tar.zst' archives are Zstandard compressed streams that can be extracted in one pass, they are compressed with n_threads threads per archive and require the zstandard package (datasetpreparator[zstd]). Default is 'zip'.",
+)
 @click.option(
     "--log",
     type=click.Choice(["INFO", "DEBUG", "ERROR", "WARN"], case_sensitive=False),
     default="WARN",
     help="Log level. Default is WARN.",
 )
-def main(input_path: Path, log: str, n_threads: int, force_overwrite: bool):
+def main(
+    input_path: Path,
+    log: str,
+    n_threads: int,
+    force_overwrite: bool,
+    compression: str,
+    compression_level: int | None,
+    update: bool,
+    archive_format: str,
+):
     initialize_logging(log=log)
 
     if create_directory(directory=input_path):
@@ -165,6 +577,10 @@ def main(input_path: Path, log: str, n_threads: int, force_overwrite: bool):
         input_path=input_path,
         n_threads=n_threads,
         force_overwrite=force_overwrite,
+        compression=compression.lower(),
+        compression_level=compression_level,
+        update=update,
+        archive_format=archive_format.lower(),
     )
 
 
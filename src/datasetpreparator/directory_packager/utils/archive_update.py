@@ -0,0 +1,222 @@
+import logging
+import time
+import zlib
+from pathlib import Path
+from zipfile import BadZipFile, ZipFile, ZipInfo
+
+# Size of the fixed part of a local file header:
+LOCAL_HEADER_SIZE = 30
+# Size of the chunks that are read while calculating the CRC of a file:
+CRC_CHUNK_SIZE = 1024 * 1024
+
+
+def get_arcname(file: Path, directory_path: Path) -> str:
+    """
+    Gets the name of the member within the archive, normalized the same way
+    as by zipfile.ZipInfo.
+
+    Parameters
+    ----------
+    file : Path
+        Path to the file or directory that is archived.
+    directory_path : Path
+        Path to the directory that is being packaged.
+
+    Returns
+    -------
+    str
+        Returns the name of the member.
+    """
+
+    arcname = file.relative_to(directory_path).as_posix()
+    if file.is_dir():
+        arcname += "/"
+    return arcname
+
+
+def calculate_crc(file_path: Path) -> int:
+    """
+    Calculates the CRC-32 of the file contents.
+
+    Parameters
+    ----------
+    file_path : Path
+        Path to the file.
+
+    Returns
+    -------
+    int
+        Returns the CRC-32 of the file.
+    """
+
+    crc = 0
+    with file_path.open("rb") as file:
+        while chunk := file.read(CRC_CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def is_member_unchanged(zinfo: ZipInfo, file: Path) -> bool:
+    """
+    Checks if the archived member holds the current contents of the file.
+    Members with a different size are changed, members with the same size and
+    modification time are unchanged. If only the modification time differs,
+    the CRC of the file is compared, so files that were touched are not rewritten.
+
+    Parameters
+    ----------
+    zinfo : ZipInfo
+        Information of the archived member.
+    file : Path
+        Path to the file.
+
+    Returns
+    -------
+    bool
+        True if the member does not have to be rewritten, False otherwise.
+    """
+
+    if zinfo.is_dir():
+        return True
+
+    stat = file.stat()
+    if zinfo.file_size != stat.st_size:
+        return False
+
+    # .zip timestamps have a resolution of two seconds:
+    date_time = time.localtime(stat.st_mtime)[0:6]
+    date_time = (*date_time[0:5], date_time[5] - date_time[5] % 2)
+    if zinfo.date_time == date_time:
+        return True
+
+    return zinfo.CRC == calculate_crc(file_path=file)
+
+
+def get_member_span(zinfo: ZipInfo) -> int:
+    """
+    Approximates the number of bytes a member takes within the archive.
+
+    Parameters
+    ----------
+    zinfo : ZipInfo
+        Information of the archived member.
+
+    Returns
+    -------
+    int
+        Returns the size of the local header and the compressed data.
+    """
+
+    return (
+        LOCAL_HEADER_SIZE
+        + len(zinfo.orig_filename.encode("utf-8"))
+        + len(zinfo.extra)
+        + zinfo.compress_size
+    )
+
+
+class ArchiveUpdatePlan:
+    """
+    Changes that bring an existing archive up to date with its directory.
+
+    Parameters
+    ----------
+    files_to_write : list[Path]
+        Files that are new or changed since the archive was written.
+    stale_members : list[str]
+        Members whose file was removed or changed, they are dropped
+        from the central directory.
+    wasted_bytes : int
+        Bytes of the archive that will not be referenced by any member
+        after the update.
+    archive_size : int
+        Size of the members section of the archive before the update.
+    """
+
+    def __init__(
+        self,
+        files_to_write: list[Path],
+        stale_members: list[str],
+        wasted_bytes: int,
+        archive_size: int,
+    ):
+        self.files_to_write = files_to_write
+        self.stale_members = stale_members
+        self.wasted_bytes = wasted_bytes
+        self.archive_size = archive_size
+
+    @property
+    def is_up_to_date(self) -> bool:
+        return not self.files_to_write and not self.stale_members
+
+    @property
+    def wasted_fraction(self) -> float:
+        if not self.archive_size:
+            return 0.0
+        return self.wasted_bytes / self.archive_size
+
+
+def plan_archive_update(
+    archive_path: Path,
+    directory_path: Path,
+    files: list[Path],
+) -> ArchiveUpdatePlan | None:
+    """
+    Compares the central directory of an existing archive with the files
+    of the directory.
+
+    Parameters
+    ----------
+    archive_path : Path
+        Path to the existing archive.
+    directory_path : Path
+        Path to the directory that is being packaged.
+    files : list[Path]
+        Files and directories that are within the directory.
+
+    Returns
+    -------
+    ArchiveUpdatePlan | None
+        Returns the plan of the update, None if the archive
+        does not exist or cannot be read.
+    """
+
+    if not archive_path.exists():
+        return None
+
+    try:
+        with ZipFile(archive_path, "r") as zip_file:
+            members = {zinfo.filename: zinfo for zinfo in zip_file.infolist()}
+            central_directory_offset = zip_file.start_dir
+    except (BadZipFile, OSError) as e:
+        logging.warning(f"Cannot read {str(archive_path)}: {e}, rebuilding it.")
+        return None
+
+    files_to_write = []
+    stale_members = []
+    live_bytes = 0
+    for file in files:
+        arcname = get_arcname(file=file, directory_path=directory_path)
+        zinfo = members.pop(arcname, None)
+        if zinfo is None:
+            files_to_write.append(file)
+            continue
+
+        if is_member_unchanged(zinfo=zinfo, file=file):
+            live_bytes += get_member_span(zinfo=zinfo)
+            continue
+
+        files_to_write.append(file)
+        stale_members.append(arcname)
+
+    # Members that were not matched with any file were removed from the directory:
+    stale_members.extend(members.keys())
+
+    # The central directory is overwritten by the update,
+    # everything before it that is not used by a member is wasted:
+    return ArchiveUpdatePlan(
+        files_to_write=files_to_write,
+        stale_members=stale_members,
+        wasted_bytes=max(central_directory_offset - live_bytes, 0),
+        archive_size=central_directory_offset,
+    )
@@ -0,0 +1,125 @@
+import importlib.util
+import zipfile
+import zlib
+from pathlib import Path
+from zipfile import ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED
+
+from datasetpreparator.directory_packager.utils.zipfile_internals import (
+    get_zipfile_compressor,
+)
+
+# Zstandard method identifier from the .ZIP File Format Specification,
+# zipfile supports it natively starting with Python 3.14:
+ZIP_ZSTANDARD = getattr(zipfile, "ZIP_ZSTANDARD", 93)
+
+COMPRESSION_METHODS = {
+    "store": ZIP_STORED,
+    "deflate": ZIP_DEFLATED,
+    "bzip2": ZIP_BZIP2,
+    "lzma": ZIP_LZMA,
+    "zstd": ZIP_ZSTANDARD,
+}
+COMPRESSION_CHOICES = [*COMPRESSION_METHODS, "auto"]
+
+# Files that are already compressed, auto mode stores them without sampling.
+# Replays and maps are MPQ archives with compressed contents:
+INCOMPRESSIBLE_EXTENSIONS = {
+    ".sc2replay",
+    ".s2ma",
+    ".mpq",
+    ".zip",
+    ".gz",
+    ".bz2",
+    ".xz",
+    ".zst",
+    ".7z",
+    ".png",
+    ".jpg",
+    ".jpeg",
+}
+# Size of the sample that is compressed to decide if a file is compressible:
+AUTO_SAMPLE_SIZE = 64 * 1024
+# Minimal fraction of the sample that has to be saved to compress the file:
+AUTO_MIN_SAVINGS = 0.1
+
+
+def is_zstd_native() -> bool:
+    """
+    Checks if the zipfile module supports Zstandard compressed members.
+
+    Returns
+    -------
+    bool
+        True if the members can be compressed and read by zipfile, False otherwise.
+    """
+
+    return hasattr(zipfile, "ZIP_ZSTANDARD")
+
+
+def is_zstandard_installed() -> bool:
+    """
+    Checks if the optional zstandard package is installed.
+
+    Returns
+    -------
+    bool
+        True if the package can be imported, False otherwise.
+    """
+
+    return importlib.util.find_spec("zstandard") is not None
+
+
+def get_compressor(compress_type: int, compresslevel: int | None = None):
+    """
+    Creates a compressor for a single member of a .zip archive.
+
+    Parameters
+    ----------
+    compress_type : int
+        zipfile compression constant.
+    compresslevel : int | None, optional
+        Compression level, by default None which uses the default of the codec.
+        Ignored for LZMA, as zipfile does not support it.
+
+    Returns
+    -------
+    Compressor object with compress and flush methods,
+    or None if the member is stored.
+    """
+
+    return get_zipfile_compressor(
+        compress_type=compress_type, compresslevel=compresslevel
+    )
+
+
+def select_auto_compression(file_path: Path, sample: bytes) -> int:
+    """
+    Selects the compression of a file in auto mode. Files with already compressed
+    contents are stored, other files are deflated if a fast compression of
+    their first bytes saves enough space.
+
+    Parameters
+    ----------
+    file_path : Path
+        Path to the file that will be compressed.
+    sample : bytes
+        First bytes of the file.
+
+    Returns
+    -------
+    int
+        Returns the zipfile compression constant that will be used for the file.
+    """
+
+    if file_path.suffix.lower() in INCOMPRESSIBLE_EXTENSIONS:
+        return ZIP_STORED
+
+    sample = sample[:AUTO_SAMPLE_SIZE]
+    if not sample:
+        return ZIP_STORED
+
+    compressed_size = len(zlib.compress(sample, 1))
+    if compressed_size > len(sample) * (1 - AUTO_MIN_SAVINGS):
+        return ZIP_STORED
+
+    return ZIP_DEFLATED
@@ -0,0 +1,233 @@
+import tempfile
+import zlib
+from collections.abc import Iterator
+from contextlib import ExitStack
+from pathlib import Path
+from zipfile import ZIP_LZMA, ZipFile, ZipInfo
+
+from datasetpreparator.directory_packager.utils.compression import (
+    COMPRESSION_METHODS,
+    get_compressor,
+    select_auto_compression,
+)
+from datasetpreparator.directory_packager.utils.zipfile_internals import (
+    append_raw_member,
+)
+
+# Size of the chunks that are read from the files while compressing:
+COMPRESSION_CHUNK_SIZE = 1024 * 1024
+# Compressed members larger than this are written to a temporary file by the worker
+# instead of being held in memory and sent to the process that writes the archive:
+IN_MEMORY_MEMBER_SIZE = 16 * 1024 * 1024
+
+
+class CompressedMember:
+    """
+    Member of a .zip archive that was compressed ahead of writing it.
+
+    Parameters
+    ----------
+    crc : int
+        CRC-32 of the uncompressed data.
+    file_size : int
+        Size of the uncompressed data in bytes.
+    compress_size : int
+        Size of the compressed data in bytes.
+    compress_type : int
+        zipfile compression constant that was used to compress the member.
+    data : bytes | None, optional
+        Compressed data of the member, a complete stream of the selected codec,
+        by default None if the data is in a temporary file.
+    data_path : Path | None, optional
+        Path to the temporary file with the compressed data, by default None
+        if the data is held in memory. The file is removed by discard.
+    """
+
+    def __init__(
+        self,
+        crc: int,
+        file_size: int,
+        compress_size: int,
+        compress_type: int,
+        data: bytes | None = None,
+        data_path: Path | None = None,
+    ):
+        self.crc = crc
+        self.file_size = file_size
+        self.compress_size = compress_size
+        self.compress_type = compress_type
+        self.data = data
+        self.data_path = data_path
+
+    def iter_data(self) -> Iterator[bytes]:
+        """
+        Yields the compressed data of the member in chunks.
+        """
+
+        if self.data_path is None:
+            yield self.data
+            return
+
+        with self.data_path.open("rb") as data_file:
+            while chunk := data_file.read(COMPRESSION_CHUNK_SIZE):
+                yield chunk
+
+    def discard(self) -> None:
+        """
+        Removes the temporary file with the compressed data, if there is one.
+        """
+
+        if self.data_path is not None:
+            self.data_path.unlink(missing_ok=True)
+
+
+def compress_member(
+    file_path: Path,
+    compression: str,
+    compresslevel: int | None = None,
+    spill_directory: Path | None = None,
+) -> CompressedMember:
+    """
+    Compresses a single file into an independent stream that can be written
+    as a member of a .zip archive. Uses the same compressors as the zipfile module,
+    so it can be executed in a worker process and the result written in order
+    by the process that owns the archive.
+
+    Once the compressed data exceeds IN_MEMORY_MEMBER_SIZE, it is streamed
+    into a temporary file, so large files are not held in memory
+    and are not sent between the processes.
+
+    Parameters
+    ----------
+    file_path : Path
+        Path to the file that will be compressed.
+    compression : str
+        Compression method, one of COMPRESSION_CHOICES. In "auto" mode
+        the method is selected from the first chunk of the file.
+    compresslevel : int | None, optional
+        Compression level, by default None which uses the default of the codec.
+    spill_directory : Path | None, optional
+        Directory of the temporary files of large members, by default None
+        which uses the default temporary directory.
+
+    Returns
+    -------
+    CompressedMember
+        Returns the compressed data together with its CRC and uncompressed size.
+    """
+
+    crc = 0
+    file_size = 0
+    compress_size = 0
+    chunks = []
+    spill_file = None
+    spill_path = None
+    try:
+        with ExitStack() as stack, file_path.open("rb") as file:
+            chunk = file.read(COMPRESSION_CHUNK_SIZE)
+            if compression == "auto":
+                compress_type = select_auto_compression(
+                    file_path=file_path, sample=chunk
+                )
+            else:
+                compress_type = COMPRESSION_METHODS[compression]
+            compressor = get_compressor(
+                compress_type=compress_type, compresslevel=compresslevel
+            )
+
+            while True:
+                if chunk:
+                    file_size += len(chunk)
+                    crc = zlib.crc32(chunk, crc)
+                    compressed = compressor.compress(chunk) if compressor else chunk
+                elif compressor:
+                    compressed = compressor.flush()
+                else:
+                    compressed = b""
+
+                compress_size += len(compressed)
+                if spill_file is None and compress_size > IN_MEMORY_MEMBER_SIZE:
+                    # The temporary file is closed together with the source file,
+                    # and kept until the member is written:
+                    spill_file = stack.enter_context(
+                        tempfile.NamedTemporaryFile(
+                            dir=spill_directory,
+                            prefix=f".{file_path.name}.",
+                            suffix=".member",
+                            delete=False,
+                        )
+                    )
+                    spill_path = Path(spill_file.name)
+                    spill_file.writelines(chunks)
+                    chunks = []
+                if spill_file is None:
+                    chunks.append(compressed)
+                else:
+                    spill_file.write(compressed)
+
+                if not chunk:
+                    break
+                chunk = file.read(COMPRESSION_CHUNK_SIZE)
+    except BaseException:
+        if spill_path is not None:
+            spill_path.unlink(missing_ok=True)
+        raise
+
+    return CompressedMember(
+        crc=crc,
+        file_size=file_size,
+        compress_size=compress_size,
+        compress_type=compress_type,
+        data=b"".join(chunks) if spill_path is None else None,
+        data_path=spill_path,
+    )
+
+
+def write_compressed_member(
+    zip_file: ZipFile,
+    file_path: Path,
+    arcname: str,
+    member: CompressedMember,
+) -> ZipInfo:
+    """
+    Appends an already compressed member to an archive opened for writing.
+    The temporary file of the member is removed afterwards.
+
+    Parameters
+    ----------
+    zip_file : ZipFile
+        Archive opened for writing to a seekable file.
+    file_path : Path
+        Path to the file from which the member was compressed,
+        used for the timestamp and the permissions.
+    arcname : str
+        Name of the member within the archive.
+    member : CompressedMember
+        Member returned by compress_member.
+
+    Returns
+    -------
+    ZipInfo
+        Returns the information of the written member.
+    """
+
+    try:
+        zinfo = ZipInfo.from_file(filename=file_path, arcname=arcname)
+        zinfo.compress_type = member.compress_type
+        zinfo.flag_bits = 0x00
+        if member.compress_type == ZIP_LZMA:
+            # Compressed data includes an end-of-stream (EOS) marker:
+            zinfo.flag_bits |= 0x02
+        zinfo.CRC = member.crc
+        zinfo.file_size = member.file_size
+        zinfo.compress_size = member.compress_size
+
+        append_raw_member(
+            zip_file=zip_file,
+            zinfo=zinfo,
+            data_chunks=member.iter_data(),
+        )
+    finally:
+        member.discard()
+
+    return zinfo
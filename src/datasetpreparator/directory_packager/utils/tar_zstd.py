@@ -0,0 +1,66 @@
+import tarfile
+from pathlib import Path
+
+from tqdm import tqdm
+
+# Default Zstandard compression level, same as the default of the zstd CLI:
+ZSTD_DEFAULT_LEVEL = 3
+
+
+def write_tar_zstd_archive(
+    archive_path: Path,
+    directory_path: Path,
+    files: list[Path],
+    description: str,
+    compression_level: int | None = None,
+    n_threads: int = 1,
+) -> None:
+    """
+    Writes the files into a Zstandard compressed tar archive. The archive is
+    written as a single stream, so it can be decompressed and extracted in one
+    pass without random access, e.g. while it is downloaded from object storage.
+    Requires the optional zstandard package.
+
+    Parameters
+    ----------
+    archive_path : Path
+        Path where the archive will be written.
+    directory_path : Path
+        Path to the directory that is being packaged,
+        the members are named relative to it.
+    files : list[Path]
+        Files and directories that will be archived, in the order
+        they are written.
+    description : str
+        Description of the progress bar.
+    compression_level : int | None, optional
+        Zstandard compression level, by default None which uses ZSTD_DEFAULT_LEVEL.
+    n_threads : int, optional
+        Number of threads that compress the stream, by default 1
+    """
+
+    import zstandard
+
+    if compression_level is None:
+        compression_level = ZSTD_DEFAULT_LEVEL
+
+    # zstandard compresses in the calling thread when threads is 0:
+    compressor = zstandard.ZstdCompressor(
+        level=compression_level,
+        threads=n_threads if n_threads > 1 else 0,
+    )
+    with (
+        archive_path.open("wb") as archive_file,
+        compressor.stream_writer(archive_file, closefd=False) as zstd_stream,
+        tarfile.open(fileobj=zstd_stream, mode="w|") as tar_file,
+    ):
+        for file in tqdm(
+            files,
+            desc=description,
+            unit="files",
+        ):
+            tar_file.add(
+                name=str(file),
+                arcname=file.relative_to(directory_path).as_posix(),
+                recursive=False,
+            )
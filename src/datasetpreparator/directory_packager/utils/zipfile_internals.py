@@ -0,0 +1,157 @@
+import logging
+import platform
+import sys
+import zipfile
+from collections.abc import Iterable
+from functools import cache
+from zipfile import ZipFile, ZipInfo
+
+# Python versions whose zipfile internals were checked against the helpers below:
+TESTED_PYTHON_VERSIONS = ((3, 10), (3, 14))
+# Private attributes of ZipFile that are used to append precompressed members:
+ZIPFILE_PRIVATE_ATTRIBUTES = [
+    "_allowZip64",
+    "_writecheck",
+    "_didModify",
+    "start_dir",
+    "fp",
+]
+
+
+@cache
+def check_python_version() -> None:
+    """
+    Warns once if the zipfile internals are used on a Python version
+    that was not checked against them.
+    """
+
+    version = sys.version_info[:2]
+    if not TESTED_PYTHON_VERSIONS[0] <= version <= TESTED_PYTHON_VERSIONS[1]:
+        logging.warning(
+            f"Precompressed .zip members rely on zipfile internals that were not checked on Python {platform.python_version()}."
+        )
+
+
+def check_zipfile_internals(zip_file: ZipFile) -> None:
+    """
+    Checks that the archive exposes the private attributes that are used
+    to append precompressed members.
+
+    Parameters
+    ----------
+    zip_file : ZipFile
+        Archive opened for writing or appending.
+
+    Raises
+    ------
+    RuntimeError
+        Raises an error if any of the attributes is missing
+        in the zipfile module of this Python version.
+    """
+
+    check_python_version()
+    missing = [
+        attribute
+        for attribute in ZIPFILE_PRIVATE_ATTRIBUTES
+        if not hasattr(zip_file, attribute)
+    ]
+    if missing:
+        raise RuntimeError(
+            f"zipfile of Python {platform.python_version()} does not have {', '.join(missing)}, precompressed members cannot be written."
+        )
+
+
+def get_zipfile_compressor(compress_type: int, compresslevel: int | None = None):
+    """
+    Creates the compressor that zipfile uses for its members.
+
+    Parameters
+    ----------
+    compress_type : int
+        zipfile compression constant.
+    compresslevel : int | None, optional
+        Compression level, by default None which uses the default of the codec.
+
+    Returns
+    -------
+    Compressor object with compress and flush methods,
+    or None if the member is stored.
+
+    Raises
+    ------
+    RuntimeError
+        Raises an error if the zipfile module of this Python version
+        does not expose its compressors.
+    """
+
+    check_python_version()
+    if not hasattr(zipfile, "_get_compressor"):
+        raise RuntimeError(
+            f"zipfile of Python {platform.python_version()} does not have _get_compressor, members cannot be compressed in parallel."
+        )
+
+    return zipfile._get_compressor(compress_type, compresslevel)
+
+
+def mark_modified(zip_file: ZipFile) -> None:
+    """
+    Marks the archive as modified, so its central directory is rewritten
+    when it is closed.
+
+    Parameters
+    ----------
+    zip_file : ZipFile
+        Archive opened for writing or appending.
+    """
+
+    check_zipfile_internals(zip_file=zip_file)
+    zip_file._didModify = True
+
+
+def append_raw_member(
+    zip_file: ZipFile,
+    zinfo: ZipInfo,
+    data_chunks: Iterable[bytes],
+) -> None:
+    """
+    Appends a member whose data is already compressed. The local file header
+    is written with the sizes and CRC of zinfo, followed by the data,
+    the central directory is written by the ZipFile when it is closed.
+
+    Parameters
+    ----------
+    zip_file : ZipFile
+        Archive opened for writing to a seekable file.
+    zinfo : ZipInfo
+        Information of the member with its final sizes and CRC.
+    data_chunks : Iterable[bytes]
+        Compressed data of the member, exactly zinfo.compress_size bytes.
+
+    Raises
+    ------
+    zipfile.LargeZipFile
+        Raises an error if the member requires ZIP64 extensions
+        and the archive does not allow them.
+    """
+
+    check_zipfile_internals(zip_file=zip_file)
+
+    zip64 = (
+        zinfo.file_size > zipfile.ZIP64_LIMIT
+        or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    )
+    if zip64 and not zip_file._allowZip64:
+        raise zipfile.LargeZipFile("Filesize would require ZIP64 extensions")
+
+    zip_file.fp.seek(zip_file.start_dir)
+    zinfo.header_offset = zip_file.fp.tell()
+    zip_file._writecheck(zinfo)
+    zip_file._didModify = True
+
+    zip_file.fp.write(zinfo.FileHeader(zip64))
+    for chunk in data_chunks:
+        zip_file.fp.write(chunk)
+    zip_file.start_dir = zip_file.fp.tell()
+
+    zip_file.filelist.append(zinfo)
+    zip_file.NameToInfo[zinfo.filename] = zinfo
@@ -9,6 +9,7 @@ from datasetpreparator.directory_flattener.directory_flattener import (
     multiple_directory_flattener,
 )
 from datasetpreparator.directory_packager.directory_packager import (
+    ARCHIVE_FORMATS,
     multiple_dir_packager,
 )
 from datasetpreparator.file_renamer.file_renamer import file_renamer
@@ -24,6 +25,9 @@ from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.file_copier impor
 from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.multiprocess import (
     sc2egset_replaypack_processor,
 )
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.pipeline_graph import (
+    prepare_datasets_task_graph,
+)
 from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.replaypack_processor_args import (
     ReplaypackProcessorArguments,
 )
@@ -41,6 +45,7 @@ def prepare_sc2reset(
     force_overwrite: bool,
     maps_output_path: Path,
     directory_flattener_output_path: Path,
+    archive_format: str = "zip",
 ) -> None:
     """
     Function that runs all of the necessary steps to prepare SC2ReSet dataset.
@@ -60,6 +65,8 @@ def prepare_sc2reset(
         Path where the maps will be downloaded.
     directory_flattener_output_path : Path
         Path where the directory flattener output will be placed
+    archive_format : str, optional
+        Format of the packaged archives, one of ARCHIVE_FORMATS, by default "zip"
     """
 
     # Directory flattener:
@@ -95,6 +102,7 @@ def prepare_sc2reset(
         input_path=directory_flattener_output_path,
         n_threads=n_processes,
         force_overwrite=force_overwrite,
+        archive_format=archive_format,
     )
 
     sc2reset_output_path = Path(output_path, "SC2ReSet").resolve()
@@ -103,7 +111,7 @@ def prepare_sc2reset(
         input_path=directory_flattener_output_path,
         output_path=sc2reset_output_path,
         force_overwrite=force_overwrite,
-        extension=".zip",
+        extension=ARCHIVE_FORMATS[archive_format],
         recursive=True,
     )
 
@@ -116,6 +124,8 @@ def prepare_sc2egset(
     maps_output_path: Path,
     directory_flattener_output_path: Path,
     force_overwrite: bool,
+    archive_format: str = "zip",
+    skip_processed: bool = False,
 ) -> None:
     """
     Function that runs all of the necessary steps to prepare SC2EGSet dataset.
@@ -135,6 +145,11 @@ def prepare_sc2egset(
         Path where the directory flattener output is placed.
     force_overwrite : bool
         Flag that specifies if the user wants to overwrite files or directories without being prompted.
+    archive_format : str, optional
+        Format of the packaged archives, one of ARCHIVE_FORMATS, by default "zip"
+    skip_processed : bool, optional
+        Flag that specifies if the replaypacks that were processed from the same
+        input files are not processed again, by default False
     """
 
     # SC2EGSet Processor:
@@ -150,6 +165,7 @@ def prepare_sc2egset(
     sc2egset_replaypack_processor(
         arguments=sc2egset_processor_args,
         force_overwrite=force_overwrite,
+        skip_processed=skip_processed,
     )
 
     # Processed Mapping Copier:
@@ -170,6 +186,7 @@ def prepare_sc2egset(
         input_path=sc2egset_replaypack_processor_output,
         n_threads=n_processes,
         force_overwrite=force_overwrite,
+        archive_format=archive_format,
     )
 
     # SC2EGSet should be ready, move it to the final output directory:
@@ -179,7 +196,7 @@ def prepare_sc2egset(
         input_path=sc2egset_replaypack_processor_output,
         output_path=sc2egset_output,
         force_overwrite=force_overwrite,
-        extension=".zip",
+        extension=ARCHIVE_FORMATS[archive_format],
         recursive=False,
     )
 
@@ -237,6 +254,34 @@ def prepare_sc2egset(
     required=True,
     help="Flag that specifies if the user wants to overwrite files or directories without being prompted.",
 )
+@click.option(
+    "--archive_format",
+    type=click.Choice(list(ARCHIVE_FORMATS), case_sensitive=False),
+    default="zip",
+    required=False,
+    help="Format of the packaged SC2ReSet and SC2EGSet archives. 'tar.zst' requires the zstandard package (datasetpreparator[zstd]). Default is 'zip'.",
+)
+@click.option(
+    "--skip_processed",
+    type=bool,
+    default=False,
+    required=False,
+    help="Flag that specifies if the replaypacks that were processed with SC2InfoExtractorGo from the same input files are skipped. Default is False.",
+)
+@click.option(
+    "--overlap_stages",
+    type=bool,
+    default=False,
+    required=False,
+    help="Flag that specifies if each of the replaypacks is taken through the pipeline on its own, so that a replaypack can be processed with SC2InfoExtractorGo while others are flattened or packaged. Each of the stages has its own pool of workers. Default is False.",
+)
+@click.option(
+    "--n_io_threads",
+    type=int,
+    default=4,
+    required=False,
+    help="Number of replaypacks that are flattened, packaged or moved at the same time when the stages overlap. Default is 4.",
+)
 @click.option(
     "--log",
     type=click.Choice(["INFO", "DEBUG", "ERROR", "WARN"], case_sensitive=False),
@@ -249,6 +294,10 @@ def main(
     maps_path: Path,
     n_processes: int,
     force_overwrite: bool,
+    archive_format: str,
+    skip_processed: bool,
+    overlap_stages: bool,
+    n_io_threads: int,
     log: str,
 ) -> None:
     initialize_logging(log=log)
@@ -267,6 +316,24 @@ def main(
     maps_output_path = Path(maps_path).resolve()
     create_directory(directory=maps_output_path)
     directory_flattener_output_path = Path(output_path, "directory_flattener").resolve()
+    sc2egset_replaypack_processor_output_path = Path(
+        output_path, "sc2egset_replaypack_processor"
+    ).resolve()
+
+    if overlap_stages:
+        prepare_datasets_task_graph(
+            replaypacks_input_path=replaypacks_input_path,
+            output_path=output_path,
+            maps_output_path=maps_output_path,
+            directory_flattener_output_path=directory_flattener_output_path,
+            sc2egset_replaypack_processor_output=sc2egset_replaypack_processor_output_path,
+            n_processes=n_processes,
+            n_io_threads=n_io_threads,
+            force_overwrite=force_overwrite,
+            archive_format=archive_format.lower(),
+            skip_processed=skip_processed,
+        )
+        return
 
     # TODO: Recreate the entire pipeline for SC2ReSet and SC2EGSet:
     prepare_sc2reset(
@@ -276,12 +343,9 @@ def main(
         force_overwrite=force_overwrite,
         maps_output_path=maps_output_path,
         directory_flattener_output_path=directory_flattener_output_path,
+        archive_format=archive_format.lower(),
     )
 
-    sc2egset_replaypack_processor_output_path = Path(
-        output_path, "sc2egset_replaypack_processor"
-    ).resolve()
-
     prepare_sc2egset(
         replaypacks_input_path=directory_flattener_output_path,
         output_path=output_path,
@@ -290,6 +354,8 @@ def main(
         maps_output_path=maps_output_path,
         directory_flattener_output_path=directory_flattener_output_path,
         force_overwrite=force_overwrite,
+        archive_format=archive_format.lower(),
+        skip_processed=skip_processed,
     )
 
 
@@ -71,6 +71,27 @@ from datasetpreparator.utils.user_prompt import (
     required=True,
     help="Flag that specifies if the user wants to overwrite files or directories without being prompted.",
 )
+@click.option(
+    "--scale_max_procs",
+    type=bool,
+    default=False,
+    required=False,
+    help="Flag that specifies if the largest replaypacks are processed with more goroutines, in proportion to their share of the remaining work. Default is False, which processes each replaypack with a single goroutine.",
+)
+@click.option(
+    "--skip_processed",
+    type=bool,
+    default=False,
+    required=False,
+    help="Flag that specifies if the replaypacks that were processed successfully from the same input files are skipped. Default is False.",
+)
+@click.option(
+    "--n_shards",
+    type=int,
+    default=1,
+    required=False,
+    help="Maximal number of shards a large replaypack is split into, the shards are processed at the same time and merged into a single output. Default is 1, which processes each replaypack as a whole.",
+)
 @click.option(
     "--log",
     type=click.Choice(["INFO", "DEBUG", "ERROR", "WARN"], case_sensitive=False),
@@ -83,6 +104,9 @@ def main(
     maps_path: Path,
     n_processes: int,
     force_overwrite: bool,
+    scale_max_procs: bool,
+    skip_processed: bool,
+    n_shards: int,
     log: str,
 ) -> None:
     initialize_logging(log=log)
@@ -123,6 +147,9 @@ def main(
     sc2egset_replaypack_processor(
         arguments=sc2egset_processor_args,
         force_overwrite=force_overwrite,
+        scale_max_procs=scale_max_procs,
+        skip_processed=skip_processed,
+        n_shards=n_shards,
     )
 
 
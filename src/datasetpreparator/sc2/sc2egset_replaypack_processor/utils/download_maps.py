@@ -1,5 +1,7 @@
 import logging
+import subprocess
 from pathlib import Path
+
 from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.multiprocess import (
     pre_process_download_maps,
 )
@@ -12,10 +14,12 @@ def sc2infoextractorgo_map_download(
     input_path: Path,
     maps_directory: Path,
     n_processes: int,
+    check: bool = False,
 ) -> None:
     """
     Downloads all maps contained in the .SC2Replay files in the input directory.
-    Maps are placed in the maps_directory.
+    Maps are placed in the maps_directory. A failed download is logged,
+    the replays whose maps are missing fail later in the processing.
 
     Parameters
     ----------
@@ -26,6 +30,15 @@ def sc2infoextractorgo_map_download(
         Specifies the directory where the maps are stored and will be downloaded to.
     n_processes : int
         Specifies the number of processes to use for downloading the maps.
+    check : bool, optional
+        Specifies if a failed download raises an error, by default False.
+        Used by the pipeline task graph, where the processing of the replaypacks
+        depends on the map download.
+
+    Raises
+    ------
+    subprocess.CalledProcessError
+        If check is set and SC2InfoExtractorGo failed to download the maps.
     """
 
     # Pre-process, download all maps:
@@ -35,4 +48,11 @@ def sc2infoextractorgo_map_download(
         maps_directory=maps_directory,
         n_processes=n_processes,
     )
-    pre_process_download_maps(arguments=map_download_arguments)
+    try:
+        pre_process_download_maps(arguments=map_download_arguments)
+    except subprocess.CalledProcessError as e:
+        logging.error(
+            f"Downloading the maps failed with return code {e.returncode}, the replays without their maps cannot be processed."
+        )
+        if check:
+            raise
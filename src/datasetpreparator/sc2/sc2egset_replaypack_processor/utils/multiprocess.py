@@ -1,25 +1,122 @@
 import logging
+import os
 import shutil
 import subprocess
-from multiprocessing import Pool
+import threading
+import time
+import zipfile
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
 
 from tqdm import tqdm
 
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.processing_markers import (
+    ProcessingMarkers,
+)
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.processing_progress import (
+    ProcessingProgress,
+    parse_progress,
+    write_processing_metrics,
+)
 from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.replaypack_processor_args import (
     ReplaypackProcessorArguments,
     SC2InfoExtractorGoArguments,
     define_sc2egset_args,
 )
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.replaypack_scheduling import (
+    ProcessingHistory,
+    get_max_procs,
+    get_replaypack_size,
+)
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.replaypack_sharding import (
+    MIN_REPLAYS_PER_SHARD,
+    ShardMergeError,
+    get_n_shards,
+    merge_shard_outputs,
+    stage_shards,
+)
 from datasetpreparator.settings import PATH_TO_SC2INFOEXTRACTORGO
 
+# Number of the last characters of the standard error that are logged for a failure:
+MAX_LOGGED_STDERR = 2000
+# Directory in the output directory in which the shards of the replaypacks are staged:
+SHARDS_DIRECTORY_NAME = ".shards"
+
+
+class ProcessingResult:
+    """
+    Result of running SC2InfoExtractorGo on a single replaypack.
+
+    Parameters
+    ----------
+    processing_input : Path
+        Input directory of the replaypack.
+    output : Path
+        Output directory of the replaypack.
+    returncode : int | None
+        Exit code of SC2InfoExtractorGo, None if the process could not be started
+        or the outputs of its shards could not be merged.
+    stdout : str
+        Standard output of the process.
+    stderr : str
+        Standard error of the process, or the error raised when starting it.
+    duration : float
+        Time of the process in seconds, summed over the processes of the shards.
+    replays_processed : int | None, optional
+        Number of the processed replays reported by the process, by default None
+        if the process did not report its progress.
+    started_at : float | None, optional
+        Monotonic time at which the process was started, by default None
+    wall_time : float | None, optional
+        Wall time of the replaypack in seconds, by default None which uses
+        the duration.
+    """
+
+    def __init__(
+        self,
+        processing_input: Path,
+        output: Path,
+        returncode: int | None,
+        stdout: str,
+        stderr: str,
+        duration: float,
+        replays_processed: int | None = None,
+        started_at: float | None = None,
+        wall_time: float | None = None,
+    ):
+        self.processing_input = processing_input
+        self.output = output
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.replays_processed = replays_processed
+        self.started_at = started_at
+        self.wall_time = duration if wall_time is None else wall_time
+
+    @property
+    def succeeded(self) -> bool:
+        return self.returncode == 0
+
 
 def multiprocessing_scheduler(
     processing_arguments: list[SC2InfoExtractorGoArguments],
     number_of_processes: int,
-) -> None:
+    executable: Path = PATH_TO_SC2INFOEXTRACTORGO,
+    costs: list[float] | None = None,
+    n_cpus: int | None = None,
+    n_replays: list[int] | None = None,
+) -> list[ProcessingResult]:
     """
-    Responsible for spawning the multiprocessing_client functions.
+    Runs up to number_of_processes SC2InfoExtractorGo processes at the same time.
+    Each of the processes is supervised by a thread that waits for it to finish,
+    so no Python interpreter is spawned per running process.
+
+    The replaypacks with the highest estimated cost are started first, so that
+    a large replaypack does not start last and leave the other slots idle
+    while it is processed on its own.
 
     Parameters
     ----------
@@ -27,39 +124,329 @@ def multiprocessing_scheduler(
         Processing arguments holds a list of input and output directories \
         for the https://github.com/Kaszanas/SC2InfoExtractorGo
     number_of_processes : int
-        Specifies how many processes will be spawned.
+        Specifies how many processes will be running at the same time.
+    executable : Path, optional
+        Specifies the path to the SC2InfoExtractorGo binary,
+        by default PATH_TO_SC2INFOEXTRACTORGO
+    costs : list[float] | None, optional
+        Specifies the estimated cost of each of the replaypacks, by default None
+        which starts the replaypacks in the order of processing_arguments.
+    n_cpus : int | None, optional
+        Specifies the number of logical cores shared by the processes. If set,
+        the max_procs of each replaypack is set when it is started, in proportion
+        to its share of the remaining cost, by default None which keeps
+        the max_procs of the arguments.
+    n_replays : list[int] | None, optional
+        Specifies the number of replays of each of the inputs. If set, the progress
+        reported by the processes is shown for each of the processes, together with
+        the combined number of processed replays per second, by default None
+
+    Returns
+    -------
+    list[ProcessingResult]
+        Returns the results of the processes in the order in which they finished.
     """
 
-    with Pool(processes=number_of_processes) as pool:
-        pool.imap_unordered(process_single_replaypack, processing_arguments)
-        pool.close()
-        pool.join()
+    if costs is None:
+        costs = [0.0] * len(processing_arguments)
 
+    # Largest first, replaypacks with the same cost keep their order:
+    order = sorted(
+        range(len(processing_arguments)), key=lambda i: costs[i], reverse=True
+    )
+    pending = deque(
+        (
+            costs[i],
+            processing_arguments[i],
+            n_replays[i] if n_replays is not None else None,
+        )
+        for i in order
+    )
+    remaining_cost = sum(costs)
 
-def process_single_replaypack(arguments: SC2InfoExtractorGoArguments) -> None:
+    progress = (
+        ProcessingProgress(total_replays=sum(n_replays))
+        if n_replays is not None
+        else None
+    )
+    results = []
+    running: dict[Future, tuple[float, int]] = {}
+    with (
+        ThreadPoolExecutor(max_workers=number_of_processes) as executor,
+        tqdm(
+            total=len(processing_arguments),
+            desc="Processing replaypacks",
+            unit="replaypack",
+        ) as progress_bar,
+    ):
+        while pending or running:
+            while pending and len(running) < number_of_processes:
+                cost, arguments, job_n_replays = pending.popleft()
+                if n_cpus is not None:
+                    arguments.max_procs = get_max_procs(
+                        cost=cost,
+                        remaining_cost=remaining_cost,
+                        n_cpus=n_cpus,
+                        procs_in_use=sum(procs for _, procs in running.values()),
+                    )
+                    logging.debug(
+                        f"Starting {str(arguments.processing_input)} "
+                        f"with max_procs={arguments.max_procs}"
+                    )
+                future = executor.submit(
+                    process_single_replaypack,
+                    arguments,
+                    executable,
+                    job_n_replays,
+                    progress,
+                )
+                running[future] = (cost, arguments.max_procs)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                cost, _ = running.pop(future)
+                remaining_cost -= cost
+                results.append(future.result())
+                progress_bar.update(1)
+
+    if progress is not None:
+        progress.close()
+
+    return results
+
+
+def shard_replaypacks(
+    processing_arguments: list[SC2InfoExtractorGoArguments],
+    costs: list[float],
+    replaypack_sizes: dict[Path, tuple[int, int]],
+    n_shards: int,
+    min_replays_per_shard: int,
+    staging_path: Path,
+) -> tuple[
+    list[SC2InfoExtractorGoArguments],
+    list[float],
+    list[int],
+    dict[Path, list[SC2InfoExtractorGoArguments]],
+]:
     """
-    Responsible for running a single process that will
-    extract data from a replaypack.
+    Splits the large replaypacks into shards that are processed as separate
+    SC2InfoExtractorGo processes, the other replaypacks are processed as a whole.
 
     Parameters
     ----------
-    arguments : SC2InfoExtractorGoArguments
-        Specifies all of the arguments required to run SC2InfoExtractorGo.
+    processing_arguments : list[SC2InfoExtractorGoArguments]
+        Specifies the arguments of the replaypacks.
+    costs : list[float]
+        Specifies the estimated cost of each of the replaypacks.
+    replaypack_sizes : dict[Path, tuple[int, int]]
+        Specifies the number of the replays and their total size for each
+        of the replaypack inputs.
+    n_shards : int
+        Specifies the maximal number of shards of a replaypack.
+    min_replays_per_shard : int
+        Specifies the minimal number of replays in each of the shards.
+    staging_path : Path
+        Specifies the directory in which the shards are staged.
+
+    Returns
+    -------
+    tuple[list[SC2InfoExtractorGoArguments], list[float], list[int], dict[Path, list[SC2InfoExtractorGoArguments]]]
+        Returns the arguments, the costs and the numbers of replays of the processes,
+        and the arguments of the shards of each of the split replaypack inputs.
+    """
+
+    job_arguments = []
+    job_costs = []
+    job_n_replays = []
+    shards = {}
+    for replaypack_arguments, cost in zip(processing_arguments, costs):
+        n_replays = replaypack_sizes[replaypack_arguments.processing_input][0]
+        n_replaypack_shards = get_n_shards(
+            n_replays=n_replays,
+            n_shards=n_shards,
+            min_replays_per_shard=min_replays_per_shard,
+        )
+        if n_replaypack_shards == 1:
+            job_arguments.append(replaypack_arguments)
+            job_costs.append(cost)
+            job_n_replays.append(n_replays)
+            continue
+
+        logging.info(
+            f"Splitting {str(replaypack_arguments.processing_input)} "
+            f"into {n_replaypack_shards} shards."
+        )
+        shard_arguments = stage_shards(
+            arguments=replaypack_arguments,
+            n_shards=n_replaypack_shards,
+            staging_path=Path(staging_path, replaypack_arguments.output.name),
+        )
+        shards[replaypack_arguments.processing_input] = shard_arguments
+        job_arguments.extend(shard_arguments)
+        job_costs.extend([cost / n_replaypack_shards] * n_replaypack_shards)
+        job_n_replays.extend(
+            get_replaypack_size(processing_input=shard.processing_input)[0]
+            for shard in shard_arguments
+        )
+
+    return job_arguments, job_costs, job_n_replays, shards
+
+
+def merge_sharded_results(
+    results: list[ProcessingResult],
+    processing_arguments: list[SC2InfoExtractorGoArguments],
+    shards: dict[Path, list[SC2InfoExtractorGoArguments]],
+) -> tuple[list[ProcessingResult], list[SC2InfoExtractorGoArguments]]:
     """
+    Merges the outputs and the results of the shards of each of the split
+    replaypacks. The outputs are merged only if all of the shards succeeded.
+    The replaypacks whose outputs are not in the format known to
+    merge_shard_outputs are returned to be processed as a whole.
 
-    # TODO: This needs to be verified, should use Pathlib:
-    # Copying the mapping file that contains directory tree information:
+    Parameters
+    ----------
+    results : list[ProcessingResult]
+        Results of the processes, including the processes of the shards.
+    processing_arguments : list[SC2InfoExtractorGoArguments]
+        Specifies the arguments of the replaypacks.
+    shards : dict[Path, list[SC2InfoExtractorGoArguments]]
+        Specifies the arguments of the shards of each of the split replaypack inputs.
+
+    Returns
+    -------
+    tuple[list[ProcessingResult], list[SC2InfoExtractorGoArguments]]
+        Returns a single result for each of the merged replaypacks, and the
+        arguments of the replaypacks whose shards could not be merged.
+    """
 
-    copy_processed_mapping_file(arguments=arguments)
+    replaypack_inputs = {
+        shard.processing_input: replaypack_input
+        for replaypack_input, shard_arguments in shards.items()
+        for shard in shard_arguments
+    }
+    merged_results = []
+    unmerged_arguments = []
+    shard_results: dict[Path, list[ProcessingResult]] = {}
+    for result in results:
+        if result.processing_input in replaypack_inputs:
+            shard_results.setdefault(
+                replaypack_inputs[result.processing_input], []
+            ).append(result)
+        else:
+            merged_results.append(result)
+
+    for replaypack_arguments in processing_arguments:
+        replaypack_input = replaypack_arguments.processing_input
+        if replaypack_input not in shards:
+            continue
+
+        replaypack_results = shard_results.get(replaypack_input, [])
+        returncode = next(
+            (
+                result.returncode
+                for result in replaypack_results
+                if not result.succeeded
+            ),
+            0,
+        )
+        stderr = "".join(result.stderr for result in replaypack_results)
+        if returncode == 0:
+            try:
+                merge_shard_outputs(
+                    shard_arguments=shards[replaypack_input],
+                    arguments=replaypack_arguments,
+                )
+                copy_processed_mapping_file(arguments=replaypack_arguments)
+            except ShardMergeError as e:
+                logging.warning(
+                    f"Processing {str(replaypack_input)} as a whole, its shards cannot be merged: {e}"
+                )
+                unmerged_arguments.append(replaypack_arguments)
+                continue
+            except (OSError, ValueError, zipfile.BadZipFile) as e:
+                returncode = None
+                stderr += f"Merging the shards failed: {e}"
+
+        replays_processed = [result.replays_processed for result in replaypack_results]
+        started_at = [result.started_at for result in replaypack_results]
+        finished_at = [
+            result.started_at + result.duration for result in replaypack_results
+        ]
+        merged_results.append(
+            ProcessingResult(
+                processing_input=replaypack_input,
+                output=replaypack_arguments.output,
+                returncode=returncode,
+                stdout="".join(result.stdout for result in replaypack_results),
+                stderr=stderr,
+                duration=sum(result.duration for result in replaypack_results),
+                replays_processed=sum(replays_processed)
+                if None not in replays_processed
+                else None,
+                started_at=min(started_at),
+                wall_time=max(finished_at) - min(started_at),
+            )
+        )
 
-    logging.debug(
-        f"Running subprocess for {arguments.processing_input} with output to {arguments.output}",
+    return merged_results, unmerged_arguments
+
+
+def log_processing_summary(results: list[ProcessingResult]) -> list[ProcessingResult]:
+    """
+    Logs the summary of the SC2InfoExtractorGo processes and the errors
+    of the processes that failed.
+
+    Parameters
+    ----------
+    results : list[ProcessingResult]
+        Results of the processes.
+
+    Returns
+    -------
+    list[ProcessingResult]
+        Returns the results of the processes that failed.
+    """
+
+    failed_results = [result for result in results if not result.succeeded]
+    total_duration = sum(result.duration for result in results)
+    logging.info(
+        f"Processed {len(results) - len(failed_results)} of {len(results)} "
+        f"replaypacks successfully, total process time {total_duration:.1f}s."
     )
 
-    # TODO: Check if I can do a pipe from the subprocess to get multiple progress bars:
-    command = [
-        # FIXME hardcoded binary name
-        str(PATH_TO_SC2INFOEXTRACTORGO),
+    for result in failed_results:
+        logging.error(
+            f"Processing {str(result.processing_input)} failed "
+            f"with return code {result.returncode} after {result.duration:.1f}s: "
+            f"{result.stderr.strip()[-MAX_LOGGED_STDERR:]}"
+        )
+
+    return failed_results
+
+
+def get_sc2infoextractorgo_command(
+    arguments: SC2InfoExtractorGoArguments,
+    executable: Path = PATH_TO_SC2INFOEXTRACTORGO,
+) -> list[str]:
+    """
+    Creates the command that runs SC2InfoExtractorGo on a single replaypack.
+
+    Parameters
+    ----------
+    arguments : SC2InfoExtractorGoArguments
+        Specifies all of the arguments required to run SC2InfoExtractorGo.
+    executable : Path, optional
+        Specifies the path to the SC2InfoExtractorGo binary,
+        by default PATH_TO_SC2INFOEXTRACTORGO
+
+    Returns
+    -------
+    list[str]
+        Returns the command with its arguments.
+    """
+
+    return [
+        str(executable),
         f"-input={arguments.processing_input}/",
         f"-output={arguments.output}/",
         f"-perform_integrity_checks={arguments.perform_integrity_checks}",
@@ -74,7 +461,127 @@ def process_single_replaypack(arguments: SC2InfoExtractorGoArguments) -> None:
         "-skip_map_download",
     ]
 
-    subprocess.run(command)
+
+def read_stream(stream, lines: list[str], on_line: Callable[[str], None]) -> None:
+    for line in stream:
+        lines.append(line)
+        on_line(line)
+
+
+def process_single_replaypack(
+    arguments: SC2InfoExtractorGoArguments,
+    executable: Path = PATH_TO_SC2INFOEXTRACTORGO,
+    n_replays: int | None = None,
+    progress: ProcessingProgress | None = None,
+) -> ProcessingResult:
+    """
+    Responsible for running a single process that will
+    extract data from a replaypack. The standard output and error of the process
+    are read while it runs, and the progress reported on either of them
+    is passed to the progress bars.
+
+    Parameters
+    ----------
+    arguments : SC2InfoExtractorGoArguments
+        Specifies all of the arguments required to run SC2InfoExtractorGo.
+    executable : Path, optional
+        Specifies the path to the SC2InfoExtractorGo binary,
+        by default PATH_TO_SC2INFOEXTRACTORGO
+    n_replays : int | None, optional
+        Specifies the number of replays of the input, by default None
+    progress : ProcessingProgress | None, optional
+        Specifies the progress bars that are updated, by default None
+
+    Returns
+    -------
+    ProcessingResult
+        Returns the exit code, the output and the duration of the process.
+        The returncode is None if the mapping could not be copied
+        or the process could not be started.
+    """
+
+    logging.debug(
+        f"Running subprocess for {arguments.processing_input} with output to {arguments.output}",
+    )
+
+    command = get_sc2infoextractorgo_command(arguments=arguments, executable=executable)
+
+    start = time.monotonic()
+    try:
+        # TODO: This needs to be verified, should use Pathlib:
+        # Copying the mapping file that contains directory tree information:
+        copy_processed_mapping_file(arguments=arguments)
+
+        # Universal newlines split the progress bars redrawn with "\r" into lines:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+        )
+    except OSError as e:
+        return ProcessingResult(
+            processing_input=arguments.processing_input,
+            output=arguments.output,
+            returncode=None,
+            stdout="",
+            stderr=str(e),
+            duration=time.monotonic() - start,
+            started_at=start,
+        )
+
+    progress_bar = (
+        progress.start(name=arguments.processing_input.name, n_replays=n_replays)
+        if progress is not None
+        else None
+    )
+    progress_lock = threading.Lock()
+    replays_processed = None
+
+    def report_progress(line: str) -> None:
+        nonlocal replays_processed
+        n_processed = parse_progress(line=line, n_replays=n_replays)
+        if n_processed is None:
+            return
+        with progress_lock:
+            replays_processed = max(n_processed, replays_processed or 0)
+        if progress_bar is not None:
+            progress.update(progress_bar=progress_bar, n_processed=n_processed)
+
+    # Progress bars are usually drawn on the standard error, both of the streams
+    # are read in their own threads so that a full pipe cannot block the process:
+    stdout_lines: list[str] = []
+    stderr_lines: list[str] = []
+    stream_threads = [
+        threading.Thread(
+            target=read_stream, args=(stream, lines, report_progress), daemon=True
+        )
+        for stream, lines in [
+            (process.stdout, stdout_lines),
+            (process.stderr, stderr_lines),
+        ]
+    ]
+    for stream_thread in stream_threads:
+        stream_thread.start()
+    try:
+        process.wait()
+    finally:
+        for stream_thread in stream_threads:
+            stream_thread.join()
+        if progress_bar is not None:
+            progress.finish(progress_bar=progress_bar)
+
+    return ProcessingResult(
+        processing_input=arguments.processing_input,
+        output=arguments.output,
+        returncode=process.returncode,
+        stdout="".join(stdout_lines),
+        stderr="".join(stderr_lines),
+        duration=time.monotonic() - start,
+        replays_processed=replays_processed,
+        started_at=start,
+    )
 
 
 def copy_processed_mapping_file(arguments: SC2InfoExtractorGoArguments) -> None:
@@ -111,19 +618,53 @@ def copy_processed_mapping_file(arguments: SC2InfoExtractorGoArguments) -> None:
 def sc2egset_replaypack_processor(
     arguments: ReplaypackProcessorArguments,
     force_overwrite: bool,
-):
+    executable: Path = PATH_TO_SC2INFOEXTRACTORGO,
+    scale_max_procs: bool = False,
+    skip_processed: bool = False,
+    n_shards: int = 1,
+    min_replays_per_shard: int = MIN_REPLAYS_PER_SHARD,
+) -> list[ProcessingResult]:
     """
     Processes multiple StarCraft II replaypacks
     by using https://github.com/Kaszanas/SC2InfoExtractorGo
 
+    The replaypacks are started largest-first, their cost is estimated from the
+    durations recorded in the earlier runs, or from the size of their replays.
+    The replaypacks that are processed successfully are marked with the
+    fingerprint of their input. The large replaypacks can be split into shards
+    that are processed at the same time and merged into a single output.
+
     Parameters
     ----------
     arguments : ReplaypackProcessorArguments
         Specifies the arguments as per the ReplaypackProcessorArguments class fields.
     force_overwrite : bool
         Specifies whether the output directory should be overwritten.
+    executable : Path, optional
+        Specifies the path to the SC2InfoExtractorGo binary,
+        by default PATH_TO_SC2INFOEXTRACTORGO
+    scale_max_procs : bool, optional
+        Specifies if the replaypacks get more goroutines in proportion to their
+        share of the remaining work, instead of a single goroutine each,
+        by default False
+    skip_processed : bool, optional
+        Specifies if the replaypacks that were processed successfully from the same
+        input files are skipped, by default False
+    n_shards : int, optional
+        Specifies the maximal number of shards a replaypack is split into,
+        by default 1 which processes each of the replaypacks as a whole.
+    min_replays_per_shard : int, optional
+        Specifies the minimal number of replays in each of the shards,
+        by default MIN_REPLAYS_PER_SHARD
+
+    Returns
+    -------
+    list[ProcessingResult]
+        Returns the results of all of the SC2InfoExtractorGo processes.
     """
 
+    processing_markers = ProcessingMarkers.load(output_path=arguments.output_path)
+
     multiprocessing_list = []
     for maybe_dir in tqdm(
         list(arguments.input_path.iterdir()), desc="Defining multiprocessing list"
@@ -132,6 +673,7 @@ def sc2egset_replaypack_processor(
             arguments=arguments,
             maybe_dir=maybe_dir,
             force_overwrite=force_overwrite,
+            processing_markers=processing_markers if skip_processed else None,
         )
         if sc2_info_extractor_go_args is not None:
             logging.debug(
@@ -139,9 +681,113 @@ def sc2egset_replaypack_processor(
             )
             multiprocessing_list.append(sc2_info_extractor_go_args)
 
-    # Run processing with multiple SC2InfoExtractorGo instances:
-    logging.debug("Running multiprocessing_scheduler")
-    multiprocessing_scheduler(multiprocessing_list, int(arguments.n_processes))
+    # Fingerprint the inputs before they are processed, and remove the markers of the
+    # replaypacks whose output will be overwritten, in case the processing is interrupted:
+    for sc2_info_extractor_go_args in multiprocessing_list:
+        processing_markers.get_fingerprint(arguments=sc2_info_extractor_go_args)
+        processing_markers.discard(arguments=sc2_info_extractor_go_args)
+    if multiprocessing_list:
+        processing_markers.save()
+
+    # Estimate the cost of each of the replaypacks to start the largest first:
+    processing_history = ProcessingHistory.load(output_path=arguments.output_path)
+    replaypack_sizes = {
+        sc2_info_extractor_go_args.processing_input: get_replaypack_size(
+            processing_input=sc2_info_extractor_go_args.processing_input
+        )
+        for sc2_info_extractor_go_args in multiprocessing_list
+    }
+    costs = [
+        processing_history.estimate_duration(
+            replaypack_name=sc2_info_extractor_go_args.processing_input.name,
+            n_bytes=replaypack_sizes[sc2_info_extractor_go_args.processing_input][1],
+        )
+        for sc2_info_extractor_go_args in multiprocessing_list
+    ]
+
+    start = time.monotonic()
+    staging_path = Path(arguments.output_path, SHARDS_DIRECTORY_NAME)
+    try:
+        job_arguments, job_costs, job_n_replays, shards = shard_replaypacks(
+            processing_arguments=multiprocessing_list,
+            costs=costs,
+            replaypack_sizes=replaypack_sizes,
+            n_shards=n_shards,
+            min_replays_per_shard=min_replays_per_shard,
+            staging_path=staging_path,
+        )
+
+        # Run processing with multiple SC2InfoExtractorGo instances:
+        logging.debug("Running multiprocessing_scheduler")
+        results = multiprocessing_scheduler(
+            processing_arguments=job_arguments,
+            number_of_processes=int(arguments.n_processes),
+            executable=executable,
+            costs=job_costs,
+            n_cpus=os.cpu_count() if scale_max_procs else None,
+            n_replays=job_n_replays,
+        )
+        results, unmerged_arguments = merge_sharded_results(
+            results=results,
+            processing_arguments=multiprocessing_list,
+            shards=shards,
+        )
+        if unmerged_arguments:
+            results += multiprocessing_scheduler(
+                processing_arguments=unmerged_arguments,
+                number_of_processes=int(arguments.n_processes),
+                executable=executable,
+                n_replays=[
+                    replaypack_sizes[unmerged.processing_input][0]
+                    for unmerged in unmerged_arguments
+                ],
+            )
+    finally:
+        # The staged shards would be packaged with the processed replaypacks:
+        shutil.rmtree(staging_path, ignore_errors=True)
+    log_processing_summary(results=results)
+
+    arguments_by_input = {
+        sc2_info_extractor_go_args.processing_input: sc2_info_extractor_go_args
+        for sc2_info_extractor_go_args in multiprocessing_list
+    }
+    for result in results:
+        if not result.succeeded:
+            continue
+        processing_markers.mark_processed(
+            arguments=arguments_by_input[result.processing_input]
+        )
+        n_replays, n_bytes = replaypack_sizes[result.processing_input]
+        processing_history.record(
+            replaypack_name=result.processing_input.name,
+            n_replays=n_replays,
+            n_bytes=n_bytes,
+            duration=result.wall_time,
+            process_time=result.duration,
+        )
+    if results:
+        processing_markers.save()
+        processing_history.save()
+        metrics_path = write_processing_metrics(
+            output_path=arguments.output_path,
+            replaypacks=[
+                {
+                    "name": result.processing_input.name,
+                    "n_replays": replaypack_sizes[result.processing_input][0],
+                    "n_bytes": replaypack_sizes[result.processing_input][1],
+                    "replays_processed": result.replays_processed,
+                    "wall_time": result.wall_time,
+                    "process_time": result.duration,
+                    "returncode": result.returncode,
+                    "succeeded": result.succeeded,
+                }
+                for result in results
+            ],
+            wall_time=time.monotonic() - start,
+        )
+        logging.info(f"Processing metrics written to {str(metrics_path)}")
+
+    return results
 
 
 def pre_process_download_maps(arguments: SC2InfoExtractorGoArguments) -> None:
@@ -156,6 +802,11 @@ def pre_process_download_maps(arguments: SC2InfoExtractorGoArguments) -> None:
     ----------
     arguments : SC2InfoExtractorGoArguments
         Specifies all of the arguments required to run SC2InfoExtractorGo.
+
+    Raises
+    ------
+    subprocess.CalledProcessError
+        If SC2InfoExtractorGo failed to download the maps.
     """
 
     command = [
@@ -168,4 +819,5 @@ def pre_process_download_maps(arguments: SC2InfoExtractorGoArguments) -> None:
         "-log_dir=logs/",
     ]
 
-    subprocess.run(command)
+    # The replays cannot be processed without their maps:
+    subprocess.run(command, check=True)
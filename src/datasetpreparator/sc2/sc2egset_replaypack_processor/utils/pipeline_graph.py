@@ -0,0 +1,486 @@
+import logging
+import shutil
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from datasetpreparator.directory_flattener.directory_flattener import (
+    MultiprocessFlattenArguments,
+    multiprocess_directory_flattener,
+)
+from datasetpreparator.directory_packager.directory_packager import (
+    ARCHIVE_FORMATS,
+    PACKAGING_MEMBERS_PER_WORKER,
+    DirectoryPackagerArguments,
+    dir_packager,
+)
+from datasetpreparator.directory_packager.utils.compression import (
+    is_zstandard_installed,
+)
+from datasetpreparator.file_renamer.file_renamer import file_renamer
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.download_maps import (
+    sc2infoextractorgo_map_download,
+)
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.multiprocess import (
+    log_processing_summary,
+    process_single_replaypack,
+)
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.processing_markers import (
+    ProcessingMarkers,
+)
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.replaypack_processor_args import (
+    ReplaypackProcessorArguments,
+    define_sc2egset_args,
+)
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.replaypack_scheduling import (
+    get_replaypack_size,
+)
+from datasetpreparator.utils.scandir_walker import list_subdirectories
+from datasetpreparator.utils.task_graph import PipelineTask, TaskGraph
+from datasetpreparator.utils.user_prompt import user_prompt_overwrite_ok
+
+# Stages of the pipeline, each of the stages has its own pool of workers:
+FLATTEN_STAGE = "flatten"
+DOWNLOAD_MAPS_STAGE = "download_maps"
+PROCESS_STAGE = "process"
+PACKAGE_STAGE = "package"
+FILES_STAGE = "files"
+
+
+def get_stage_workers(n_processes: int, n_io_threads: int) -> dict[str, int]:
+    """
+    Calculates the number of workers of each of the stages. The SC2InfoExtractorGo
+    processes are limited by n_processes, the stages bound by the disk
+    by n_io_threads. The maps of all of the replaypacks are downloaded
+    by a single task.
+
+    Parameters
+    ----------
+    n_processes : int
+        Number of the SC2InfoExtractorGo processes that run at the same time.
+    n_io_threads : int
+        Number of the replaypacks that are flattened, packaged or moved at the same time.
+
+    Returns
+    -------
+    dict[str, int]
+        Returns the number of the workers of each of the stages.
+    """
+
+    return {
+        FLATTEN_STAGE: n_io_threads,
+        DOWNLOAD_MAPS_STAGE: 1,
+        PROCESS_STAGE: n_processes,
+        PACKAGE_STAGE: n_io_threads,
+        FILES_STAGE: n_io_threads,
+    }
+
+
+class ReplaypackPipelineTasks:
+    """
+    Tasks that take a single replaypack through all of the steps required to
+    prepare SC2ReSet and SC2EGSet, in the same way as prepare_sc2reset and
+    prepare_sc2egset do for all of the replaypacks at once.
+
+    Parameters
+    ----------
+    directory_flattener_output_path : Path
+        Path where the directory flattener output is placed.
+    sc2egset_replaypack_processor_output : Path
+        Path where the SC2InfoExtractorGo output is placed.
+    sc2reset_output_path : Path
+        Path where the SC2ReSet archives are moved.
+    sc2egset_output_path : Path
+        Path where the SC2EGSet archives are moved.
+    maps_output_path : Path
+        Path where the maps are downloaded.
+    n_processes : int
+        Number of the SC2InfoExtractorGo processes, and of the worker processes
+        that compress the archives.
+    force_overwrite : bool
+        Flag that specifies if the user wants to overwrite files or directories without being prompted.
+        The user is prompted by confirm_overwrite, before the tasks are started.
+    compression_executor : Executor
+        Executor shared by all of the archives to compress their files.
+    archive_format : str, optional
+        Format of the packaged archives, one of ARCHIVE_FORMATS, by default "zip"
+    skip_processed : bool, optional
+        Flag that specifies if the replaypacks that were processed from the same
+        input files are not processed again, by default False
+    """
+
+    def __init__(
+        self,
+        directory_flattener_output_path: Path,
+        sc2egset_replaypack_processor_output: Path,
+        sc2reset_output_path: Path,
+        sc2egset_output_path: Path,
+        maps_output_path: Path,
+        n_processes: int,
+        force_overwrite: bool,
+        compression_executor: Executor,
+        archive_format: str = "zip",
+        skip_processed: bool = False,
+    ):
+        self.directory_flattener_output_path = directory_flattener_output_path
+        self.sc2egset_replaypack_processor_output = sc2egset_replaypack_processor_output
+        self.sc2reset_output_path = sc2reset_output_path
+        self.sc2egset_output_path = sc2egset_output_path
+        self.maps_output_path = maps_output_path
+        self.n_processes = n_processes
+        self.force_overwrite = force_overwrite
+        self.compression_executor = compression_executor
+        self.archive_format = archive_format
+        self.skip_processed = skip_processed
+
+        self.processing_markers = ProcessingMarkers.load(
+            output_path=sc2egset_replaypack_processor_output
+        )
+        self.markers_lock = threading.Lock()
+        self.processor_arguments = ReplaypackProcessorArguments(
+            input_path=directory_flattener_output_path,
+            output_path=sc2egset_replaypack_processor_output,
+            n_processes=n_processes,
+            maps_directory=maps_output_path,
+        )
+
+    def confirm_overwrite(self, input_directory: Path) -> bool:
+        """
+        Asks if the outputs of a replaypack can be overwritten. The tasks run in
+        the worker threads, where the prompts of multiple replaypacks would be
+        mixed, so the user is asked before the tasks are started and the tasks
+        overwrite the confirmed outputs without asking.
+
+        Parameters
+        ----------
+        input_directory : Path
+            Input directory of the replaypack.
+
+        Returns
+        -------
+        bool
+            Returns True if all of the outputs of the replaypack can be overwritten,
+            False if the replaypack should be skipped.
+        """
+
+        name = input_directory.name
+        extension = ARCHIVE_FORMATS[self.archive_format]
+        flattened_path = Path(self.directory_flattener_output_path, name).resolve()
+        processed_path = Path(self.sc2egset_replaypack_processor_output, name).resolve()
+        output_paths = [
+            flattened_path,
+            flattened_path.with_suffix(extension),
+            Path(self.sc2reset_output_path, flattened_path.with_suffix(extension).name),
+            processed_path,
+            processed_path.with_suffix(extension),
+            Path(self.sc2egset_output_path, processed_path.with_suffix(extension).name),
+        ]
+
+        return all(
+            user_prompt_overwrite_ok(path=path, force_overwrite=self.force_overwrite)
+            for path in output_paths
+        )
+
+    def flatten(self, input_directory: Path) -> bool:
+        flattened = multiprocess_directory_flattener(
+            directories_to_process=[
+                MultiprocessFlattenArguments(
+                    dir_output_path=Path(
+                        self.directory_flattener_output_path, input_directory.name
+                    ).resolve(),
+                    maybe_dir=input_directory.resolve(),
+                    file_extension=".SC2Replay",
+                    # Confirmed by confirm_overwrite:
+                    force_overwrite=True,
+                )
+            ],
+            n_processes=1,
+        )
+        # Replaypacks without any replays are not processed further:
+        return bool(flattened)
+
+    def download_maps(self, replaypacks_input_path: Path) -> None:
+        sc2infoextractorgo_map_download(
+            input_path=replaypacks_input_path,
+            maps_directory=self.maps_output_path,
+            n_processes=self.n_processes,
+            check=True,
+        )
+
+    def process(self, replaypack_name: str) -> bool:
+        sc2_info_extractor_go_args = define_sc2egset_args(
+            arguments=self.processor_arguments,
+            maybe_dir=Path(self.directory_flattener_output_path, replaypack_name),
+            # Confirmed by confirm_overwrite:
+            force_overwrite=True,
+            processing_markers=self.processing_markers if self.skip_processed else None,
+        )
+        if sc2_info_extractor_go_args is None:
+            return False
+
+        self.processing_markers.get_fingerprint(arguments=sc2_info_extractor_go_args)
+        with self.markers_lock:
+            self.processing_markers.discard(arguments=sc2_info_extractor_go_args)
+            self.processing_markers.save()
+
+        result = process_single_replaypack(arguments=sc2_info_extractor_go_args)
+        log_processing_summary(results=[result])
+        if not result.succeeded:
+            raise RuntimeError(
+                f"SC2InfoExtractorGo failed to process {replaypack_name} with exit code {result.returncode}"
+            )
+
+        with self.markers_lock:
+            self.processing_markers.mark_processed(arguments=sc2_info_extractor_go_args)
+            self.processing_markers.save()
+
+        return True
+
+    def rename(self, replaypack_name: str) -> None:
+        file_renamer(
+            input_path=Path(self.sc2egset_replaypack_processor_output, replaypack_name)
+        )
+
+    def package(self, directory_path: Path) -> Path:
+        return dir_packager(
+            DirectoryPackagerArguments(
+                directory_path=directory_path.resolve(),
+                # Confirmed by confirm_overwrite:
+                force_overwrite=True,
+                executor=self.compression_executor,
+                max_pending_members=PACKAGING_MEMBERS_PER_WORKER * self.n_processes,
+                archive_format=self.archive_format,
+                n_threads=self.n_processes,
+            )
+        )
+
+    def move(self, directory_path: Path, output_path: Path) -> None:
+        archive_path = directory_path.resolve().with_suffix(
+            ARCHIVE_FORMATS[self.archive_format]
+        )
+        logging.debug(f"Moving {str(archive_path)} to {str(output_path)}")
+        shutil.move(archive_path, Path(output_path, archive_path.name))
+
+    def add_map_download(
+        self, task_graph: TaskGraph, replaypacks_input_path: Path
+    ) -> str:
+        """
+        Adds a single task that downloads the maps of all of the replaypacks.
+        SC2InfoExtractorGo searches the input replaypacks recursively, so the maps
+        are downloaded while the replaypacks are flattened, and it cannot download
+        the maps while other instances process the replays with the same
+        maps directory.
+
+        Parameters
+        ----------
+        task_graph : TaskGraph
+            Graph to which the task is added.
+        replaypacks_input_path : Path
+            Input directory containing multiple replaypacks.
+
+        Returns
+        -------
+        str
+            Returns the name of the task, that the processing of every replaypack
+            depends on.
+        """
+
+        return task_graph.add_task(
+            name=DOWNLOAD_MAPS_STAGE,
+            stage=DOWNLOAD_MAPS_STAGE,
+            function=partial(
+                self.download_maps, replaypacks_input_path=replaypacks_input_path
+            ),
+        )
+
+    def add_replaypack(
+        self,
+        task_graph: TaskGraph,
+        input_directory: Path,
+        download_maps: str,
+    ) -> None:
+        """
+        Adds the tasks of a single replaypack to the graph. The SC2ReSet archive
+        is packaged as soon as the replaypack is flattened, at the same time
+        as it is processed by SC2InfoExtractorGo.
+
+        Parameters
+        ----------
+        task_graph : TaskGraph
+            Graph to which the tasks are added.
+        input_directory : Path
+            Input directory of the replaypack.
+        download_maps : str
+            Name of the task that downloads the maps, returned by add_map_download.
+        """
+
+        name = input_directory.name
+        flattened_path = Path(self.directory_flattener_output_path, name)
+        processed_path = Path(self.sc2egset_replaypack_processor_output, name)
+        # Larger replaypacks are started first in each of the stages:
+        priority = get_replaypack_size(processing_input=input_directory)[1]
+        add_task = partial(task_graph.add_task, priority=priority)
+
+        flatten = add_task(
+            name=f"{FLATTEN_STAGE}:{name}",
+            stage=FLATTEN_STAGE,
+            function=partial(self.flatten, input_directory=input_directory),
+        )
+
+        package_sc2reset = add_task(
+            name=f"package_sc2reset:{name}",
+            stage=PACKAGE_STAGE,
+            function=partial(self.package, directory_path=flattened_path),
+            dependencies=[flatten],
+        )
+        add_task(
+            name=f"move_sc2reset:{name}",
+            stage=FILES_STAGE,
+            function=partial(
+                self.move,
+                directory_path=flattened_path,
+                output_path=self.sc2reset_output_path,
+            ),
+            dependencies=[package_sc2reset],
+        )
+
+        process = add_task(
+            name=f"{PROCESS_STAGE}:{name}",
+            stage=PROCESS_STAGE,
+            function=partial(self.process, replaypack_name=name),
+            dependencies=[flatten, download_maps],
+        )
+        # The processed_mapping.json is copied by process_single_replaypack:
+        rename = add_task(
+            name=f"rename:{name}",
+            stage=FILES_STAGE,
+            function=partial(self.rename, replaypack_name=name),
+            dependencies=[process],
+        )
+        package_sc2egset = add_task(
+            name=f"package_sc2egset:{name}",
+            stage=PACKAGE_STAGE,
+            function=partial(self.package, directory_path=processed_path),
+            dependencies=[rename],
+        )
+        add_task(
+            name=f"move_sc2egset:{name}",
+            stage=FILES_STAGE,
+            function=partial(
+                self.move,
+                directory_path=processed_path,
+                output_path=self.sc2egset_output_path,
+            ),
+            dependencies=[package_sc2egset],
+        )
+
+
+def prepare_datasets_task_graph(
+    replaypacks_input_path: Path,
+    output_path: Path,
+    maps_output_path: Path,
+    directory_flattener_output_path: Path,
+    sc2egset_replaypack_processor_output: Path,
+    n_processes: int,
+    n_io_threads: int,
+    force_overwrite: bool,
+    archive_format: str = "zip",
+    skip_processed: bool = False,
+) -> dict[str, PipelineTask]:
+    """
+    Prepares SC2ReSet and SC2EGSet with a graph of per-replaypack tasks, so that
+    a replaypack can be processed by SC2InfoExtractorGo while another one is
+    flattened and a third one is packaged.
+
+    Parameters
+    ----------
+    replaypacks_input_path : Path
+        Input directory containing multiple replaypacks.
+    output_path : Path
+        Output path where the SC2ReSet and SC2EGSet directories are placed.
+    maps_output_path : Path
+        Path where the maps will be downloaded.
+    directory_flattener_output_path : Path
+        Path where the directory flattener output will be placed.
+    sc2egset_replaypack_processor_output : Path
+        Path where the SC2InfoExtractorGo output will be placed.
+    n_processes : int
+        Number of the SC2InfoExtractorGo processes that run at the same time,
+        and of the worker processes that compress the archives.
+    n_io_threads : int
+        Number of the replaypacks that are flattened, packaged or moved at the same time.
+    force_overwrite : bool
+        Flag that specifies if the user wants to overwrite files or directories without being prompted.
+    archive_format : str, optional
+        Format of the packaged archives, one of ARCHIVE_FORMATS, by default "zip"
+    skip_processed : bool, optional
+        Flag that specifies if the replaypacks that were processed from the same
+        input files are not processed again, by default False
+
+    Returns
+    -------
+    dict[str, PipelineTask]
+        Returns the tasks of the pipeline by their names.
+    """
+
+    if archive_format == "tar.zst" and not is_zstandard_installed():
+        logging.error(
+            "tar.zst archives require the zstandard package, install it with: pip install datasetpreparator[zstd]"
+        )
+        return {}
+
+    sc2reset_output_path = Path(output_path, "SC2ReSet").resolve()
+    sc2egset_output_path = Path(output_path, "SC2EGSet").resolve()
+    for directory in [
+        directory_flattener_output_path,
+        sc2reset_output_path,
+        sc2egset_output_path,
+    ]:
+        if user_prompt_overwrite_ok(path=directory, force_overwrite=force_overwrite):
+            directory.mkdir(exist_ok=True)
+    sc2egset_replaypack_processor_output.mkdir(parents=True, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=n_processes) as compression_executor:
+        pipeline_tasks = ReplaypackPipelineTasks(
+            directory_flattener_output_path=directory_flattener_output_path,
+            sc2egset_replaypack_processor_output=sc2egset_replaypack_processor_output,
+            sc2reset_output_path=sc2reset_output_path,
+            sc2egset_output_path=sc2egset_output_path,
+            maps_output_path=maps_output_path,
+            n_processes=n_processes,
+            force_overwrite=force_overwrite,
+            compression_executor=compression_executor,
+            archive_format=archive_format,
+            skip_processed=skip_processed,
+        )
+
+        task_graph = TaskGraph()
+        download_maps = pipeline_tasks.add_map_download(
+            task_graph=task_graph, replaypacks_input_path=replaypacks_input_path
+        )
+        for input_directory in list_subdirectories(input_path=replaypacks_input_path):
+            if not pipeline_tasks.confirm_overwrite(input_directory=input_directory):
+                logging.info(
+                    f"Not overwriting the outputs of {str(input_directory)}, skipping."
+                )
+                continue
+            pipeline_tasks.add_replaypack(
+                task_graph=task_graph,
+                input_directory=input_directory,
+                download_maps=download_maps,
+            )
+
+        tasks = task_graph.run(
+            stage_workers=get_stage_workers(
+                n_processes=n_processes, n_io_threads=n_io_threads
+            )
+        )
+
+    failed_tasks = [task.name for task in tasks.values() if task.status == "failed"]
+    if failed_tasks:
+        logging.error(
+            f"{len(failed_tasks)} of {len(tasks)} pipeline tasks failed: {', '.join(failed_tasks)}"
+        )
+
+    return tasks
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.replaypack_processor_args import (
+    SC2InfoExtractorGoArguments,
+)
+
+# Name of the file in the output directory that marks the processed replaypacks:
+PROCESSING_MARKERS_FILENAME = ".processing_markers.json"
+
+
+def get_replaypack_fingerprint(arguments: SC2InfoExtractorGoArguments) -> str:
+    """
+    Calculates the fingerprint of the input of a replaypack, from the relative path,
+    size and modification time of each of its files, and from the SC2InfoExtractorGo
+    arguments that change the processed output. The replays themselves are not read.
+
+    Parameters
+    ----------
+    arguments : SC2InfoExtractorGoArguments
+        Specifies the arguments of the replaypack.
+
+    Returns
+    -------
+    str
+        Returns the hex digest of the fingerprint.
+    """
+
+    fingerprint = hashlib.sha256()
+    for option in (
+        arguments.perform_integrity_checks,
+        arguments.perform_validity_checks,
+        arguments.perform_cleanup,
+        arguments.perform_chat_anonymization,
+        arguments.number_of_packages,
+    ):
+        fingerprint.update(f"{option}\n".encode())
+
+    files = []
+    for root, _, filenames in os.walk(arguments.processing_input):
+        for filename in filenames:
+            filepath = os.path.join(root, filename)
+            stat_result = os.stat(filepath)
+            relative_path = Path(filepath).relative_to(arguments.processing_input)
+            files.append(
+                f"{relative_path.as_posix()}\t{stat_result.st_size}\t{stat_result.st_mtime_ns}\n"
+            )
+
+    for file in sorted(files):
+        fingerprint.update(file.encode())
+
+    return fingerprint.hexdigest()
+
+
+class ProcessingMarkers:
+    """
+    Marks the replaypacks that were processed successfully, together with
+    the fingerprint of their input. The markers are kept in a single file in the
+    output directory, so they are not packaged with the processed replaypacks.
+
+    Parameters
+    ----------
+    markers_path : Path
+        Specifies the path to the markers file.
+    """
+
+    def __init__(self, markers_path: Path):
+        self.markers_path = markers_path
+        self.markers: dict[str, dict] = {}
+        self.fingerprints: dict[Path, str] = {}
+
+    @staticmethod
+    def load(output_path: Path) -> "ProcessingMarkers":
+        """
+        Loads the markers stored in the output directory. Missing or
+        corrupted markers are treated as empty.
+
+        Parameters
+        ----------
+        output_path : Path
+            Specifies the output directory of the processed replaypacks.
+
+        Returns
+        -------
+        ProcessingMarkers
+            Returns the loaded markers.
+        """
+
+        processing_markers = ProcessingMarkers(
+            markers_path=Path(output_path, PROCESSING_MARKERS_FILENAME)
+        )
+        try:
+            with processing_markers.markers_path.open(
+                "r", encoding="utf-8"
+            ) as markers_file:
+                processing_markers.markers = json.load(markers_file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring the unreadable processing markers: {e}")
+
+        return processing_markers
+
+    def get_fingerprint(self, arguments: SC2InfoExtractorGoArguments) -> str:
+        # The fingerprint is calculated once, so that the recorded fingerprint
+        # is the one of the input as it was before processing:
+        if arguments.processing_input not in self.fingerprints:
+            self.fingerprints[arguments.processing_input] = get_replaypack_fingerprint(
+                arguments=arguments
+            )
+
+        return self.fingerprints[arguments.processing_input]
+
+    def is_processed(self, arguments: SC2InfoExtractorGoArguments) -> bool:
+        """
+        Checks if the replaypack was processed successfully from the same input,
+        and its output directory still exists.
+
+        Parameters
+        ----------
+        arguments : SC2InfoExtractorGoArguments
+            Specifies the arguments of the replaypack.
+
+        Returns
+        -------
+        bool
+            True if the replaypack can be skipped, False otherwise.
+        """
+
+        marker = self.markers.get(arguments.output.name)
+        return (
+            marker is not None
+            and marker["fingerprint"] == self.get_fingerprint(arguments=arguments)
+            and arguments.output.is_dir()
+        )
+
+    def mark_processed(self, arguments: SC2InfoExtractorGoArguments) -> None:
+        self.markers[arguments.output.name] = {
+            "input": str(arguments.processing_input),
+            "fingerprint": self.get_fingerprint(arguments=arguments),
+        }
+
+    def discard(self, arguments: SC2InfoExtractorGoArguments) -> None:
+        self.markers.pop(arguments.output.name, None)
+
+    def save(self) -> None:
+        self.markers_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.markers_path.with_name(f"{self.markers_path.name}.tmp")
+        with temporary_path.open("w", encoding="utf-8") as markers_file:
+            json.dump(self.markers, markers_file, indent=4)
+        os.replace(temporary_path, self.markers_path)
@@ -0,0 +1,140 @@
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+from tqdm import tqdm
+
+# Name of the file in the output directory that holds the metrics of the last run:
+PROCESSING_METRICS_FILENAME = ".processing_metrics.json"
+# Progress reported by SC2InfoExtractorGo as the number of processed replays
+# out of all of the replays, for example "123/4567". Decimals such as "1.2/3.4 MB"
+# and dates such as "2024/01/02" of the log lines are not matched:
+PROGRESS_PATTERN = re.compile(r"(?<![\d./])(\d+)\s*/\s*(\d+)(?![\d./])")
+
+
+def parse_progress(line: str, n_replays: int | None = None) -> int | None:
+    """
+    Parses the number of processed replays from a line of the output of
+    SC2InfoExtractorGo. The last match of PROGRESS_PATTERN in the line is used.
+
+    Parameters
+    ----------
+    line : str
+        Line of the standard output or error of SC2InfoExtractorGo.
+    n_replays : int | None, optional
+        Number of the replays of the processed input, by default None. If the
+        reported total is different, for example when SC2InfoExtractorGo counts
+        the files it found, the progress is scaled to this number of replays.
+
+    Returns
+    -------
+    int | None
+        Returns the number of processed replays, None if the line does not report
+        the progress.
+    """
+
+    for match in reversed(PROGRESS_PATTERN.findall(line)):
+        processed, total = int(match[0]), int(match[1])
+        if total == 0 or processed > total:
+            continue
+        if n_replays is not None and total != n_replays:
+            return processed * n_replays // total
+        return processed
+
+    return None
+
+
+class ProcessingProgress:
+    """
+    Shows a progress bar of the replays processed by all of the SC2InfoExtractorGo
+    processes, with the combined number of replays per second, and a progress bar
+    for each of the running processes.
+
+    Parameters
+    ----------
+    total_replays : int
+        Number of the replays of all of the processed inputs.
+    """
+
+    def __init__(self, total_replays: int):
+        self.lock = threading.Lock()
+        self.replays_bar = tqdm(
+            total=total_replays,
+            desc="Processed replays",
+            unit="replay",
+        )
+
+    def start(self, name: str, n_replays: int | None) -> tqdm:
+        with self.lock:
+            return tqdm(total=n_replays, desc=name, unit="replay", leave=False)
+
+    def update(self, progress_bar: tqdm, n_processed: int) -> None:
+        with self.lock:
+            # The processes may report the progress out of order:
+            n_new = n_processed - progress_bar.n
+            if n_new <= 0:
+                return
+            progress_bar.update(n_new)
+            self.replays_bar.update(n_new)
+
+    def finish(self, progress_bar: tqdm) -> None:
+        with self.lock:
+            progress_bar.close()
+
+    def close(self) -> None:
+        with self.lock:
+            self.replays_bar.close()
+
+
+def write_processing_metrics(
+    output_path: Path,
+    replaypacks: list[dict],
+    wall_time: float,
+) -> Path:
+    """
+    Writes the metrics of a processing run to the output directory.
+
+    Parameters
+    ----------
+    output_path : Path
+        Specifies the output directory of the processed replaypacks.
+    replaypacks : list[dict]
+        Metrics of each of the replaypacks, with their "n_replays",
+        "replays_processed", "wall_time" and "succeeded".
+    wall_time : float
+        Wall time of the whole run in seconds.
+
+    Returns
+    -------
+    Path
+        Returns the path to the metrics file.
+    """
+
+    # The throughput counts only the replays that were reported as processed,
+    # not the replays of the replaypacks that failed:
+    n_replays_processed = sum(
+        replaypack["replays_processed"] or 0 for replaypack in replaypacks
+    )
+    metrics = {
+        "wall_time": wall_time,
+        "n_replaypacks": len(replaypacks),
+        "n_failed_replaypacks": sum(
+            not replaypack["succeeded"] for replaypack in replaypacks
+        ),
+        "n_replays": sum(replaypack["n_replays"] for replaypack in replaypacks),
+        "n_replays_processed": n_replays_processed,
+        "replays_per_second": n_replays_processed / wall_time
+        if wall_time > 0
+        else None,
+        "n_cpus": os.cpu_count(),
+        "replaypacks": replaypacks,
+    }
+
+    metrics_path = Path(output_path, PROCESSING_METRICS_FILENAME)
+    metrics_path.parent.mkdir(parents=True, exist_ok=True)
+    with metrics_path.open("w", encoding="utf-8") as metrics_file:
+        json.dump(metrics, metrics_file, indent=4)
+
+    return metrics_path
@@ -1,9 +1,15 @@
 import logging
-from pathlib import Path
 import os
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 from datasetpreparator.utils.user_prompt import user_prompt_overwrite_ok
 
+if TYPE_CHECKING:
+    from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.processing_markers import (
+        ProcessingMarkers,
+    )
+
 
 class SC2InfoExtractorGoArguments:
     """
@@ -207,7 +213,8 @@ def define_sc2egset_args(
     arguments: ReplaypackProcessorArguments,
     maybe_dir: Path,
     force_overwrite: bool,
-) -> ReplaypackProcessorArguments | None:
+    processing_markers: "ProcessingMarkers | None" = None,
+) -> SC2InfoExtractorGoArguments | None:
     """
     Creates final ReplaypackProcessorArguments for SC2InfoExtractorGo. These arguments
     are used to perform extraction of the data from a replaypack with the same arguments
@@ -221,11 +228,16 @@ def define_sc2egset_args(
         Directory that is being processed
     force_overwrite : bool
         Specifies if the output directory should forcefully overwriten without asking the user.
+    processing_markers : ProcessingMarkers | None, optional
+        Specifies the markers of the processed replaypacks, the replaypacks that were
+        processed from the same input are skipped, by default None which
+        processes all of the replaypacks.
 
     Returns
     -------
-    ReplaypackProcessorArguments | None
-        _description_
+    SC2InfoExtractorGoArguments | None
+        Returns the arguments for SC2InfoExtractorGo, None if the directory
+        should not be processed.
     """
 
     input_path = arguments.input_path
@@ -237,13 +249,7 @@ def define_sc2egset_args(
         logging.debug("Entry is not a directory, skipping!")
         return None
 
-    logging.debug(f"Output dir: {output_path}")
-    # Create the main output directory:
-    if not user_prompt_overwrite_ok(path=output_path, force_overwrite=force_overwrite):
-        output_path.mkdir(exist_ok=True)
-
-    # TODO: use pathlib:
-    path, output_directory_name = os.path.split(maybe_dir)
+    output_directory_name = maybe_dir.name
     logging.debug(f"Output dir name: {output_directory_name}")
     if output_directory_name == "input":
         return None
@@ -251,12 +257,6 @@ def define_sc2egset_args(
     output_directory_with_name = Path(output_path, output_directory_name).resolve()
     logging.debug(f"Output filepath: {output_directory_with_name}")
 
-    # Create the output subdirectories:
-    if not user_prompt_overwrite_ok(
-        path=output_directory_with_name, force_overwrite=force_overwrite
-    ):
-        output_directory_with_name.mkdir(exist_ok=True)
-
     sc2_info_extractor_go_args = (
         SC2InfoExtractorGoArguments.get_sc2egset_processing_args(
             processing_input=processing_input_dir,
@@ -266,6 +266,20 @@ def define_sc2egset_args(
         )
     )
 
+    if processing_markers is not None and processing_markers.is_processed(
+        arguments=sc2_info_extractor_go_args
+    ):
+        logging.info(f"Replaypack {output_directory_name} was processed, skipping.")
+        return None
+
+    # Create the output subdirectories, unless the user does not want to overwrite them:
+    if not user_prompt_overwrite_ok(
+        path=output_directory_with_name, force_overwrite=force_overwrite
+    ):
+        logging.info(f"Not overwriting {str(output_directory_with_name)}, skipping.")
+        return None
+    output_directory_with_name.mkdir(parents=True, exist_ok=True)
+
     logging.debug(f"Finished creating args for {maybe_dir}")
 
     return sc2_info_extractor_go_args
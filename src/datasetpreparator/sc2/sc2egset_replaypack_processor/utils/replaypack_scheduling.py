@@ -0,0 +1,187 @@
+import json
+import logging
+import math
+import os
+from pathlib import Path
+
+# Name of the file in the output directory that holds the durations of earlier runs:
+PROCESSING_HISTORY_FILENAME = ".processing_history.json"
+
+
+def get_replaypack_size(processing_input: Path) -> tuple[int, int]:
+    """
+    Counts the .SC2Replay files of a replaypack and their total size.
+
+    Parameters
+    ----------
+    processing_input : Path
+        Input directory of the replaypack, searched recursively.
+
+    Returns
+    -------
+    tuple[int, int]
+        Returns the number of the replays and their total size in bytes.
+    """
+
+    n_replays = 0
+    n_bytes = 0
+    for root, _, filenames in os.walk(processing_input):
+        for filename in filenames:
+            if not filename.endswith(".SC2Replay"):
+                continue
+            n_replays += 1
+            n_bytes += os.path.getsize(os.path.join(root, filename))
+
+    return n_replays, n_bytes
+
+
+class ProcessingHistory:
+    """
+    Durations of the earlier SC2InfoExtractorGo runs, used to estimate how long
+    each of the replaypacks will take to process. The replaypacks that were
+    processed before with the same size are estimated by their recorded process
+    time, other replaypacks by their size and the average processing rate of the
+    recorded replaypacks.
+
+    Each of the replaypacks records its wall time as "duration", and the time of
+    its processes summed over its shards as "process_time". The estimates use
+    the process time, the work that is split between the shards of a replaypack,
+    which is the same as the wall time for the replaypacks that were not split.
+
+    Parameters
+    ----------
+    history_path : Path
+        Specifies the path to the history file.
+    """
+
+    def __init__(self, history_path: Path):
+        self.history_path = history_path
+        self.replaypacks: dict[str, dict] = {}
+
+    @staticmethod
+    def load(output_path: Path) -> "ProcessingHistory":
+        """
+        Loads the history stored in the output directory. A missing or
+        corrupted history is treated as empty.
+
+        Parameters
+        ----------
+        output_path : Path
+            Specifies the output directory of the processed replaypacks.
+
+        Returns
+        -------
+        ProcessingHistory
+            Returns the loaded history.
+        """
+
+        history = ProcessingHistory(
+            history_path=Path(output_path, PROCESSING_HISTORY_FILENAME)
+        )
+        try:
+            with history.history_path.open("r", encoding="utf-8") as history_file:
+                history.replaypacks = json.load(history_file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring the unreadable processing history: {e}")
+
+        return history
+
+    @staticmethod
+    def get_process_time(entry: dict) -> float:
+        # Histories recorded before the process time was kept hold only the duration:
+        return entry.get("process_time", entry["duration"])
+
+    def get_seconds_per_byte(self) -> float:
+        total_duration = sum(
+            self.get_process_time(entry=entry) for entry in self.replaypacks.values()
+        )
+        total_bytes = sum(entry["n_bytes"] for entry in self.replaypacks.values())
+        if total_duration <= 0 or total_bytes <= 0:
+            # Without a history only the order of the estimates matters:
+            return 1.0
+
+        return total_duration / total_bytes
+
+    def estimate_duration(self, replaypack_name: str, n_bytes: int) -> float:
+        """
+        Estimates the processing time of a replaypack.
+
+        Parameters
+        ----------
+        replaypack_name : str
+            Name of the replaypack directory.
+        n_bytes : int
+            Total size of the replays of the replaypack.
+
+        Returns
+        -------
+        float
+            Returns the estimated processing time, in seconds if a history exists.
+        """
+
+        entry = self.replaypacks.get(replaypack_name)
+        if entry is not None and entry["n_bytes"] == n_bytes:
+            return self.get_process_time(entry=entry)
+
+        return n_bytes * self.get_seconds_per_byte()
+
+    def record(
+        self,
+        replaypack_name: str,
+        n_replays: int,
+        n_bytes: int,
+        duration: float,
+        process_time: float | None = None,
+    ) -> None:
+        self.replaypacks[replaypack_name] = {
+            "n_replays": n_replays,
+            "n_bytes": n_bytes,
+            "duration": duration,
+            "process_time": duration if process_time is None else process_time,
+        }
+
+    def save(self) -> None:
+        self.history_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.history_path.with_name(f"{self.history_path.name}.tmp")
+        with temporary_path.open("w", encoding="utf-8") as history_file:
+            json.dump(self.replaypacks, history_file, indent=4)
+        os.replace(temporary_path, self.history_path)
+
+
+def get_max_procs(
+    cost: float,
+    remaining_cost: float,
+    n_cpus: int,
+    procs_in_use: int,
+) -> int:
+    """
+    Calculates the number of goroutines for a replaypack that is started.
+    The replaypack gets a share of the logical cores proportional to its share
+    of the remaining work, limited to the cores that are not in use. While many
+    replaypacks remain each of them gets a single core, the last large
+    replaypacks get most of the cores.
+
+    Parameters
+    ----------
+    cost : float
+        Estimated cost of the replaypack.
+    remaining_cost : float
+        Estimated cost of the replaypacks that are not finished, including this one.
+    n_cpus : int
+        Number of the logical cores shared by all of the processes.
+    procs_in_use : int
+        Number of the goroutines of the processes that are running.
+
+    Returns
+    -------
+    int
+        Returns the number of goroutines, at least 1.
+    """
+
+    if remaining_cost <= 0:
+        return max(1, n_cpus - procs_in_use)
+
+    share = math.ceil(n_cpus * cost / remaining_cost)
+    return max(1, min(share, n_cpus - procs_in_use))
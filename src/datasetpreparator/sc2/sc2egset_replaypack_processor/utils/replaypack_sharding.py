@@ -0,0 +1,389 @@
+import copy
+import heapq
+import json
+import logging
+import os
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Any
+
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.replaypack_processor_args import (
+    SC2InfoExtractorGoArguments,
+)
+
+# Replaypacks are split only into shards with at least this many replays:
+MIN_REPLAYS_PER_SHARD = 1000
+# Prefixes of the SC2InfoExtractorGo outputs that can be merged:
+PACKAGE_SUMMARY_PREFIX = "package_summary"
+PROCESSED_FAILED_PREFIX = "processed_failed"
+MAIN_LOG_PREFIX = "main_log"
+
+
+class ShardMergeError(Exception):
+    def __init__(self, *args):
+        super().__init__(*args)
+
+
+def get_n_shards(n_replays: int, n_shards: int, min_replays_per_shard: int) -> int:
+    """
+    Calculates the number of shards of a replaypack, so that none of
+    the shards has fewer than min_replays_per_shard replays.
+
+    Parameters
+    ----------
+    n_replays : int
+        Number of the replays of the replaypack.
+    n_shards : int
+        Maximal number of the shards.
+    min_replays_per_shard : int
+        Minimal number of the replays in each of the shards.
+
+    Returns
+    -------
+    int
+        Returns the number of shards, 1 if the replaypack should not be split.
+    """
+
+    return max(1, min(n_shards, n_replays // max(1, min_replays_per_shard)))
+
+
+def split_replays(replay_paths: list[Path], n_shards: int) -> list[list[Path]]:
+    """
+    Splits the replays into shards of a similar total size, each of the replays
+    is added to the shard with the smallest total size, starting from the largest.
+
+    Parameters
+    ----------
+    replay_paths : list[Path]
+        Paths to the replays of the replaypack.
+    n_shards : int
+        Number of the shards.
+
+    Returns
+    -------
+    list[list[Path]]
+        Returns the replays of each of the shards, sorted by their paths.
+    """
+
+    shards: list[list[Path]] = [[] for _ in range(n_shards)]
+    # Shards with the same size are balanced by their number of replays:
+    shard_sizes = [(0, 0, shard_index) for shard_index in range(n_shards)]
+    replay_sizes = sorted(
+        ((replay_path.stat().st_size, replay_path) for replay_path in replay_paths),
+        reverse=True,
+    )
+    for replay_size, replay_path in replay_sizes:
+        shard_size, n_replays, shard_index = heapq.heappop(shard_sizes)
+        shards[shard_index].append(replay_path)
+        heapq.heappush(
+            shard_sizes, (shard_size + replay_size, n_replays + 1, shard_index)
+        )
+
+    return [sorted(shard) for shard in shards]
+
+
+def link_file(source: Path, destination: Path) -> None:
+    # Symbolic links may require additional privileges on Windows:
+    try:
+        os.symlink(source, destination)
+    except OSError:
+        os.link(source, destination)
+
+
+def stage_shards(
+    arguments: SC2InfoExtractorGoArguments,
+    n_shards: int,
+    staging_path: Path,
+) -> list[SC2InfoExtractorGoArguments]:
+    """
+    Splits the replays of a replaypack into shards, each of the shards is an input
+    directory with links to its replays, with the same relative paths as in the
+    replaypack. The replays are not copied.
+
+    Parameters
+    ----------
+    arguments : SC2InfoExtractorGoArguments
+        Specifies the arguments of the replaypack.
+    n_shards : int
+        Specifies the number of the shards.
+    staging_path : Path
+        Specifies the directory in which the inputs and outputs
+        of the shards are created.
+
+    Returns
+    -------
+    list[SC2InfoExtractorGoArguments]
+        Returns the arguments of each of the shards.
+    """
+
+    replay_paths = sorted(arguments.processing_input.rglob("*.SC2Replay"))
+
+    shard_arguments = []
+    for shard_index, shard_replays in enumerate(
+        split_replays(replay_paths=replay_paths, n_shards=n_shards)
+    ):
+        shard_input = Path(staging_path, f"shard_{shard_index}")
+        shard_output = Path(staging_path, f"shard_{shard_index}_output")
+        shard_output.mkdir(parents=True, exist_ok=True)
+        for replay_path in shard_replays:
+            link_path = Path(
+                shard_input, replay_path.relative_to(arguments.processing_input)
+            )
+            link_path.parent.mkdir(parents=True, exist_ok=True)
+            link_file(source=replay_path, destination=link_path)
+
+        shard = copy.copy(arguments)
+        shard.processing_input = shard_input
+        shard.output = shard_output
+        shard.log_dir = shard_output
+        shard_arguments.append(shard)
+
+    return shard_arguments
+
+
+def replace_paths(value: Any, shard_input: str, replaypack_input: str) -> Any:
+    """
+    Replaces the paths of the staged replays in a JSON value with the paths
+    of the original replays.
+    """
+
+    if isinstance(value, str):
+        if value.startswith(shard_input):
+            return replaypack_input + value[len(shard_input) :]
+        return value
+    if isinstance(value, dict):
+        return {
+            replace_paths(
+                value=key, shard_input=shard_input, replaypack_input=replaypack_input
+            ): replace_paths(
+                value=item, shard_input=shard_input, replaypack_input=replaypack_input
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [
+            replace_paths(
+                value=item, shard_input=shard_input, replaypack_input=replaypack_input
+            )
+            for item in value
+        ]
+    return value
+
+
+def merge_counts(merged: Any, value: Any, key: str = "") -> Any:
+    """
+    Merges the package summaries of the shards. A package summary is expected
+    to hold only integer counts, nested in objects by their categories, such as
+    the number of replays of each map. The counts of the same category are summed.
+
+    Parameters
+    ----------
+    merged : Any
+        Summary merged from the previous shards, None for the first shard.
+    value : Any
+        Summary of the next shard.
+    key : str, optional
+        Key of the merged value, used in the error message, by default ""
+
+    Returns
+    -------
+    Any
+        Returns the merged summary.
+
+    Raises
+    ------
+    ShardMergeError
+        If the summary holds values other than counts, which cannot be summed.
+    """
+
+    if isinstance(value, dict) and isinstance(merged, (dict, type(None))):
+        result = dict(merged or {})
+        for item_key, item in value.items():
+            result[item_key] = merge_counts(
+                merged=result.get(item_key), value=item, key=f"{key}/{item_key}"
+            )
+        return result
+    if (
+        isinstance(value, int)
+        and not isinstance(value, bool)
+        and (
+            merged is None or (isinstance(merged, int) and not isinstance(merged, bool))
+        )
+    ):
+        return (merged or 0) + value
+
+    raise ShardMergeError(f"The package summary value {key} is not a count.")
+
+
+def merge_file_lists(merged: Any, value: Any) -> Any:
+    """
+    Merges the lists of the processed and failed files of the shards.
+    The lists are expected in an object whose values are either objects keyed
+    by the paths of the replays, or arrays of the replays. As every replay
+    belongs to a single shard, the objects are joined and the arrays are
+    concatenated.
+
+    Parameters
+    ----------
+    merged : Any
+        Lists merged from the previous shards, None for the first shard.
+    value : Any
+        Lists of the next shard.
+
+    Returns
+    -------
+    Any
+        Returns the merged lists.
+
+    Raises
+    ------
+    ShardMergeError
+        If the lists are in a different format, or a replay is listed
+        by multiple shards.
+    """
+
+    if not isinstance(value, dict):
+        raise ShardMergeError("The processed files are not an object.")
+
+    result = dict(merged or {})
+    for key, files in value.items():
+        if key not in result and isinstance(files, (dict, list)):
+            result[key] = files
+        elif isinstance(files, list) and isinstance(result[key], list):
+            result[key] = result[key] + files
+        elif isinstance(files, dict) and isinstance(result[key], dict):
+            if result[key].keys() & files.keys():
+                raise ShardMergeError(
+                    f"The files of {key} are listed by multiple shards."
+                )
+            result[key] = {**result[key], **files}
+        else:
+            raise ShardMergeError(f"The processed files {key} are not a list of files.")
+
+    return result
+
+
+def merge_zip_files(zip_paths: list[Path], output_path: Path) -> None:
+    """
+    Merges the data packages of the shards into a single package,
+    each of the members keeps its compression method.
+
+    Parameters
+    ----------
+    zip_paths : list[Path]
+        Paths to the data packages of the shards.
+    output_path : Path
+        Path to the merged data package.
+    """
+
+    with zipfile.ZipFile(output_path, "w", allowZip64=True) as output_zip:
+        for zip_path in zip_paths:
+            with zipfile.ZipFile(zip_path, "r") as shard_zip:
+                for zip_info in shard_zip.infolist():
+                    output_info = zipfile.ZipInfo(
+                        filename=zip_info.filename, date_time=zip_info.date_time
+                    )
+                    output_info.compress_type = zip_info.compress_type
+                    output_info.external_attr = zip_info.external_attr
+                    with (
+                        shard_zip.open(zip_info, "r") as member_file,
+                        output_zip.open(
+                            output_info,
+                            "w",
+                            force_zip64=zip_info.file_size >= zipfile.ZIP64_LIMIT,
+                        ) as output_file,
+                    ):
+                        shutil.copyfileobj(member_file, output_file)
+
+
+def merge_shard_outputs(
+    shard_arguments: list[SC2InfoExtractorGoArguments],
+    arguments: SC2InfoExtractorGoArguments,
+) -> None:
+    """
+    Merges the outputs of the shards into the output of the replaypack, in the same
+    format as if the replaypack was processed as a whole. The files with the same
+    name are merged: the data packages into a single .zip archive, the package
+    summaries with merge_counts, the processed and failed files with
+    merge_file_lists, and the main logs are concatenated. The paths of the staged
+    replays are replaced with the paths of the original replays.
+
+    All of the outputs are checked before any of them is written, an output that
+    cannot be merged this way leaves the output of the replaypack untouched.
+
+    Parameters
+    ----------
+    shard_arguments : list[SC2InfoExtractorGoArguments]
+        Specifies the arguments of the processed shards.
+    arguments : SC2InfoExtractorGoArguments
+        Specifies the arguments of the replaypack.
+
+    Raises
+    ------
+    ShardMergeError
+        If any of the outputs of the shards is not in the known format.
+    """
+
+    shard_files: dict[str, list[tuple[Path, SC2InfoExtractorGoArguments]]] = {}
+    for shard in shard_arguments:
+        for shard_file in sorted(shard.output.iterdir()):
+            if shard_file.is_file():
+                shard_files.setdefault(shard_file.name, []).append((shard_file, shard))
+
+    replaypack_input = str(arguments.processing_input)
+    zip_files: dict[str, list[Path]] = {}
+    merged_outputs: dict[str, str] = {}
+    for filename, files in shard_files.items():
+        if filename.endswith(".zip"):
+            zip_files[filename] = [shard_file for shard_file, _ in files]
+            continue
+
+        contents = [
+            (
+                shard_file.read_text(encoding="utf-8", errors="surrogateescape"),
+                str(shard.processing_input),
+            )
+            for shard_file, shard in files
+        ]
+        if filename.startswith(MAIN_LOG_PREFIX):
+            merged_outputs[filename] = "".join(
+                content.replace(shard_input, replaypack_input)
+                for content, shard_input in contents
+            )
+            continue
+
+        if filename.startswith(PACKAGE_SUMMARY_PREFIX):
+            merge = merge_counts
+        elif filename.startswith(PROCESSED_FAILED_PREFIX):
+            merge = merge_file_lists
+        else:
+            raise ShardMergeError(f"The output {filename} cannot be merged.")
+
+        merged = None
+        for content, shard_input in contents:
+            try:
+                value = json.loads(content)
+            except ValueError as e:
+                raise ShardMergeError(f"The output {filename} is not JSON: {e}")
+            merged = merge(
+                merged=merged,
+                value=replace_paths(
+                    value=value,
+                    shard_input=shard_input,
+                    replaypack_input=replaypack_input,
+                ),
+            )
+        merged_outputs[filename] = json.dumps(merged)
+
+    arguments.output.mkdir(parents=True, exist_ok=True)
+    for filename, zip_paths in zip_files.items():
+        output_path = Path(arguments.output, filename)
+        logging.debug(f"Merging {len(zip_paths)} shard files into {str(output_path)}")
+        merge_zip_files(zip_paths=zip_paths, output_path=output_path)
+    for filename, merged_output in merged_outputs.items():
+        output_path = Path(arguments.output, filename)
+        logging.debug(f"Writing the merged {str(output_path)}")
+        output_path.write_text(
+            merged_output, encoding="utf-8", errors="surrogateescape"
+        )
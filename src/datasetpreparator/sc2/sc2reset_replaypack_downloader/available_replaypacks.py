@@ -1,357 +0,0 @@
-SC2RESET_REPLAYPACKS: list[tuple[str, str, str]] = [
-    (
-        "2016_IEM_10_Taipei",
-        "https://zenodo.org/record/14963356/files/2016_IEM_10_Taipei.zip?download=1",
-        "a6f583226fec733e67f39a54661d23fd",
-    ),
-    (
-        "2016_IEM_11_Shanghai",
-        "https://zenodo.org/record/14963356/files/2016_IEM_11_Shanghai.zip?download=1",
-        "6ce77b61130721f6247a8f0678568493",
-    ),
-    (
-        "2016_WCS_Winter",
-        "https://zenodo.org/record/14963356/files/2016_WCS_Winter.zip?download=1",
-        "6edb1f485c4a516524a3c34d6ff9a029",
-    ),
-    (
-        "2017_HomeStory_Cup_XV",
-        "https://zenodo.org/record/14963356/files/2017_HomeStory_Cup_XV.zip?download=1",
-        "8f651bfa07004a670b49eafb1b0fcfe9",
-    ),
-    (
-        "2017_HomeStory_Cup_XVI",
-        "https://zenodo.org/record/14963356/files/2017_HomeStory_Cup_XVI.zip?download=1",
-        "fc629efad995ef36a3ded6a67fec441a",
-    ),
-    (
-        "2017_IEM_Shanghai",
-        "https://zenodo.org/record/14963356/files/2017_IEM_Shanghai.zip?download=1",
-        "94e810c9ebe15e741848bc989e286808",
-    ),
-    (
-        "2017_IEM_XI_World_Championship_Katowice",
-        "https://zenodo.org/record/14963356/files/2017_IEM_XI_World_Championship_Katowice.zip?download=1",  # noqa
-        "a2c038f7f7a0ec7127f891c38f5066ba",
-    ),
-    (
-        "2017_WCS_Austin",
-        "https://zenodo.org/record/14963356/files/2017_WCS_Austin.zip?download=1",
-        "daa7800122ddc78c96b18c60eeec6f8c",
-    ),
-    (
-        "2017_WCS_Global_Finals",
-        "https://zenodo.org/record/14963356/files/2017_WCS_Global_Finals.zip?download=1",
-        "9c08dc6b53b47dcb04175ca8f4b6ccf2",
-    ),
-    (
-        "2017_WCS_Jonkoping",
-        "https://zenodo.org/record/14963356/files/2017_WCS_Jonkoping.zip?download=1",
-        "9709995922b207ef6f931f318906babd",
-    ),
-    (
-        "2017_WCS_Montreal",
-        "https://zenodo.org/record/14963356/files/2017_WCS_Montreal.zip?download=1",
-        "3d22ed1109e6b205deb6eac662e4d1ec ",
-    ),
-    (
-        "2017_WESG_Barcelona",
-        "https://zenodo.org/record/14963356/files/2017_WESG_Barcelona.zip?download=1",
-        "5db0867cb7ca0e332878cb14f11636a5",
-    ),
-    (
-        "2017_WESG_Haikou",
-        "https://zenodo.org/record/14963356/files/2017_WESG_Haikou.zip?download=1",
-        "97c2843b6c258a52c1c8250e575b2403",
-    ),
-    (
-        "2018_Cheeseadelphia_8",
-        "https://zenodo.org/record/14963356/files/2018_Cheeseadelphia_8.zip?download=1",
-        "129b55c6482a026c0aa1d25de63bbcc8",
-    ),
-    (
-        "2018_HomeStory_Cup_XVII",
-        "https://zenodo.org/record/14963356/files/2018_HomeStory_Cup_XVII.zip?download=1",
-        "30530796c0f2bfa1ba66c8b3d486f845",
-    ),
-    (
-        "2018_HomeStory_Cup_XVIII",
-        "https://zenodo.org/record/14963356/files/2018_HomeStory_Cup_XVII.zip?download=1",
-        "69600e7de3a5cdbb7127f6f74736639f",
-    ),
-    (
-        "2018_IEM_Katowice",
-        "https://zenodo.org/record/14963356/files/2018_IEM_Katowice.zip?download=1",
-        "1f4b48f63bfb6426f8fdea0a77f10f1f",
-    ),
-    (
-        "2018_IEM_PyeongChang",
-        "https://zenodo.org/record/14963356/files/2018_IEM_PyeongChang.zip?download=1",
-        "f7064c09953cff95f929c60bff9ba89c",
-    ),
-    (
-        "2018_WCS_Austin",
-        "https://zenodo.org/record/14963356/files/2018_WCS_Austin.zip?download=1",
-        "b08048c8a54f4513037dbca84899818a",
-    ),
-    (
-        "2018_WCS_Global_Finals",
-        "https://zenodo.org/record/14963356/files/2018_WCS_Global_Finals.zip?download=1",
-        "c211fc5637276eb7a3859073ba8cce73",
-    ),
-    (
-        "2018_WCS_Leipzig",
-        "https://zenodo.org/record/14963356/files/2018_WCS_Leipzig.zip?download=1",
-        "5908f446c9820581ca7c28478cc2eca5",
-    ),
-    (
-        "2018_WCS_Montreal",
-        "https://zenodo.org/record/14963356/files/2018_WCS_Montreal.zip?download=1",
-        "2de1ab9793ba1a1901a109c5d20ef4fc",
-    ),
-    (
-        "2018_WCS_Valencia",
-        "https://zenodo.org/record/14963356/files/2018_WCS_Valencia.zip?download=1",
-        "53ebc23b050c01b51ec46e5bb5186a20",
-    ),
-    (
-        "2018_WESG_Grand_Finals",
-        "https://zenodo.org/record/14963356/files/2018_WESG_Grand_Finals.zip?download=1",
-        "42936a02f4b664b8daa098090e5efcb7",
-    ),
-    (
-        "2019_Assembly_Summer",
-        "https://zenodo.org/record/14963356/files/2019_Assembly_Summer.zip?download=1",
-        "5f4abc4a0b12d5f612bd8075c8bca072",
-    ),
-    (
-        "2019_HomeStory_Cup_XIX",
-        "https://zenodo.org/record/14963356/files/2019_HomeStory_Cup_XIX.zip?download=1",
-        "0da6fbe12ce91e8f76b50cd5867f86d5",
-    ),
-    (
-        "2019_HomeStory_Cup_XX",
-        "https://zenodo.org/record/14963356/files/2019_HomeStory_Cup_XX.zip?download=1",
-        "92f05a25b62ecf370e0c0c7eb2714c30",
-    ),
-    (
-        "2019_IEM_Katowice",
-        "https://zenodo.org/record/14963356/files/2019_IEM_Katowice.zip?download=1",
-        "b5049a570149915ff03f2fa0e0403894",
-    ),
-    (
-        "2019_WCS_Fall",
-        "https://zenodo.org/record/14963356/files/2019_WCS_Fall.zip?download=1",
-        "c1d6cecbc6f7428c5827394f0cd1bc62",
-    ),
-    (
-        "2019_WCS_Grand_Finals",
-        "https://zenodo.org/record/14963356/files/2019_WCS_Grand_Finals.zip?download=1",
-        "b242616019416eea86acac65cd3f6248",
-    ),
-    (
-        "2019_WCS_Spring",
-        "https://zenodo.org/record/14963356/files/2019_WCS_Spring.zip?download=1",
-        "e0908a181a373cd8afaae8dd033840e1",
-    ),
-    (
-        "2019_WCS_Summer",
-        "https://zenodo.org/record/14963356/files/2019_WCS_Summer.zip?download=1",
-        "329e55271701f35163e8e88fd663fb38",
-    ),
-    (
-        "2019_WCS_Winter",
-        "https://zenodo.org/record/14963356/files/2019_WCS_Winter.zip?download=1",
-        "8fc37d795a33c358279c627d66d0d06d",
-    ),
-    (
-        "2020_05_Dreamhack_Last_Chance",
-        "https://zenodo.org/record/14963356/files/2020_05_Dreamhack_Last_Chance.zip?download=1",
-        "8fbdd42a1d52b6c30fb712893f40f52d",
-    ),
-    (
-        "2020_ASUS_ROG_Online",
-        "https://zenodo.org/record/14963356/files/2020_ASUS_ROG_Online.zip?download=1",
-        "b15812f01b99b5e4e6a9482f1479eee1",
-    ),
-    (
-        "2020_Dreamhack_SC2_Masters_Fall",
-        "https://zenodo.org/record/14963356/files/2020_Dreamhack_SC2_Masters_Fall.zip?download=1",
-        "4ccf32fb755b2fc0831326969d6867cc",
-    ),
-    (
-        "2020_Dreamhack_SC2_Masters_Summer",
-        "https://zenodo.org/record/14963356/files/2020_Dreamhack_SC2_Masters_Summer.zip?download=1",
-        "e0e82aaed7bbcd0e2ec9bde1555e0504",
-    ),
-    (
-        "2020_Dreamhack_SC2_Masters_Winter",
-        "https://zenodo.org/record/14963356/files/2020_Dreamhack_SC2_Masters_Summer.zip?download=1",
-        "f5c25ad8546119d7c3763fabb1fb6ca3",
-    ),
-    (
-        "2020_IEM_Katowice",
-        "https://zenodo.org/record/14963356/files/2020_IEM_Katowice.zip?download=1",
-        "0bc8fe3b15b1ce31cb57e0bc4b74c51e",
-    ),
-    (
-        "2020_StayAtHome_Story_Cup_1",
-        "https://zenodo.org/record/14963356/files/2020_StayAtHome_Story_Cup_1.zip?download=1",
-        "d667770c64ba9a2ac7220be4130fd3fd",
-    ),
-    (
-        "2020_StayAtHome_Story_Cup_2",
-        "https://zenodo.org/record/14963356/files/2020_StayAtHome_Story_Cup_2.zip?download=1",
-        "cb96e934641ab02f963b7cce4f944185",
-    ),
-    (
-        "2020_TSL5",
-        "https://zenodo.org/record/14963356/files/2020_TSL5.zip?download=1",
-        "f047afb568809a9092eac675a57c7517",
-    ),
-    (
-        "2020_TSL6",
-        "https://zenodo.org/record/14963356/files/2020_TSL6.zip?download=1",
-        "e2af52c86ac1cde4d8ae6bae2874f3e4",
-    ),
-    (
-        "2021_ASUS_ROG_Fall",
-        "https://zenodo.org/record/14963356/files/2021_ASUS_ROG_Fall.zip?download=1",
-        "5248f4a088d3c8ba002fee0181eef78d",
-    ),
-    (
-        "2021_Cheeseadelphia_Winter_Championship",
-        "https://zenodo.org/record/14963356/files/2021_Cheeseadelphia_Winter_Championship.zip?download=1",  # noqa
-        "d0ced57f244bebabfde8cdb7008e2669",
-    ),
-    (
-        "2021_Dreamhack_SC2_Masters_Fall",
-        "https://zenodo.org/record/14963356/files/2021_Dreamhack_SC2_Masters_Fall.zip?download=1",
-        "66ffa76b783ca039aad0eef8c4c0588f",
-    ),
-    (
-        "2021_Dreamhack_SC2_Masters_Summer",
-        "https://zenodo.org/record/14963356/files/2021_Dreamhack_SC2_Masters_Summer.zip?download=1",
-        "fb1c5b1a92e98832b180f9f7ccb473d9",
-    ),
-    (
-        "2021_Dreamhack_SC2_Masters_Winter",
-        "https://zenodo.org/record/14963356/files/2021_Dreamhack_SC2_Masters_Winter.zip?download=1",
-        "3ee16c72890a05298d5fd2aeb8fde7a9",
-    ),
-    (
-        "2021_IEM_Katowice",
-        "https://zenodo.org/record/14963356/files/2021_IEM_Katowice.zip?download=1",
-        "0a09f3f6f0bf09e018474399688bc180",
-    ),
-    (
-        "2021_StayAtHome_Story_Cup_3",
-        "https://zenodo.org/record/14963356/files/2021_StayAtHome_Story_Cup_3.zip?download=1",
-        "f1d5de4b7f1301ca2c76542a0e8ebe46",
-    ),
-    (
-        "2021_StayAtHome_Story_Cup_4",
-        "https://zenodo.org/record/14963356/files/2021_StayAtHome_Story_Cup_4.zip?download=1",
-        "551c9af9611a765842a3ef8c12f8c622",
-    ),
-    (
-        "2021_TSL7",
-        "https://zenodo.org/record/14963356/files/2021_TSL7.zip?download=1",
-        "02aad622cbf184fdedff429a5223e86e",
-    ),
-    (
-        "2021_TSL8",
-        "https://zenodo.org/record/14963356/files/2021_TSL8.zip?download=1",
-        "bdf1236a1b3dcc46789c46b1f9603535",
-    ),
-    (
-        "2022_03_DH_SC2_Masters_Atlanta",
-        "https://zenodo.org/records/14963356/files/2022_03_DH_SC2_Masters_Atlanta.zip?download=1",
-        "2b304d236838de48d28c6e82c0363bdd",
-    ),
-    (
-        "2022_Dreamhack_SC2_Masters_Last_Chance2021",
-        "https://zenodo.org/record/14963356/files/2022_Dreamhack_SC2_Masters_Last_Chance2021.zip?download=1",  # noqa
-        "de257c49c80277ba142c57313f11e2e5",
-    ),
-    (
-        "2022_Dreamhack_SC2_Masters_Valencia",
-        "https://zenodo.org/record/14963356/files/2022_Dreamhack_SC2_Masters_Valencia.zip?download=1",
-        "11a8c6f537e69faa1de04b4c5508352b",
-    ),
-    (
-        "2022_HomeStory_Cup_XXI",
-        "https://zenodo.org/record/14963356/files/2022_HomeStory_Cup_XXI.zip?download=1",
-        "79bde23b827a85082331f0861298a0c0",
-    ),
-    (
-        "2022_HomeStory_Cup_XXII",
-        "https://zenodo.org/record/14963356/files/2022_HomeStory_Cup_XXII.zip?download=1",
-        "afebc9e816b6a3f69c6bbdbbbbde3dd2",
-    ),
-    (
-        "2022_IEM_Katowice",
-        "https://zenodo.org/record/14963356/files/2022_IEM_Katowice.zip?download=1",
-        "cc51e28d113358b7eb652f6fbcc1dfc4",
-    ),
-    (
-        "2022_TSL9",
-        "https://zenodo.org/record/14963356/files/2022_TSL9.zip?download=1",
-        "fde019657f84fddfcf7405e973702277",
-    ),
-    (
-        "2023_01_IEM_Katowice",
-        "https://zenodo.org/record/14963356/files/2023_01_IEM_Katowice.zip?download=1",
-        "26897b574cf334855eb7af9a7c09dc32",
-    ),
-    (
-        "2023_04_ESL_SC2_Masters_Summer_Finals",
-        "https://zenodo.org/record/14963356/files/2023_04_ESL_SC2_Masters_Summer_Finals.zip?download=1",
-        "8813c3374a21869771f99391110c2382",
-    ),
-    (
-        "2023_05_Gamers8",
-        "https://zenodo.org/record/14963356/files/2023_05_Gamers8.zip?download=1",
-        "57547aeb97eeaa857fc780d0bd8e6f65",
-    ),
-    (
-        "2023_07_ESL_SC2_Masters_Winter_Finals",
-        "https://zenodo.org/record/14963356/files/2023_07_ESL_SC2_Masters_Winter_Finals.zip?download=1",
-        "7744a9c60beb246e092151d01c306bd4",
-    ),
-    (
-        "2023_HomeStory_Cup_XXIV",
-        "https://zenodo.org/record/14963356/files/2023_HomeStory_Cup_XXIV.zip?download=1",
-        "050ef61de19fac3f64f4db1699d7c103",
-    ),
-    (
-        "2024_01_IEM_Katowice",
-        "https://zenodo.org/record/14963356/files/2024_01_IEM_Katowice.zip?download=1",
-        "400c9aa59b4d960a1df28faa3dcf3b62",
-    ),
-    (
-        "2024_03_ESL_SC2_Masters_Spring_Finals",
-        "https://zenodo.org/record/14963356/files/2024_03_ESL_SC2_Masters_Spring_Finals.zip?download=1",
-        "1c53fcf8e8b2a88ec86dcd401b69b489",
-    ),
-    (
-        "2024_05_EWC",
-        "https://zenodo.org/record/14963356/files/2024_05_EWC.zip?download=1",
-        "40b6a8b8ffa25dc81c73815b5cc7ad5a",
-    ),
-    (
-        "2024_HomeStory_Cup_XXV",
-        "https://zenodo.org/record/14963356/files/2024_HomeStory_Cup_XXV.zip?download=1",
-        "62c9e096a696eeb1c89661310ace47f8",
-    ),
-    (
-        "2024_HomeStory_Cup_XXVI",
-        "https://zenodo.org/record/14963356/files/2024_HomeStory_Cup_XXVI.zip?download=1",
-        "362d1e215b2e3d2d8489251d3096586b",
-    ),
-    (
-        "2024_StaraZagora_BellumGensElite",
-        "https://zenodo.org/record/14963356/files/2024_StaraZagora_BellumGensElite.zip?download=1",
-        "3a542b0e901496ffb0c024d179d20f39",
-    ),
-]
@@ -3,14 +3,17 @@ from pathlib import Path
 
 import click
 
-from datasetpreparator.sc2.sc2reset_replaypack_downloader.available_replaypacks import (
-    SC2RESET_REPLAYPACKS,
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_session import (
+    DownloadSession,
 )
-from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_replaypack import (
-    download_replaypack,
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.replaypack_catalog import (
+    DEFAULT_CATALOG_PATH,
+    ReplaypackStateCache,
+    filter_replaypacks,
+    load_replaypack_catalog,
 )
-from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.unpack_zipfile import (
-    unpack_zipfile,
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.replaypack_pipeline import (
+    ReplaypackPipeline,
 )
 from datasetpreparator.utils.logging import initialize_logging
 from datasetpreparator.utils.user_prompt import create_directory
@@ -20,13 +23,23 @@ def sc2reset_replaypack_downloader(
     download_path: Path,
     unpack_path: Path,
     n_workers: int,
-    replaypack_list: list[tuple[str, str, str]] = SC2RESET_REPLAYPACKS,
+    replaypack_list: list[tuple[str, str, str]] | None = None,
+    n_downloads: int = 1,
+    max_connections_per_host: int | None = None,
+    max_bytes_per_second: float | None = None,
+    n_segments: int = 1,
+    stream_unpack: bool = False,
+    flatten_extension: str | None = None,
+    catalog_path: Path = DEFAULT_CATALOG_PATH,
+    years: list[int] | None = None,
+    names: list[str] | None = None,
 ) -> None:
     """
     Downloads and unpacks SC2ReSet: StarCraft II Esport Replaypack Set
-    (https://zenodo.org/doi/10.5281/zenodo.5575796). If the md5 of the downloaded
-    archive does not match the expected md5, the program will retry downloading the
-    archive.
+    (https://zenodo.org/doi/10.5281/zenodo.5575796). If the download fails or
+    the md5 of the downloaded archive does not match the expected md5,
+    the program will retry downloading the archive. Interrupted downloads
+    are resumed from the partially downloaded files.
 
     Parameters
     ----------
@@ -35,43 +48,88 @@ def sc2reset_replaypack_downloader(
     unpack_path : Path
         Specifies the path to which the archives will be unpacked.
     n_workers : int
-        Specifies the number of workers used for extracting the .zip archives.
-    replaypack_list : list[tuple[str, str, str]]
-        Specifies the list of replaypacks to be downloaded. By default each of
-        the tuples is (replaypack_name, replaypack_url, archive_md5).
+        Specifies the number of workers used for verifying the previously
+        downloaded archives and for extracting the .zip archives. Each of the
+        archives is extracted as soon as it is ready, while the next archives
+        are still being downloaded.
+    replaypack_list : list[tuple[str, str, str]] | None, optional
+        Specifies the list of replaypacks to be downloaded, each of the tuples
+        is (replaypack_name, replaypack_url, archive_md5). By default None which
+        downloads the replaypacks of the catalog that are selected by years and names.
+    n_downloads : int, optional
+        Specifies the number of archives that are downloaded at the same time,
+        by default 1
+    max_connections_per_host : int | None, optional
+        Specifies the maximal number of connections to the same host at the same time,
+        each of the segments of an archive uses its own connection,
+        by default None which does not limit the connections.
+    max_bytes_per_second : float | None, optional
+        Specifies the maximal combined download speed in bytes per second,
+        by default None which does not limit the speed.
+    n_segments : int, optional
+        Specifies the number of connections used to download each of
+        the large archives, by default 1
+    stream_unpack : bool, optional
+        Specifies if the archives are extracted while they are downloaded,
+        without storing them in the download_path, by default False
+    flatten_extension : str | None, optional
+        Specifies the extension of the files that are unpacked directly to the
+        layout of directory_flattener, with the hashed names and the
+        processed_mapping.json of each replaypack, by default None which
+        unpacks all of the files with their paths.
+    catalog_path : Path, optional
+        Specifies the JSON or TOML catalog of the replaypacks,
+        by default DEFAULT_CATALOG_PATH
+    years : list[int] | None, optional
+        Specifies the years of the replaypacks selected from the catalog,
+        by default None which selects all years.
+    names : list[str] | None, optional
+        Specifies the names or shell-style patterns of the replaypacks selected
+        from the catalog, by default None which selects all names.
     """
 
+    if n_workers <= 0:
+        return
+
     if replaypack_list is None:
+        replaypacks = filter_replaypacks(
+            replaypacks=load_replaypack_catalog(catalog_path=catalog_path),
+            years=years,
+            names=names,
+        )
+        replaypack_list = [replaypack.to_tuple() for replaypack in replaypacks]
+
+    if not replaypack_list:
+        logging.warning("No replaypacks were selected.")
         return
 
-    if n_workers <= 0:
+    if stream_unpack and flatten_extension:
+        logging.error("Streamed archives cannot be unpacked to the flattened layout.")
         return
 
-    # Download replaypacks:
-    downloaded_paths: list[tuple[str, str]] = []
-    for replaypack_name, replaypack_url, file_md5 in replaypack_list:
-        downloaded_replaypack_path, ok = download_replaypack(
-            destination_dir=download_path,
-            replaypack_name=replaypack_name,
-            replaypack_url=replaypack_url,
-            replaypack_md5=file_md5,
-        )
-        # If the download was succesful, add the path to the list of downloaded paths:
-        if ok:
-            downloaded_paths.append((replaypack_name, downloaded_replaypack_path))
-            continue
-        logging.error(
-            f"Replaypack {replaypack_name} could not be downloaded. Adding to retry list..."
+    # Verification, downloads and unpacking of the replaypacks overlap,
+    # the verified archives are not downloaded again:
+    with DownloadSession(
+        n_downloads=n_downloads * n_segments,
+        max_connections_per_host=max_connections_per_host,
+        max_bytes_per_second=max_bytes_per_second,
+    ) as download_session:
+        replaypack_pipeline = ReplaypackPipeline(
+            download_path=download_path,
+            unpack_path=unpack_path,
+            n_workers=n_workers,
+            download_session=download_session,
+            n_downloads=n_downloads,
+            n_segments=n_segments,
+            stream_unpack=stream_unpack,
+            flatten_extension=flatten_extension,
+            state_cache=ReplaypackStateCache.load(download_path=download_path),
         )
+        failed_replaypacks = replaypack_pipeline.run(replaypack_list=replaypack_list)
 
-    # Unpack replaypacks:
-    for replaypack_name, downloaded_replaypack_path in downloaded_paths:
-        destination_subdir = Path(replaypack_name)
-        unpack_zipfile(
-            destination_dir=unpack_path,
-            destination_subdir=destination_subdir,
-            zip_path=downloaded_replaypack_path,
-            n_workers=n_workers,
+    for replaypack_name in failed_replaypacks:
+        logging.error(
+            f"Replaypack {replaypack_name} could not be downloaded or unpacked."
         )
 
 
@@ -107,7 +165,76 @@ def sc2reset_replaypack_downloader(
     type=int,
     default=4,
     required=True,
-    help="Number of workers used for extracting the .zip archives.",
+    help="Number of workers used for verifying and extracting the .zip archives.",
+)
+@click.option(
+    "--n_downloads",
+    type=int,
+    default=1,
+    required=False,
+    help="Number of archives that are downloaded at the same time. Default is 1.",
+)
+@click.option(
+    "--max_connections_per_host",
+    type=int,
+    default=None,
+    required=False,
+    help="Maximal number of connections to the same host at the same time, each of the segments of an archive uses its own connection. Default is no limit.",
+)
+@click.option(
+    "--max_bandwidth",
+    type=float,
+    default=None,
+    required=False,
+    help="Maximal combined download speed in MiB/s. Default is no limit.",
+)
+@click.option(
+    "--n_segments",
+    type=int,
+    default=1,
+    required=False,
+    help="Number of connections used to download each of the large archives in segments. Default is 1.",
+)
+@click.option(
+    "--stream_unpack",
+    type=bool,
+    default=False,
+    required=False,
+    help="Flag that specifies if the archives are extracted while they are downloaded, without storing the .zip archives. Default is False.",
+)
+@click.option(
+    "--flatten_extension",
+    type=str,
+    default=None,
+    required=False,
+    help="Extension of the files that are unpacked directly to the flattened layout of directory_flattener, for example .SC2Replay. Default is None, which unpacks all of the files with their paths.",
+)
+@click.option(
+    "--catalog",
+    type=click.Path(
+        exists=True,
+        dir_okay=False,
+        file_okay=True,
+        resolve_path=True,
+        path_type=Path,
+    ),
+    default=DEFAULT_CATALOG_PATH,
+    required=False,
+    help="Path to the JSON or TOML catalog of the replaypacks. Default is the catalog of SC2ReSet distributed with the package.",
+)
+@click.option(
+    "--years",
+    type=int,
+    multiple=True,
+    required=False,
+    help="Year of the replaypacks that will be downloaded, can be passed multiple times. Default is all years.",
+)
+@click.option(
+    "--names",
+    type=str,
+    multiple=True,
+    required=False,
+    help="Name or shell-style pattern, for example '*HomeStory_Cup*', of the replaypacks that will be downloaded, can be passed multiple times. Default is all names.",
 )
 @click.option(
     "--log",
@@ -115,7 +242,21 @@ def sc2reset_replaypack_downloader(
     default="WARN",
     help="Log level. Default is WARN.",
 )
-def main(download_path: Path, unpack_path: Path, n_workers: int, log: str) -> None:
+def main(
+    download_path: Path,
+    unpack_path: Path,
+    n_workers: int,
+    n_downloads: int,
+    max_connections_per_host: int | None,
+    max_bandwidth: float | None,
+    n_segments: int,
+    stream_unpack: bool,
+    flatten_extension: str | None,
+    catalog: Path,
+    years: tuple[int, ...],
+    names: tuple[str, ...],
+    log: str,
+) -> None:
     initialize_logging(log=log)
 
     download_path = download_path.resolve()
@@ -127,6 +268,15 @@ def main(download_path: Path, unpack_path: Path, n_workers: int, log: str) -> No
         download_path=download_path,
         unpack_path=unpack_path,
         n_workers=n_workers,
+        n_downloads=n_downloads,
+        max_connections_per_host=max_connections_per_host,
+        max_bytes_per_second=max_bandwidth * 1024 * 1024 if max_bandwidth else None,
+        n_segments=n_segments,
+        stream_unpack=stream_unpack,
+        flatten_extension=flatten_extension,
+        catalog_path=catalog,
+        years=list(years),
+        names=list(names),
     )
 
 
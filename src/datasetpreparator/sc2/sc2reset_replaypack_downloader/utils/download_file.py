@@ -1,13 +1,221 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from itertools import pairwise
 from pathlib import Path
+
 import requests
-import tqdm
+
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_session import (
+    DownloadSession,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.file_hasher import (
+    FileHasher,
+    hash_file,
+)
+
+# Timeout in seconds for connecting and for receiving the next chunk,
+# a stalled connection raises an error instead of hanging forever:
+DOWNLOAD_TIMEOUT = 60
+# Files are split into segments only if each of the segments is at least this large:
+MIN_SEGMENT_SIZE = 64 * 1024 * 1024
+# Number of bytes downloaded by a segment between the saves of the download state:
+STATE_SAVE_INTERVAL = 16 * 1024 * 1024
+
+
+def get_part_path(download_filepath: Path) -> Path:
+    """
+    Gets the path to which the file is downloaded before it is complete.
+
+    Parameters
+    ----------
+    download_filepath : Path
+        Specifies the path to which the file will be downloaded.
+
+    Returns
+    -------
+    Path
+        Returns the download path with an added .part suffix.
+    """
+
+    return download_filepath.with_name(f"{download_filepath.name}.part")
+
+
+def get_segments_path(download_filepath: Path) -> Path:
+    """
+    Gets the path to the state of a segmented download.
+
+    Parameters
+    ----------
+    download_filepath : Path
+        Specifies the path to which the file will be downloaded.
+
+    Returns
+    -------
+    Path
+        Returns the download path with an added .part.json suffix.
+    """
+
+    return download_filepath.with_name(f"{download_filepath.name}.part.json")
+
+
+def remove_partial_download(download_filepath: Path) -> None:
+    """
+    Removes the partially downloaded file and the state of its download,
+    so the next download starts from the beginning.
+
+    Parameters
+    ----------
+    download_filepath : Path
+        Specifies the path to which the file is downloaded.
+    """
+
+    get_part_path(download_filepath=download_filepath).unlink(missing_ok=True)
+    get_segments_path(download_filepath=download_filepath).unlink(missing_ok=True)
+
+
+class DownloadSegments:
+    """
+    State of a segmented download. Each of the segments is a [start, end, position]
+    list, where position is the next byte of the segment that will be downloaded.
+    The state is saved next to the .part file, so an interrupted download
+    can be resumed from the positions of all of its segments.
+
+    Parameters
+    ----------
+    segments_path : Path
+        Specifies the path to which the state is saved.
+    size : int
+        Size of the downloaded file in bytes.
+    segments : list[list[int]]
+        Segments of the file.
+    """
+
+    def __init__(self, segments_path: Path, size: int, segments: list[list[int]]):
+        self.segments_path = segments_path
+        self.size = size
+        self.segments = segments
+        self.lock = threading.Lock()
+
+    def remaining_bytes(self) -> int:
+        return sum(end - position for _, end, position in self.segments)
+
+    def save(self) -> None:
+        """
+        Saves the state, the previous state is replaced atomically.
+        """
+
+        with self.lock:
+            tmp_path = self.segments_path.with_name(f"{self.segments_path.name}.tmp")
+            tmp_path.write_text(
+                json.dumps({"size": self.size, "segments": self.segments}),
+                encoding="utf-8",
+            )
+            os.replace(tmp_path, self.segments_path)
+
+
+def read_download_segments(segments_path: Path) -> DownloadSegments | None:
+    """
+    Reads the state of an interrupted segmented download.
+
+    Parameters
+    ----------
+    segments_path : Path
+        Specifies the path to the saved state.
+
+    Returns
+    -------
+    DownloadSegments | None
+        Returns the state, None if it does not exist or cannot be read.
+    """
+
+    try:
+        state = json.loads(segments_path.read_text(encoding="utf-8"))
+        return DownloadSegments(
+            segments_path=segments_path,
+            size=int(state["size"]),
+            segments=[
+                [int(value) for value in segment] for segment in state["segments"]
+            ],
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def plan_download_segments(
+    download_session: DownloadSession,
+    file_url: str,
+    segments_path: Path,
+    n_segments: int,
+    min_segment_size: int,
+) -> DownloadSegments | None:
+    """
+    Splits the file into segments of equal size, if the server supports
+    range requests and the file is large enough.
+
+    Parameters
+    ----------
+    download_session : DownloadSession
+        Specifies the session shared by concurrent downloads.
+    file_url : str
+        Specifies the url from which the file will be downloaded.
+    segments_path : Path
+        Specifies the path to which the state of the download will be saved.
+    n_segments : int
+        Maximal number of segments.
+    min_segment_size : int
+        Minimal size of a segment in bytes.
+
+    Returns
+    -------
+    DownloadSegments | None
+        Returns the segments, None if the file should be downloaded
+        over a single connection.
+    """
+
+    try:
+        with (
+            download_session.host_slot(url=file_url),
+            download_session.session.head(
+                url=file_url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT
+            ) as response,
+        ):
+            response.raise_for_status()
+            accept_ranges = response.headers.get("accept-ranges", "")
+            size = int(response.headers.get("content-length", 0))
+    except (requests.RequestException, ValueError) as e:
+        logging.debug(f"Could not check range support of {file_url}: {e}")
+        return None
+
+    n_segments = min(n_segments, size // max(min_segment_size, 1))
+    if accept_ranges.lower() != "bytes" or n_segments < 2:
+        return None
+
+    bounds = [size * i // n_segments for i in range(n_segments + 1)]
+    return DownloadSegments(
+        segments_path=segments_path,
+        size=size,
+        segments=[[start, end, start] for start, end in pairwise(bounds)],
+    )
 
 
 def download_file(
-    file_url: str, download_filepath: Path, chunk_size: int = 8192
-) -> Path:
+    file_url: str,
+    download_filepath: Path,
+    chunk_size: int = 8192,
+    download_session: DownloadSession | None = None,
+    n_segments: int = 1,
+    min_segment_size: int = MIN_SEGMENT_SIZE,
+) -> tuple[Path, str]:
     """
     Downloads a file from a url and saves it to the specified path by the chunk size.
+    The file is downloaded to a .part file that is renamed once the download
+    is complete. If the .part file exists, the download is resumed from its end
+    with a Range request. Large files can be downloaded in segments over
+    multiple connections at the same time.
 
     Parameters
     ----------
@@ -17,30 +225,264 @@ def download_file(
         Specifies the path to which the file will be downloaded.
     chunk_size : int, optional
         Specifies the chunk size in bytes for downloading the file, by default 8192
+    download_session : DownloadSession | None, optional
+        Specifies the session shared by concurrent downloads, by default None
+        which downloads the file with its own connection and progress bar.
+    n_segments : int, optional
+        Specifies the number of connections used to download the file,
+        by default 1
+    min_segment_size : int, optional
+        Specifies the minimal size of a segment in bytes, by default MIN_SEGMENT_SIZE
 
     Returns
     -------
-    Path
-        Returns the path to the downloaded file.
+    tuple[Path, str]
+        Returns the path to the downloaded file and its md5.
+    """
+
+    if download_session is None:
+        with DownloadSession(
+            n_downloads=n_segments, description=download_filepath.name
+        ) as own_download_session:
+            return download_file(
+                file_url=file_url,
+                download_filepath=download_filepath,
+                chunk_size=chunk_size,
+                download_session=own_download_session,
+                n_segments=n_segments,
+                min_segment_size=min_segment_size,
+            )
+
+    part_path = get_part_path(download_filepath=download_filepath)
+    segments_path = get_segments_path(download_filepath=download_filepath)
+
+    # An interrupted segmented download is resumed in segments,
+    # even if the number of segments was changed:
+    download_segments = read_download_segments(segments_path=segments_path)
+    if download_segments is None and n_segments > 1 and not part_path.exists():
+        download_segments = plan_download_segments(
+            download_session=download_session,
+            file_url=file_url,
+            segments_path=segments_path,
+            n_segments=n_segments,
+            min_segment_size=min_segment_size,
+        )
+
+    if download_segments is None:
+        segments_path.unlink(missing_ok=True)
+        md5 = download_stream(
+            file_url=file_url,
+            part_path=part_path,
+            chunk_size=chunk_size,
+            download_session=download_session,
+        )
+    else:
+        download_segmented(
+            file_url=file_url,
+            part_path=part_path,
+            download_segments=download_segments,
+            chunk_size=chunk_size,
+            download_session=download_session,
+        )
+        md5 = hash_file(file=part_path, algorithms=("md5",))["md5"]
+
+    os.replace(part_path, download_filepath)
+    segments_path.unlink(missing_ok=True)
+    return download_filepath, md5
+
+
+def download_stream(
+    file_url: str,
+    part_path: Path,
+    chunk_size: int,
+    download_session: DownloadSession,
+) -> str:
+    """
+    Downloads the file over a single connection, starting from the end of the .part
+    file if it exists. The md5 is calculated from the existing part and the
+    downloaded chunks, so the file does not have to be read again to verify it.
+
+    Parameters
+    ----------
+    file_url : str
+        Specifies the url from which the file will be downloaded.
+    part_path : Path
+        Specifies the path to the partially downloaded file.
+    chunk_size : int
+        Specifies the chunk size in bytes for downloading the file.
+    download_session : DownloadSession
+        Specifies the session shared by concurrent downloads.
+
+    Returns
+    -------
+    str
+        Returns the md5 of the downloaded file.
     """
 
-    with requests.get(url=file_url, stream=True) as response:
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    hasher = FileHasher(algorithms=("md5",))
+    with (
+        download_session.host_slot(url=file_url),
+        download_session.session.get(
+            url=file_url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT
+        ) as response,
+    ):
+        # The part is not smaller than the file, it is either complete
+        # or corrupted, which is detected by the md5 check:
+        if (
+            offset
+            and response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        ):
+            hasher.update_from_file(file=part_path)
+            return hasher.hexdigests()["md5"]
+
         response.raise_for_status()
-        total = int(response.headers.get("content-length", 0))
-
-        tqdm_params = {
-            "desc": download_filepath.name,
-            "total": total,
-            "miniters": 1,
-            "unit": "B",
-            "unit_scale": True,
-            "unit_divisor": 1024,
-        }
-
-        with download_filepath.open(mode="wb") as output_zip_file:
-            with tqdm.tqdm(**tqdm_params) as pb:
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    pb.update(len(chunk))
-                    output_zip_file.write(chunk)
-
-    return download_filepath
+
+        # Servers that do not support ranges send the whole file:
+        mode = "wb"
+        if offset and response.status_code == HTTPStatus.PARTIAL_CONTENT:
+            logging.info(f"Resuming download of {str(part_path)} from byte {offset}.")
+            hasher.update_from_file(file=part_path)
+            mode = "ab"
+
+        download_session.add_expected_bytes(
+            n_bytes=int(response.headers.get("content-length", 0))
+        )
+        with part_path.open(mode=mode) as output_file:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                download_session.update(n_bytes=len(chunk))
+                hasher.update(chunk)
+                output_file.write(chunk)
+
+    return hasher.hexdigests()["md5"]
+
+
+def download_segmented(
+    file_url: str,
+    part_path: Path,
+    download_segments: DownloadSegments,
+    chunk_size: int,
+    download_session: DownloadSession,
+) -> None:
+    """
+    Downloads the segments of the file at the same time, each of them over
+    its own connection and into its own region of the preallocated .part file.
+
+    Parameters
+    ----------
+    file_url : str
+        Specifies the url from which the file will be downloaded.
+    part_path : Path
+        Specifies the path to the partially downloaded file.
+    download_segments : DownloadSegments
+        Segments of the file and their progress.
+    chunk_size : int
+        Specifies the chunk size in bytes for downloading the file.
+    download_session : DownloadSession
+        Specifies the session shared by concurrent downloads.
+    """
+
+    # The state cannot be trusted without the part it describes:
+    if not part_path.exists() or part_path.stat().st_size != download_segments.size:
+        for segment in download_segments.segments:
+            segment[2] = segment[0]
+        with part_path.open(mode="wb") as output_file:
+            output_file.truncate(download_segments.size)
+    download_segments.save()
+
+    download_session.add_expected_bytes(n_bytes=download_segments.remaining_bytes())
+    with ThreadPoolExecutor(max_workers=len(download_segments.segments)) as executor:
+        futures = [
+            executor.submit(
+                download_segment,
+                file_url=file_url,
+                part_path=part_path,
+                segment=segment,
+                download_segments=download_segments,
+                chunk_size=chunk_size,
+                download_session=download_session,
+            )
+            for segment in download_segments.segments
+        ]
+        for future in futures:
+            future.result()
+
+
+def download_segment(
+    file_url: str,
+    part_path: Path,
+    segment: list[int],
+    download_segments: DownloadSegments,
+    chunk_size: int,
+    download_session: DownloadSession,
+) -> None:
+    """
+    Downloads the remaining bytes of a single segment with a Range request.
+    The state of the download is saved periodically and when the segment
+    finishes or fails, always after the downloaded bytes were written.
+
+    Parameters
+    ----------
+    file_url : str
+        Specifies the url from which the file will be downloaded.
+    part_path : Path
+        Specifies the path to the partially downloaded file.
+    segment : list[int]
+        Segment that will be downloaded, its position is updated in place.
+    download_segments : DownloadSegments
+        State of the download that is saved.
+    chunk_size : int
+        Specifies the chunk size in bytes for downloading the file.
+    download_session : DownloadSession
+        Specifies the session shared by concurrent downloads.
+
+    Raises
+    ------
+    requests.RequestException
+        Raises an error if the server does not return the requested range,
+        or if the connection ends before the end of the segment.
+    """
+
+    _, end, position = segment
+    if position >= end:
+        return
+
+    headers = {"Range": f"bytes={position}-{end - 1}"}
+    with (
+        download_session.host_slot(url=file_url),
+        download_session.session.get(
+            url=file_url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT
+        ) as response,
+        part_path.open(mode="r+b") as output_file,
+    ):
+        response.raise_for_status()
+        if response.status_code != HTTPStatus.PARTIAL_CONTENT:
+            raise requests.HTTPError(
+                f"Server did not return the requested range of {file_url}",
+                response=response,
+            )
+
+        output_file.seek(position)
+        unsaved_bytes = 0
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                chunk = chunk[: end - segment[2]]
+                output_file.write(chunk)
+                segment[2] += len(chunk)
+                download_session.update(n_bytes=len(chunk))
+
+                unsaved_bytes += len(chunk)
+                if unsaved_bytes >= STATE_SAVE_INTERVAL:
+                    output_file.flush()
+                    download_segments.save()
+                    unsaved_bytes = 0
+        finally:
+            output_file.flush()
+            download_segments.save()
+
+    if segment[2] < end:
+        raise requests.ConnectionError(
+            f"Connection closed before the end of a segment of {file_url}"
+        )
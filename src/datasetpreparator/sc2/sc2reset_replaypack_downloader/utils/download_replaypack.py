@@ -1,9 +1,78 @@
+import logging
+import time
 from pathlib import Path
 
+import requests
+
 from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_file import (
     download_file,
+    remove_partial_download,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_session import (
+    DownloadSession,
 )
 from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.get_md5 import get_md5
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.md5_sidecar import (
+    read_md5_sidecar,
+    write_md5_sidecar,
+)
+
+# Number of times a failed download is retried:
+DOWNLOAD_RETRIES = 5
+# Delay in seconds before the first retry, it doubles with each of the next retries:
+RETRY_BACKOFF = 2.0
+MAX_RETRY_BACKOFF = 120.0
+
+
+def is_retryable(error: requests.RequestException) -> bool:
+    """
+    Checks if a failed request can succeed when it is retried.
+
+    Parameters
+    ----------
+    error : requests.RequestException
+        Error raised by the request.
+
+    Returns
+    -------
+    bool
+        False for client errors such as a missing file, True otherwise.
+    """
+
+    status_code = getattr(error.response, "status_code", None)
+    if status_code is None or status_code in (408, 429):
+        return True
+
+    return not 400 <= status_code < 500
+
+
+def wait_before_retry(
+    replaypack_name: str,
+    attempt: int,
+    max_retries: int,
+    retry_backoff: float,
+) -> None:
+    """
+    Waits before retrying a download, the delay doubles with each of the retries.
+
+    Parameters
+    ----------
+    replaypack_name : str
+        Name of the replaypack that is downloaded.
+    attempt : int
+        Number of the retry, starting from 1.
+    max_retries : int
+        Maximal number of retries.
+    retry_backoff : float
+        Delay in seconds before the first retry.
+    """
+
+    delay = min(retry_backoff * 2 ** (attempt - 1), MAX_RETRY_BACKOFF)
+    logging.warning(
+        f"Retrying download of {replaypack_name} in {delay:.0f}s, "
+        f"attempt {attempt}/{max_retries}."
+    )
+    time.sleep(delay)
 
 
 def download_replaypack(
@@ -11,9 +80,20 @@ def download_replaypack(
     replaypack_name: str,
     replaypack_url: str,
     replaypack_md5: str,
+    download_session: DownloadSession | None = None,
+    n_segments: int = 1,
+    max_retries: int = DOWNLOAD_RETRIES,
+    retry_backoff: float = RETRY_BACKOFF,
 ) -> tuple[Path, bool]:
     """
     Exposes logic for downloading a single StarCraft II replaypack from an url.
+    The md5 of a verified archive is stored in a sidecar file next to it,
+    so the following runs do not have to hash the archive again.
+
+    A download that fails is retried with an exponential backoff. If the
+    connection was dropped, the retry resumes from the partially downloaded file.
+    If the md5 of the downloaded archive does not match, the archive is removed
+    and the retry starts from the beginning.
 
     Parameters
     ----------
@@ -27,6 +107,16 @@ def download_replaypack(
         to the .zip which will be downloaded.
     replaypack_md5 : str
         Specifies the md5 expected checksum of the .zip archive.
+    download_session : DownloadSession | None, optional
+        Specifies the session shared by concurrent downloads, by default None
+    n_segments : int, optional
+        Specifies the number of connections used to download the archive,
+        by default 1
+    max_retries : int, optional
+        Specifies the number of times a failed download is retried,
+        by default DOWNLOAD_RETRIES
+    retry_backoff : float, optional
+        Specifies the delay in seconds before the first retry, by default RETRY_BACKOFF
 
     Returns
     -------
@@ -71,19 +161,47 @@ def download_replaypack(
     filename_with_ext = Path(replaypack_name).with_suffix(".zip")
     download_filepath = Path(destination_dir, filename_with_ext)
 
-    # The file was previously downloaded so return it immediately:
+    # The file was previously downloaded and verified so return it immediately:
     if download_filepath.exists():
+        if read_md5_sidecar(file=download_filepath) == replaypack_md5:
+            return download_filepath, True
+
         md5_checksum = get_md5(file=download_filepath)
         if md5_checksum == replaypack_md5:
+            write_md5_sidecar(file=download_filepath, md5=md5_checksum)
             return download_filepath, True
 
-    downloaded_replaypach_archive = download_file(
-        file_url=replaypack_url,
-        download_filepath=download_filepath,
-    )
+    for attempt in range(max_retries + 1):
+        if attempt > 0:
+            wait_before_retry(
+                replaypack_name=replaypack_name,
+                attempt=attempt,
+                max_retries=max_retries,
+                retry_backoff=retry_backoff,
+            )
+
+        try:
+            downloaded_replaypach_archive, md5_checksum = download_file(
+                file_url=replaypack_url,
+                download_filepath=download_filepath,
+                download_session=download_session,
+                n_segments=n_segments,
+            )
+        except requests.RequestException as e:
+            logging.warning(f"Download of {replaypack_name} failed: {e}")
+            if not is_retryable(error=e):
+                break
+            continue
+
+        if md5_checksum == replaypack_md5:
+            write_md5_sidecar(file=downloaded_replaypach_archive, md5=md5_checksum)
+            return downloaded_replaypach_archive, True
 
-    md5_checksum = get_md5(file=download_filepath)
-    if md5_checksum != replaypack_md5:
-        return download_filepath, False
+        logging.warning(
+            f"Downloaded {replaypack_name} has md5 {md5_checksum}, "
+            f"expected {replaypack_md5}."
+        )
+        download_filepath.unlink(missing_ok=True)
+        remove_partial_download(download_filepath=download_filepath)
 
-    return downloaded_replaypach_archive, True
+    return download_filepath, False
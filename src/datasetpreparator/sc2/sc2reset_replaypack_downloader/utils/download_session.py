@@ -0,0 +1,168 @@
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TypeVar
+from urllib.parse import urlsplit
+
+import requests
+import tqdm
+from requests.adapters import HTTPAdapter
+
+# typing.Self requires Python 3.11:
+_DownloadSessionT = TypeVar("_DownloadSessionT", bound="DownloadSession")
+
+
+class BandwidthLimiter:
+    """
+    Limits the combined speed of multiple downloads. Each of the downloaded
+    chunks reserves the time it takes to transfer at the maximal speed,
+    and the downloading thread waits until its reservation starts.
+
+    Parameters
+    ----------
+    max_bytes_per_second : float
+        Maximal combined speed of the downloads in bytes per second.
+    """
+
+    def __init__(self, max_bytes_per_second: float):
+        self.max_bytes_per_second = max_bytes_per_second
+        self.reserved_until = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, n_bytes: int) -> None:
+        """
+        Waits until the chunk can be consumed without exceeding the speed limit.
+
+        Parameters
+        ----------
+        n_bytes : int
+            Size of the downloaded chunk in bytes.
+        """
+
+        with self.lock:
+            now = time.monotonic()
+            start = max(self.reserved_until, now)
+            self.reserved_until = start + n_bytes / self.max_bytes_per_second
+
+        if start > now:
+            time.sleep(start - now)
+
+
+class DownloadSession:
+    """
+    State shared by the concurrent downloads. Holds a single requests.Session
+    so that the connections are pooled and reused, limits the number of
+    connections to the same host and the combined bandwidth, and aggregates
+    the progress of all of the downloads in a single progress bar.
+
+    Parameters
+    ----------
+    n_downloads : int, optional
+        Number of downloads that run at the same time, used to size
+        the connection pool, by default 1
+    max_connections_per_host : int | None, optional
+        Maximal number of connections to the same host, counting every
+        segment of a segmented download, by default None
+        which does not limit the connections per host.
+    max_bytes_per_second : float | None, optional
+        Maximal combined speed of the downloads in bytes per second,
+        by default None which does not limit the speed.
+    description : str, optional
+        Description of the progress bar, by default "Downloading"
+    """
+
+    def __init__(
+        self,
+        n_downloads: int = 1,
+        max_connections_per_host: int | None = None,
+        max_bytes_per_second: float | None = None,
+        description: str = "Downloading",
+    ):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=n_downloads, pool_maxsize=n_downloads)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.max_connections_per_host = max_connections_per_host
+        self.host_slots: dict[str, threading.Semaphore] = {}
+        self.bandwidth_limiter = (
+            BandwidthLimiter(max_bytes_per_second=max_bytes_per_second)
+            if max_bytes_per_second
+            else None
+        )
+
+        self.progress_bar = tqdm.tqdm(
+            desc=description,
+            total=0,
+            unit="B",
+            unit_scale=True,
+            unit_divisor=1024,
+        )
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def host_slot(self, url: str) -> Iterator[None]:
+        """
+        Waits until a connection to the host of the url can be opened,
+        the slot is held until the connection is closed.
+
+        Parameters
+        ----------
+        url : str
+            Url that will be downloaded.
+        """
+
+        if self.max_connections_per_host is None:
+            yield
+            return
+
+        host = urlsplit(url).netloc
+        with self.lock:
+            slots = self.host_slots.setdefault(
+                host, threading.Semaphore(self.max_connections_per_host)
+            )
+
+        with slots:
+            yield
+
+    def add_expected_bytes(self, n_bytes: int) -> None:
+        """
+        Increases the total of the progress bar once the size
+        of a download is known.
+
+        Parameters
+        ----------
+        n_bytes : int
+            Number of bytes that will be downloaded.
+        """
+
+        with self.lock:
+            self.progress_bar.total += n_bytes
+            self.progress_bar.refresh()
+
+    def update(self, n_bytes: int) -> None:
+        """
+        Records a downloaded chunk, waits if the bandwidth limit is exceeded.
+
+        Parameters
+        ----------
+        n_bytes : int
+            Size of the downloaded chunk in bytes.
+        """
+
+        if self.bandwidth_limiter is not None:
+            self.bandwidth_limiter.consume(n_bytes=n_bytes)
+
+        with self.lock:
+            self.progress_bar.update(n_bytes)
+
+    def close(self) -> None:
+        self.progress_bar.close()
+        self.session.close()
+
+    def __enter__(self: _DownloadSessionT) -> _DownloadSessionT:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
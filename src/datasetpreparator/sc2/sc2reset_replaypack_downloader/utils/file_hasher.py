@@ -0,0 +1,177 @@
+import hashlib
+import logging
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Size of the chunks that are read from the hashed files:
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class FileHasher:
+    """
+    Calculates multiple hashes of the same data in a single pass.
+    The data is passed in chunks, so it does not have to fit in memory.
+
+    Parameters
+    ----------
+    algorithms : tuple[str, ...], optional
+        Names of the hashlib algorithms that will be calculated, by default ("md5",)
+    """
+
+    def __init__(self, algorithms: tuple[str, ...] = ("md5",)):
+        self.hashes = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+
+    def update(self, chunk: bytes | memoryview) -> None:
+        """
+        Updates all of the hashes with the next chunk of data.
+
+        Parameters
+        ----------
+        chunk : bytes | memoryview
+            Next chunk of the data.
+        """
+
+        for file_hash in self.hashes.values():
+            file_hash.update(chunk)
+
+    def update_from_file(self, file: Path, chunk_size: int = HASH_CHUNK_SIZE) -> None:
+        """
+        Updates all of the hashes with the contents of a file. The file is
+        read in fixed-size chunks into a single reused buffer.
+
+        Parameters
+        ----------
+        file : Path
+            Path to the file that will be hashed.
+        chunk_size : int, optional
+            Size of the chunks that are read from the file, by default HASH_CHUNK_SIZE
+        """
+
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        with file.open("rb") as f:
+            while n_bytes := f.readinto(buffer):
+                self.update(view[:n_bytes])
+
+    def hexdigests(self) -> dict[str, str]:
+        """
+        Returns the hexadecimal digests of the data passed so far.
+
+        Returns
+        -------
+        dict[str, str]
+            Returns a mapping from the algorithm name to its digest.
+        """
+
+        return {
+            algorithm: file_hash.hexdigest()
+            for algorithm, file_hash in self.hashes.items()
+        }
+
+
+def hash_file(
+    file: Path,
+    algorithms: tuple[str, ...] = ("md5",),
+    chunk_size: int = HASH_CHUNK_SIZE,
+) -> dict[str, str]:
+    """
+    Calculates the hashes of a file with constant memory usage. The file is
+    read in fixed-size chunks into a single reused buffer, and all of the
+    algorithms are calculated in the same pass over the file.
+
+    Parameters
+    ----------
+    file : Path
+        Path to the file that will be hashed.
+    algorithms : tuple[str, ...], optional
+        Names of the hashlib algorithms that will be calculated, by default ("md5",)
+    chunk_size : int, optional
+        Size of the chunks that are read from the file, by default HASH_CHUNK_SIZE
+
+    Returns
+    -------
+    dict[str, str]
+        Returns a mapping from the algorithm name to the hexadecimal digest of the file.
+    """
+
+    hasher = FileHasher(algorithms=algorithms)
+    hasher.update_from_file(file=file, chunk_size=chunk_size)
+
+    return hasher.hexdigests()
+
+
+def verify_file(file: Path, expected_hash: str, algorithm: str = "md5") -> bool:
+    """
+    Verifies that the file exists and has the expected hash.
+
+    Parameters
+    ----------
+    file : Path
+        Path to the file that will be verified.
+    expected_hash : str
+        Expected hexadecimal digest of the file.
+    algorithm : str, optional
+        Name of the hashlib algorithm, by default "md5"
+
+    Returns
+    -------
+    bool
+        True if the file has the expected hash, False otherwise.
+    """
+
+    if not file.is_file():
+        return False
+
+    try:
+        file_hash = hash_file(file=file, algorithms=(algorithm,))[algorithm]
+    except OSError as e:
+        logging.warning(f"File {str(file)} could not be hashed: {e}")
+        return False
+
+    return file_hash == expected_hash
+
+
+def verify_files(
+    files: list[tuple[Path, str]],
+    n_workers: int,
+    algorithm: str = "md5",
+) -> Iterator[bool]:
+    """
+    Verifies multiple files at once in a pool of worker processes.
+    Each of the workers hashes a single file at a time, so the memory usage
+    does not depend on the size of the files. All of the files are submitted
+    to the pool when the function is called, the results can be consumed
+    one by one while the following files are still being hashed.
+
+    Parameters
+    ----------
+    files : list[tuple[Path, str]]
+        Paths to the files and their expected hexadecimal digests.
+    n_workers : int
+        Number of worker processes.
+    algorithm : str, optional
+        Name of the hashlib algorithm, by default "md5"
+
+    Returns
+    -------
+    Iterator[bool]
+        Returns the verification result of each of the files, in the input order.
+    """
+
+    if not files:
+        return iter([])
+
+    paths, expected_hashes = zip(*files)
+    executor = ProcessPoolExecutor(max_workers=n_workers)
+    results = executor.map(
+        verify_file,
+        paths,
+        expected_hashes,
+        [algorithm] * len(files),
+    )
+    # The submitted files are still hashed, the worker processes
+    # exit once all of them are finished:
+    executor.shutdown(wait=False)
+
+    return results
@@ -1,11 +1,14 @@
-import hashlib
 from pathlib import Path
 
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.file_hasher import (
+    hash_file,
+)
+
 
-# REVIEW: This can be done in chunks to avoid loading the whole file into memory:
 def get_md5(file: Path) -> str:
     """
     Calculates and returns the md5 hash of a file.
+    The file is read in chunks, so it is never loaded into memory as a whole.
 
     Parameters
     ----------
@@ -18,7 +21,4 @@ def get_md5(file: Path) -> str:
         Returns the string of a md5 hash of a file.
     """
 
-    with file.open("rb") as f:
-        md5 = hashlib.md5(f.read()).hexdigest()
-
-    return md5
+    return hash_file(file=file, algorithms=("md5",))["md5"]
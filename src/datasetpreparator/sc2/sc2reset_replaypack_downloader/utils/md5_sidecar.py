@@ -0,0 +1,72 @@
+import logging
+from pathlib import Path
+
+
+def get_md5_sidecar_path(file: Path) -> Path:
+    """
+    Gets the path of the sidecar file that stores the verified md5 of a file.
+
+    Parameters
+    ----------
+    file : Path
+        Path to the verified file.
+
+    Returns
+    -------
+    Path
+        Returns the path to the sidecar, the file path with an added .md5 suffix.
+    """
+
+    return file.with_name(f"{file.name}.md5")
+
+
+def write_md5_sidecar(file: Path, md5: str) -> None:
+    """
+    Stores the verified md5 of a file next to it, in the format used by md5sum,
+    so the file can also be checked with "md5sum -c".
+
+    Parameters
+    ----------
+    file : Path
+        Path to the verified file.
+    md5 : str
+        Verified md5 of the file.
+    """
+
+    sidecar_path = get_md5_sidecar_path(file=file)
+    sidecar_path.write_text(f"{md5}  {file.name}\n", encoding="utf-8")
+
+
+def read_md5_sidecar(file: Path) -> str | None:
+    """
+    Reads the verified md5 of a file from its sidecar. The sidecar is trusted
+    only if it was written after the last modification of the file, so a file
+    that changed after it was verified has to be hashed again.
+
+    Parameters
+    ----------
+    file : Path
+        Path to the file.
+
+    Returns
+    -------
+    str | None
+        Returns the stored md5, None if the file or its sidecar does not exist,
+        or if the sidecar cannot be trusted.
+    """
+
+    sidecar_path = get_md5_sidecar_path(file=file)
+    try:
+        if sidecar_path.stat().st_mtime_ns < file.stat().st_mtime_ns:
+            logging.debug(f"File {str(file)} was modified after it was verified.")
+            return None
+        md5, _, filename = (
+            sidecar_path.read_text(encoding="utf-8").strip().partition(" ")
+        )
+    except (OSError, ValueError):
+        return None
+
+    if filename.strip() != file.name:
+        return None
+
+    return md5
@@ -0,0 +1,265 @@
+import fnmatch
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+# Catalog of the SC2ReSet replaypacks distributed with the package:
+DEFAULT_CATALOG_PATH = Path(__file__).parent.parent / "replaypack_catalog.json"
+# Name of the file that caches the state of the local replaypacks:
+REPLAYPACK_STATE_FILENAME = ".replaypack_state.json"
+
+
+class ReplaypackEntry:
+    """
+    Single replaypack of the catalog.
+
+    Parameters
+    ----------
+    name : str
+        Name of the replaypack, used for its archive and its unpacked directory.
+    url : str
+        Direct link to the .zip archive of the replaypack.
+    md5 : str
+        Expected md5 of the .zip archive.
+    year : int | None, optional
+        Year of the tournament, by default None
+    size : int | None, optional
+        Size of the .zip archive in bytes, by default None if it is not known.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        md5: str,
+        year: int | None = None,
+        size: int | None = None,
+    ):
+        self.name = name
+        self.url = url
+        self.md5 = md5
+        self.year = year
+        self.size = size
+
+    def to_tuple(self) -> tuple[str, str, str]:
+        return (self.name, self.url, self.md5)
+
+    @staticmethod
+    def from_dict(entry: dict) -> "ReplaypackEntry":
+        return ReplaypackEntry(
+            name=entry["name"],
+            url=entry["url"],
+            md5=entry["md5"],
+            year=entry.get("year"),
+            size=entry.get("size"),
+        )
+
+
+def load_replaypack_catalog(
+    catalog_path: Path = DEFAULT_CATALOG_PATH,
+) -> list[ReplaypackEntry]:
+    """
+    Loads the replaypacks from a JSON or TOML catalog. Both formats hold
+    a "replaypacks" list of tables with the name, url, md5 and optionally
+    the year and the size of each of the replaypacks.
+
+    Parameters
+    ----------
+    catalog_path : Path, optional
+        Specifies the path to the catalog, by default DEFAULT_CATALOG_PATH
+
+    Returns
+    -------
+    list[ReplaypackEntry]
+        Returns the replaypacks in the order of the catalog.
+
+    Raises
+    ------
+    ValueError
+        Raises an error if the catalog format is not supported.
+    ImportError
+        Raises an error if a TOML catalog is loaded on Python 3.10
+        without the tomli package.
+    """
+
+    if catalog_path.suffix == ".json":
+        with catalog_path.open("r", encoding="utf-8") as catalog_file:
+            catalog = json.load(catalog_file)
+    elif catalog_path.suffix == ".toml":
+        # tomllib is available starting with Python 3.11,
+        # the older versions use tomli which has the same interface:
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError as e:
+                raise ImportError(
+                    "TOML catalogs require Python 3.11 or the tomli package: pip install tomli, or pass a JSON catalog."
+                ) from e
+
+        with catalog_path.open("rb") as catalog_file:
+            catalog = tomllib.load(catalog_file)
+    else:
+        raise ValueError(f"Unsupported catalog format: {catalog_path.suffix}")
+
+    return [ReplaypackEntry.from_dict(entry) for entry in catalog["replaypacks"]]
+
+
+def filter_replaypacks(
+    replaypacks: list[ReplaypackEntry],
+    years: list[int] | None = None,
+    names: list[str] | None = None,
+) -> list[ReplaypackEntry]:
+    """
+    Selects a subset of the replaypacks.
+
+    Parameters
+    ----------
+    replaypacks : list[ReplaypackEntry]
+        Replaypacks of the catalog.
+    years : list[int] | None, optional
+        Years of the selected replaypacks, by default None which selects all years.
+    names : list[str] | None, optional
+        Names or shell-style patterns of the selected replaypacks, for example
+        "*HomeStory_Cup*", by default None which selects all names.
+
+    Returns
+    -------
+    list[ReplaypackEntry]
+        Returns the selected replaypacks in the order of the catalog.
+    """
+
+    selected = []
+    for replaypack in replaypacks:
+        if years and replaypack.year not in years:
+            continue
+        if names and not any(
+            fnmatch.fnmatchcase(replaypack.name, pattern) for pattern in names
+        ):
+            continue
+        selected.append(replaypack)
+
+    return selected
+
+
+class ReplaypackStateCache:
+    """
+    Caches the state of the local replaypacks in a single JSON file, so the
+    replaypacks that were already verified and unpacked are skipped without
+    hashing their archives or unpacking them again.
+
+    Parameters
+    ----------
+    state_path : Path
+        Specifies the path to the cache file.
+    """
+
+    def __init__(self, state_path: Path):
+        self.state_path = state_path
+        self.states: dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def load(download_path: Path) -> "ReplaypackStateCache":
+        """
+        Loads the cache stored in the download directory. A missing or
+        corrupted cache is treated as empty.
+
+        Parameters
+        ----------
+        download_path : Path
+            Specifies the path to which the archives are downloaded.
+
+        Returns
+        -------
+        ReplaypackStateCache
+            Returns the loaded cache.
+        """
+
+        state_cache = ReplaypackStateCache(
+            state_path=Path(download_path, REPLAYPACK_STATE_FILENAME)
+        )
+        try:
+            with state_cache.state_path.open("r", encoding="utf-8") as state_file:
+                state_cache.states = json.load(state_file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring the unreadable replaypack state cache: {e}")
+
+        return state_cache
+
+    def is_unpacked(
+        self,
+        replaypack_name: str,
+        replaypack_md5: str,
+        unpack_path: Path,
+        layout: str,
+    ) -> bool:
+        """
+        Checks if the replaypack was unpacked from an archive with the expected
+        md5, to the same layout, and its unpacked directory still exists.
+
+        Parameters
+        ----------
+        replaypack_name : str
+            Name of the replaypack.
+        replaypack_md5 : str
+            Expected md5 of the archive.
+        unpack_path : Path
+            Specifies the path to which the archives are unpacked.
+        layout : str
+            Layout of the unpacked files, "tree" or the flattened extension.
+
+        Returns
+        -------
+        bool
+            True if the replaypack can be skipped, False otherwise.
+        """
+
+        with self.lock:
+            state = self.states.get(replaypack_name)
+
+        return (
+            state is not None
+            and state.get("md5") == replaypack_md5
+            and state.get("layout") == layout
+            and Path(unpack_path, replaypack_name).is_dir()
+        )
+
+    def record_unpacked(
+        self,
+        replaypack_name: str,
+        replaypack_md5: str,
+        layout: str,
+        archive_path: Path | None = None,
+    ) -> None:
+        """
+        Records a replaypack that was verified and unpacked, the cache
+        is saved immediately so it survives an interrupted run.
+
+        Parameters
+        ----------
+        replaypack_name : str
+            Name of the replaypack.
+        replaypack_md5 : str
+            Verified md5 of the archive.
+        layout : str
+            Layout of the unpacked files, "tree" or the flattened extension.
+        archive_path : Path | None, optional
+            Path to the kept archive, by default None if the archive was not stored.
+        """
+
+        state = {"md5": replaypack_md5, "layout": layout}
+        if archive_path is not None:
+            state["size"] = archive_path.stat().st_size
+
+        with self.lock:
+            self.states[replaypack_name] = state
+            temporary_path = self.state_path.with_name(f"{self.state_path.name}.tmp")
+            with temporary_path.open("w", encoding="utf-8") as state_file:
+                json.dump(self.states, state_file, indent=4)
+            os.replace(temporary_path, self.state_path)
@@ -0,0 +1,392 @@
+import logging
+import queue
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_replaypack import (
+    download_replaypack,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_session import (
+    DownloadSession,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.file_hasher import (
+    verify_files,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.md5_sidecar import (
+    read_md5_sidecar,
+    write_md5_sidecar,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.replaypack_catalog import (
+    ReplaypackStateCache,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.stream_replaypack import (
+    stream_replaypack,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.stream_unzip import (
+    UnsupportedStreamError,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.unpack_zipfile import (
+    unpack_zipfile,
+)
+
+# Marks the end of the items in a queue, each of the stage threads consumes one:
+STAGE_DONE = None
+
+
+class ReplaypackPipeline:
+    """
+    Downloads, verifies and unpacks the replaypacks in overlapping stages.
+    The stages are connected with bounded queues, so an archive is unpacked as soon
+    as it is ready while the next archives are still being verified or downloaded,
+    and the downloads wait instead of running arbitrarily far ahead of unpacking.
+
+    The verify stage hashes the previously downloaded archives with verify_files
+    in n_workers processes, and passes each of them on as soon as its hash is known.
+    The archives that are missing or invalid are passed to the download stage,
+    which runs n_downloads threads. The unpack stage runs in the calling thread and extracts
+    each archive with n_workers processes.
+
+    Parameters
+    ----------
+    download_path : Path
+        Specifies the path to which the archives will be downloaded.
+    unpack_path : Path
+        Specifies the path to which the archives will be unpacked.
+    n_workers : int
+        Specifies the number of workers used for verifying and extracting the archives.
+    download_session : DownloadSession
+        Specifies the session shared by the concurrent downloads.
+    n_downloads : int, optional
+        Specifies the number of archives that are downloaded at the same time,
+        by default 1
+    n_segments : int, optional
+        Specifies the number of connections used to download each of
+        the large archives, by default 1
+    max_pending_archives : int | None, optional
+        Specifies the maximal number of archives waiting in each of the queues,
+        by default None which uses n_downloads + 1.
+    stream_unpack : bool, optional
+        Specifies if the downloaded archives are extracted while they are
+        downloaded, without storing them, by default False. The previously
+        downloaded archives are still verified and unpacked.
+    flatten_extension : str | None, optional
+        Specifies the extension of the files that are unpacked directly to the
+        layout of directory_flattener, by default None which unpacks all of the
+        files with their paths.
+    state_cache : ReplaypackStateCache | None, optional
+        Specifies the cache of the local replaypacks, the replaypacks recorded
+        as unpacked are skipped without reading their archives, by default None
+    """
+
+    def __init__(
+        self,
+        download_path: Path,
+        unpack_path: Path,
+        n_workers: int,
+        download_session: DownloadSession,
+        n_downloads: int = 1,
+        n_segments: int = 1,
+        max_pending_archives: int | None = None,
+        stream_unpack: bool = False,
+        flatten_extension: str | None = None,
+        state_cache: ReplaypackStateCache | None = None,
+    ):
+        self.download_path = download_path
+        self.unpack_path = unpack_path
+        self.n_workers = n_workers
+        self.download_session = download_session
+        self.n_downloads = n_downloads
+        self.n_segments = n_segments
+        self.stream_unpack = stream_unpack
+        self.flatten_extension = flatten_extension
+        self.state_cache = state_cache
+        # Layout recorded in the cache, the replaypacks unpacked
+        # to a different layout are unpacked again:
+        self.layout = flatten_extension if flatten_extension is not None else "tree"
+
+        if max_pending_archives is None:
+            max_pending_archives = n_downloads + 1
+        self.download_queue = queue.Queue(maxsize=max_pending_archives)
+        self.unpack_queue = queue.Queue(maxsize=max_pending_archives)
+
+        self.failed_replaypacks: list[str] = []
+        self.lock = threading.Lock()
+
+    def get_archive_path(self, replaypack_name: str) -> Path:
+        return Path(self.download_path, Path(replaypack_name).with_suffix(".zip"))
+
+    def add_failed(self, replaypack_name: str) -> None:
+        with self.lock:
+            self.failed_replaypacks.append(replaypack_name)
+
+    def record_unpacked(
+        self,
+        replaypack_name: str,
+        replaypack_md5: str,
+        archive_path: Path | None = None,
+    ) -> None:
+        if self.state_cache is None:
+            return
+
+        self.state_cache.record_unpacked(
+            replaypack_name=replaypack_name,
+            replaypack_md5=replaypack_md5,
+            layout=self.layout,
+            archive_path=archive_path,
+        )
+
+    def verify(self, replaypack_list: list[tuple[str, str, str]]) -> None:
+        """
+        Skips the replaypacks that are recorded as unpacked in the cache.
+        Passes the previously downloaded archives with the expected md5
+        to the unpack stage, other archives to the download stage.
+
+        The archives without a matching md5 sidecar are submitted to verify_files
+        before any of the replaypacks are passed on, so they are hashed while
+        the downloads and unpacking of the preceding replaypacks are running.
+
+        Parameters
+        ----------
+        replaypack_list : list[tuple[str, str, str]]
+            Replaypacks that will be processed, each of the tuples is
+            (replaypack_name, replaypack_url, archive_md5).
+        """
+
+        # Archive path of each of the replaypacks and if it is hashed,
+        # the path is None for the replaypacks that are skipped:
+        archive_paths: list[tuple[Path | None, bool]] = []
+        to_hash: list[tuple[Path, str]] = []
+        for replaypack_name, _, replaypack_md5 in replaypack_list:
+            if self.state_cache is not None and self.state_cache.is_unpacked(
+                replaypack_name=replaypack_name,
+                replaypack_md5=replaypack_md5,
+                unpack_path=self.unpack_path,
+                layout=self.layout,
+            ):
+                logging.info(f"Replaypack {replaypack_name} is up to date, skipping.")
+                archive_paths.append((None, False))
+                continue
+
+            archive_path = self.get_archive_path(replaypack_name=replaypack_name)
+            is_hashed = (
+                archive_path.exists()
+                and read_md5_sidecar(file=archive_path) != replaypack_md5
+            )
+            archive_paths.append((archive_path, is_hashed))
+            if is_hashed:
+                to_hash.append((archive_path, replaypack_md5))
+
+        verified = verify_files(files=to_hash, n_workers=self.n_workers)
+
+        for replaypack, (archive_path, is_hashed) in zip(
+            replaypack_list, archive_paths
+        ):
+            replaypack_name, _, replaypack_md5 = replaypack
+            if archive_path is None:
+                continue
+
+            try:
+                if not is_hashed:
+                    if archive_path.exists():
+                        self.unpack_queue.put(
+                            (replaypack_name, archive_path, replaypack_md5)
+                        )
+                    else:
+                        self.download_queue.put(replaypack)
+                    continue
+
+                if next(verified):
+                    write_md5_sidecar(file=archive_path, md5=replaypack_md5)
+                    self.unpack_queue.put(
+                        (replaypack_name, archive_path, replaypack_md5)
+                    )
+                    continue
+
+                # The archive is replaced by the download, removing it here
+                # ensures that it is not hashed again before downloading:
+                logging.warning(
+                    f"Archive {str(archive_path)} is invalid, downloading it."
+                )
+                archive_path.unlink()
+                self.download_queue.put(replaypack)
+            except OSError:
+                logging.exception(f"Processing {replaypack_name} failed.")
+                self.add_failed(replaypack_name=replaypack_name)
+
+    def download(self, replaypack: tuple[str, str, str]) -> None:
+        """
+        Downloads an archive and passes it to the unpack stage if its md5 matches.
+        In the streaming mode the archive is extracted while it is downloaded,
+        the archives that cannot be extracted from a stream are downloaded
+        and passed to the unpack stage instead.
+
+        Parameters
+        ----------
+        replaypack : tuple[str, str, str]
+            Replaypack name, url and the md5 of its archive.
+        """
+
+        replaypack_name, replaypack_url, replaypack_md5 = replaypack
+        if self.stream_unpack:
+            try:
+                _, ok = stream_replaypack(
+                    destination_dir=self.unpack_path,
+                    replaypack_name=replaypack_name,
+                    replaypack_url=replaypack_url,
+                    replaypack_md5=replaypack_md5,
+                    download_session=self.download_session,
+                )
+            except UnsupportedStreamError as e:
+                logging.warning(
+                    f"Replaypack {replaypack_name} cannot be streamed, downloading it before unpacking: {e}"
+                )
+            else:
+                if not ok:
+                    self.add_failed(replaypack_name=replaypack_name)
+                    return
+                self.record_unpacked(
+                    replaypack_name=replaypack_name, replaypack_md5=replaypack_md5
+                )
+                return
+
+        archive_path, ok = download_replaypack(
+            destination_dir=self.download_path,
+            replaypack_name=replaypack_name,
+            replaypack_url=replaypack_url,
+            replaypack_md5=replaypack_md5,
+            download_session=self.download_session,
+            n_segments=self.n_segments,
+        )
+        if not ok:
+            self.add_failed(replaypack_name=replaypack_name)
+            return
+
+        self.unpack_queue.put((replaypack_name, archive_path, replaypack_md5))
+
+    def unpack(self, archive: tuple[str, Path, str]) -> None:
+        """
+        Unpacks an archive to a subdirectory named after the replaypack.
+
+        Parameters
+        ----------
+        archive : tuple[str, Path, str]
+            Replaypack name, the path to its verified archive and its md5.
+        """
+
+        replaypack_name, archive_path, replaypack_md5 = archive
+        unpack_zipfile(
+            destination_dir=self.unpack_path,
+            destination_subdir=Path(replaypack_name),
+            zip_path=archive_path,
+            n_workers=self.n_workers,
+            flatten_extension=self.flatten_extension,
+        )
+        self.record_unpacked(
+            replaypack_name=replaypack_name,
+            replaypack_md5=replaypack_md5,
+            archive_path=archive_path,
+        )
+
+    def run_stage_worker(
+        self,
+        process_item: Callable[[Any], None],
+        input_queue: queue.Queue,
+    ) -> None:
+        """
+        Processes the items of the queue until the end of the items is reached.
+        A failed item is recorded, so that the following items are still processed.
+
+        Parameters
+        ----------
+        process_item : Callable[[Any], None]
+            Function called with each of the items.
+        input_queue : queue.Queue
+            Queue from which the items are taken.
+        """
+
+        while (item := input_queue.get()) is not STAGE_DONE:
+            try:
+                process_item(item)
+            except Exception:
+                logging.exception(f"Processing {item[0]} failed.")
+                self.add_failed(replaypack_name=item[0])
+
+    def start_stage(
+        self,
+        process_item: Callable[[Any], None],
+        input_queue: queue.Queue,
+        n_threads: int,
+    ) -> list[threading.Thread]:
+        threads = [
+            threading.Thread(
+                target=self.run_stage_worker,
+                args=(process_item, input_queue),
+                daemon=True,
+            )
+            for _ in range(n_threads)
+        ]
+        for thread in threads:
+            thread.start()
+
+        return threads
+
+    def feed(
+        self,
+        replaypack_list: list[tuple[str, str, str]],
+        download_threads: list[threading.Thread],
+    ) -> None:
+        """
+        Runs the verify stage and ends each of the following stages
+        once the previous stage is finished.
+
+        Parameters
+        ----------
+        replaypack_list : list[tuple[str, str, str]]
+            Replaypacks that will be processed.
+        download_threads : list[threading.Thread]
+            Threads of the download stage.
+        """
+
+        try:
+            self.verify(replaypack_list=replaypack_list)
+        finally:
+            for _ in download_threads:
+                self.download_queue.put(STAGE_DONE)
+            for thread in download_threads:
+                thread.join()
+
+            self.unpack_queue.put(STAGE_DONE)
+
+    def run(self, replaypack_list: list[tuple[str, str, str]]) -> list[str]:
+        """
+        Processes the replaypacks, returns once all of them were unpacked or failed.
+
+        Parameters
+        ----------
+        replaypack_list : list[tuple[str, str, str]]
+            Replaypacks that will be processed, each of the tuples is
+            (replaypack_name, replaypack_url, archive_md5).
+
+        Returns
+        -------
+        list[str]
+            Returns the names of the replaypacks that could not be
+            downloaded or unpacked.
+        """
+
+        download_threads = self.start_stage(
+            process_item=self.download,
+            input_queue=self.download_queue,
+            n_threads=self.n_downloads,
+        )
+        threading.Thread(
+            target=self.feed,
+            args=(replaypack_list, download_threads),
+            daemon=True,
+        ).start()
+
+        self.run_stage_worker(process_item=self.unpack, input_queue=self.unpack_queue)
+
+        return self.failed_replaypacks
@@ -0,0 +1,280 @@
+import logging
+import queue
+import shutil
+import threading
+import zipfile
+import zlib
+from pathlib import Path
+
+import requests
+
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_file import (
+    DOWNLOAD_TIMEOUT,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_replaypack import (
+    DOWNLOAD_RETRIES,
+    RETRY_BACKOFF,
+    is_retryable,
+    wait_before_retry,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_session import (
+    DownloadSession,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.file_hasher import (
+    FileHasher,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.md5_sidecar import (
+    read_md5_sidecar,
+    write_md5_sidecar,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.stream_unzip import (
+    StreamingZipExtractor,
+    UnsupportedStreamError,
+)
+
+# Size of the downloaded chunks that are passed to the extraction:
+STREAM_CHUNK_SIZE = 256 * 1024
+# Maximal number of downloaded chunks waiting for the extraction:
+STREAM_QUEUE_SIZE = 64
+# Errors of an archive that is invalid or cannot be written, the names
+# of the members that are not valid UTF-8 raise a ValueError:
+EXTRACTION_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, OSError, ValueError)
+
+
+def extract_from_queue(
+    extractor: StreamingZipExtractor,
+    chunk_queue: queue.Queue,
+    errors: list[Exception],
+) -> None:
+    """
+    Feeds the chunks from the queue to the extractor until the end of the stream.
+    After an error the remaining chunks are discarded, so the download
+    is never blocked by a full queue. An unexpected error is raised in the
+    extraction thread, and the extraction is recorded as failed.
+
+    Parameters
+    ----------
+    extractor : StreamingZipExtractor
+        Extractor of the archive.
+    chunk_queue : queue.Queue
+        Queue of the downloaded chunks, None marks the end of the stream.
+    errors : list[Exception]
+        List to which the error of the extraction is added.
+    """
+
+    chunk = b""
+    finished = False
+    try:
+        while (chunk := chunk_queue.get()) is not None:
+            if errors:
+                continue
+            try:
+                extractor.feed(data=chunk)
+            except (UnsupportedStreamError, *EXTRACTION_ERRORS) as e:
+                errors.append(e)
+
+        if not errors:
+            try:
+                extractor.close()
+            except (UnsupportedStreamError, *EXTRACTION_ERRORS) as e:
+                errors.append(e)
+        finished = True
+    finally:
+        if not finished:
+            errors.append(
+                RuntimeError("The extraction stopped on an unexpected error.")
+            )
+            while chunk is not None:
+                chunk = chunk_queue.get()
+
+
+def stream_extract(
+    file_url: str,
+    extract_path: Path,
+    download_session: DownloadSession,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> str:
+    """
+    Downloads a .zip archive and extracts it while it is downloaded, the archive
+    itself is never written to disk. The extraction runs in its own thread,
+    while the md5 of the archive is calculated in the downloading thread.
+
+    Parameters
+    ----------
+    file_url : str
+        Specifies the url from which the archive will be downloaded.
+    extract_path : Path
+        Specifies the path to which the archive will be extracted.
+    download_session : DownloadSession
+        Specifies the session shared by concurrent downloads.
+    chunk_size : int, optional
+        Specifies the chunk size in bytes for downloading the archive,
+        by default STREAM_CHUNK_SIZE
+
+    Returns
+    -------
+    str
+        Returns the md5 of the downloaded archive.
+
+    Raises
+    ------
+    requests.RequestException
+        Raises an error if the download fails.
+    zipfile.BadZipFile
+        Raises an error if the archive is invalid or a CRC check fails.
+    UnsupportedStreamError
+        Raises an error if the archive cannot be extracted from a stream.
+    """
+
+    chunk_queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    errors: list[Exception] = []
+    extraction_thread = threading.Thread(
+        target=extract_from_queue,
+        args=(
+            StreamingZipExtractor(destination_path=extract_path),
+            chunk_queue,
+            errors,
+        ),
+        daemon=True,
+    )
+    extraction_thread.start()
+
+    hasher = FileHasher(algorithms=("md5",))
+    try:
+        with (
+            download_session.host_slot(url=file_url),
+            download_session.session.get(
+                url=file_url, stream=True, timeout=DOWNLOAD_TIMEOUT
+            ) as response,
+        ):
+            response.raise_for_status()
+            download_session.add_expected_bytes(
+                n_bytes=int(response.headers.get("content-length", 0))
+            )
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                # There is no point in downloading an archive that cannot be extracted:
+                if errors:
+                    break
+                download_session.update(n_bytes=len(chunk))
+                hasher.update(chunk)
+                chunk_queue.put(chunk)
+    finally:
+        chunk_queue.put(None)
+        extraction_thread.join()
+
+    if errors:
+        raise errors[0]
+
+    return hasher.hexdigests()["md5"]
+
+
+def stream_replaypack(
+    destination_dir: Path,
+    replaypack_name: str,
+    replaypack_url: str,
+    replaypack_md5: str,
+    download_session: DownloadSession | None = None,
+    max_retries: int = DOWNLOAD_RETRIES,
+    retry_backoff: float = RETRY_BACKOFF,
+) -> tuple[Path, bool]:
+    """
+    Downloads a single StarCraft II replaypack and extracts it while it is
+    downloaded, without storing its .zip archive. The replaypack is extracted
+    to a temporary directory that is renamed only if the md5 of the archive
+    matches, otherwise it is removed. The verified md5 is stored in a sidecar
+    next to the extracted directory, so the following runs skip the replaypack.
+
+    Parameters
+    ----------
+    destination_dir : Path
+        Specifies the directory to which the replaypack will be extracted.
+    replaypack_name : str
+        Specifies the name of a replaypack, used as the name of its directory.
+    replaypack_url : str
+        Specifies the url that is a direct link to the .zip archive.
+    replaypack_md5 : str
+        Specifies the md5 expected checksum of the .zip archive.
+    download_session : DownloadSession | None, optional
+        Specifies the session shared by concurrent downloads, by default None
+    max_retries : int, optional
+        Specifies the number of times a failed download is retried,
+        by default DOWNLOAD_RETRIES
+    retry_backoff : float, optional
+        Specifies the delay in seconds before the first retry, by default RETRY_BACKOFF
+
+    Returns
+    -------
+    tuple[Path, bool]
+        Returns the path to the extracted replaypack, and a boolean value
+        indicating whether it was downloaded and verified.
+
+    Raises
+    ------
+    UnsupportedStreamError
+        Raises an error if the archive cannot be extracted from a stream,
+        e.g. it has stored members with data descriptors, and has to be
+        downloaded before it is unpacked.
+    """
+
+    extract_path = Path(destination_dir, replaypack_name)
+    if read_md5_sidecar(file=extract_path) == replaypack_md5:
+        return extract_path, True
+
+    if download_session is None:
+        with DownloadSession(description=replaypack_name) as session:
+            return stream_replaypack(
+                destination_dir=destination_dir,
+                replaypack_name=replaypack_name,
+                replaypack_url=replaypack_url,
+                replaypack_md5=replaypack_md5,
+                download_session=session,
+                max_retries=max_retries,
+                retry_backoff=retry_backoff,
+            )
+
+    staging_path = Path(destination_dir, f".{replaypack_name}.partial")
+    for attempt in range(max_retries + 1):
+        if attempt > 0:
+            wait_before_retry(
+                replaypack_name=replaypack_name,
+                attempt=attempt,
+                max_retries=max_retries,
+                retry_backoff=retry_backoff,
+            )
+
+        shutil.rmtree(staging_path, ignore_errors=True)
+        staging_path.mkdir(parents=True)
+        try:
+            md5_checksum = stream_extract(
+                file_url=replaypack_url,
+                extract_path=staging_path,
+                download_session=download_session,
+            )
+        except requests.RequestException as e:
+            logging.warning(f"Download of {replaypack_name} failed: {e}")
+            if not is_retryable(error=e):
+                break
+            continue
+        except UnsupportedStreamError:
+            # Retrying cannot help, the archive has to be downloaded first:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
+        except EXTRACTION_ERRORS as e:
+            logging.warning(f"Extraction of {replaypack_name} failed: {e}")
+            continue
+
+        if md5_checksum != replaypack_md5:
+            logging.warning(
+                f"Downloaded {replaypack_name} has md5 {md5_checksum}, "
+                f"expected {replaypack_md5}."
+            )
+            continue
+
+        if extract_path.exists():
+            shutil.rmtree(extract_path)
+        staging_path.rename(extract_path)
+        write_md5_sidecar(file=extract_path, md5=md5_checksum)
+        return extract_path, True
+
+    shutil.rmtree(staging_path, ignore_errors=True)
+    return extract_path, False
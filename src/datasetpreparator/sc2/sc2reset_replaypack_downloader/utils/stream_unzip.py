@@ -0,0 +1,304 @@
+import bz2
+import struct
+import zipfile
+import zlib
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO
+
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+# Any of these signatures ends the local entries of the archive:
+END_OF_ENTRIES_SIGNATURES = (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06")
+
+# signature, version, flags, method, time, date, crc, compressed size, size,
+# name length, extra length:
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_LIMIT = 0xFFFFFFFF
+
+FLAG_ENCRYPTED = 0x01
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+
+class UnsupportedStreamError(Exception):
+    def __init__(self, *args):
+        super().__init__(*args)
+
+
+def get_member_path(filename: str) -> Path | None:
+    """
+    Converts the name of an archive member to a relative path, dropping
+    the absolute, parent and empty components in the same way as zipfile.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the member in the archive.
+
+    Returns
+    -------
+    Path | None
+        Returns the relative path of the member, None if no components remain.
+    """
+
+    parts = [
+        part
+        for part in PurePosixPath(filename.replace("\\", "/")).parts
+        if part not in ("", ".", "..", "/") and not part.endswith(":")
+    ]
+    if not parts:
+        return None
+
+    return Path(*parts)
+
+
+class StreamingZipExtractor:
+    """
+    Extracts a .zip archive from a stream of its bytes, without seeking.
+    The members are read from their local headers in the order they are
+    stored, and the CRC of each of the members is verified once it is written.
+    Stored, deflated and bzip2 compressed members are supported, the data
+    descriptors are supported for the compressed members.
+
+    Parameters
+    ----------
+    destination_path : Path
+        Specifies the path to which the members will be extracted.
+    """
+
+    def __init__(self, destination_path: Path):
+        self.destination_path = destination_path
+        self.buffer = bytearray()
+        self.state = "header"
+        self.n_members = 0
+
+        self.output_file: BinaryIO | None = None
+        self.flags = 0
+        self.method = zipfile.ZIP_STORED
+        self.expected_crc = 0
+        self.crc = 0
+        self.remaining = 0
+        self.zip64 = False
+        self.decompressor = None
+
+    def feed(self, data: bytes) -> None:
+        """
+        Processes the next bytes of the archive.
+
+        Parameters
+        ----------
+        data : bytes
+            Next bytes of the archive.
+
+        Raises
+        ------
+        zipfile.BadZipFile
+            Raises an error if the archive is invalid or a CRC check fails.
+        UnsupportedStreamError
+            Raises an error if the archive uses a feature that cannot be streamed.
+        """
+
+        if self.state == "done":
+            return
+
+        self.buffer += data
+        while self.step():
+            pass
+
+    def close(self) -> None:
+        """
+        Checks that the whole archive was processed.
+
+        Raises
+        ------
+        zipfile.BadZipFile
+            Raises an error if the archive ended in the middle of a member.
+        """
+
+        if self.output_file is not None:
+            self.output_file.close()
+            self.output_file = None
+
+        if self.state != "done":
+            raise zipfile.BadZipFile("The archive ended before its central directory.")
+
+    def step(self) -> bool:
+        if self.state == "header":
+            return self.read_header()
+        if self.state == "data":
+            return self.read_data()
+        if self.state == "descriptor":
+            return self.read_descriptor()
+        return False
+
+    def read_header(self) -> bool:
+        if len(self.buffer) < 4:
+            return False
+
+        signature = bytes(self.buffer[:4])
+        if signature in END_OF_ENTRIES_SIGNATURES:
+            self.state = "done"
+            self.buffer.clear()
+            return False
+        if signature != LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile("Bad magic number for a local file header.")
+
+        if len(self.buffer) < LOCAL_HEADER.size:
+            return False
+        (
+            _,
+            _,
+            flags,
+            method,
+            _,
+            _,
+            crc,
+            compressed_size,
+            _,
+            name_length,
+            extra_length,
+        ) = LOCAL_HEADER.unpack_from(self.buffer)
+
+        header_size = LOCAL_HEADER.size + name_length + extra_length
+        if len(self.buffer) < header_size:
+            return False
+
+        name_bytes = bytes(
+            self.buffer[LOCAL_HEADER.size : LOCAL_HEADER.size + name_length]
+        )
+        extra = bytes(self.buffer[LOCAL_HEADER.size + name_length : header_size])
+        del self.buffer[:header_size]
+
+        filename = name_bytes.decode("utf-8" if flags & FLAG_UTF8 else "cp437")
+        if flags & FLAG_ENCRYPTED:
+            raise UnsupportedStreamError(f"Member {filename} is encrypted.")
+
+        # Data descriptors have 8 byte sizes if the member has Zip64 sizes:
+        zip64_compressed_size = self.read_zip64_compressed_size(extra=extra)
+        self.zip64 = zip64_compressed_size is not None
+        if compressed_size == ZIP64_LIMIT:
+            if zip64_compressed_size is None:
+                raise zipfile.BadZipFile(f"Missing the Zip64 sizes of {filename}.")
+            compressed_size = zip64_compressed_size
+
+        if method == zipfile.ZIP_STORED:
+            if flags & FLAG_DATA_DESCRIPTOR:
+                raise UnsupportedStreamError(
+                    f"Stored member {filename} with a data descriptor cannot be streamed."
+                )
+            self.decompressor = None
+        elif method == zipfile.ZIP_DEFLATED:
+            self.decompressor = zlib.decompressobj(-15)
+        elif method == zipfile.ZIP_BZIP2:
+            self.decompressor = bz2.BZ2Decompressor()
+        else:
+            raise UnsupportedStreamError(
+                f"Member {filename} uses an unsupported compression method {method}."
+            )
+
+        self.flags = flags
+        self.method = method
+        self.expected_crc = crc
+        self.crc = 0
+        self.remaining = compressed_size
+        self.open_member(filename=filename)
+        self.state = "data"
+        return True
+
+    def read_zip64_compressed_size(self, extra: bytes) -> int | None:
+        offset = 0
+        while offset + 4 <= len(extra):
+            field_id, field_size = struct.unpack_from("<2H", extra, offset)
+            if field_id == ZIP64_EXTRA_ID and field_size >= 16:
+                # Original size comes first, followed by the compressed size:
+                return struct.unpack_from("<Q", extra, offset + 12)[0]
+            offset += 4 + field_size
+
+        return None
+
+    def open_member(self, filename: str) -> None:
+        self.n_members += 1
+        member_path = get_member_path(filename=filename)
+        if member_path is None:
+            self.output_file = None
+            return
+
+        output_path = Path(self.destination_path, member_path)
+        if filename.endswith("/"):
+            output_path.mkdir(parents=True, exist_ok=True)
+            self.output_file = None
+            return
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.output_file = output_path.open(mode="wb")
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+
+        self.crc = zlib.crc32(data, self.crc)
+        if self.output_file is not None:
+            self.output_file.write(data)
+
+    def read_data(self) -> bool:
+        # Compressed members with a data descriptor end with the end
+        # of their compressed stream:
+        if self.flags & FLAG_DATA_DESCRIPTOR:
+            if not self.buffer:
+                return False
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            self.write(data=self.decompressor.decompress(data))
+            if not self.decompressor.eof:
+                return False
+
+            self.buffer[:0] = self.decompressor.unused_data
+            self.state = "descriptor"
+            return True
+
+        n_bytes = min(len(self.buffer), self.remaining)
+        if n_bytes == 0 and self.remaining > 0:
+            return False
+
+        data = bytes(self.buffer[:n_bytes])
+        del self.buffer[:n_bytes]
+        self.remaining -= n_bytes
+        self.write(
+            data=data
+            if self.decompressor is None
+            else self.decompressor.decompress(data)
+        )
+
+        if self.remaining == 0:
+            if self.method == zipfile.ZIP_DEFLATED:
+                self.write(data=self.decompressor.flush())
+            self.finish_member(crc=self.expected_crc)
+        return True
+
+    def read_descriptor(self) -> bool:
+        if len(self.buffer) < 4:
+            return False
+
+        has_signature = self.buffer[:4] == DATA_DESCRIPTOR_SIGNATURE
+        size_format = "<LQQ" if self.zip64 else "<LLL"
+        descriptor_size = struct.calcsize(size_format) + (4 if has_signature else 0)
+        if len(self.buffer) < descriptor_size:
+            return False
+
+        crc, _, _ = struct.unpack_from(
+            size_format, self.buffer, 4 if has_signature else 0
+        )
+        del self.buffer[:descriptor_size]
+        self.finish_member(crc=crc)
+        return True
+
+    def finish_member(self, crc: int) -> None:
+        if self.output_file is not None:
+            self.output_file.close()
+            self.output_file = None
+
+        if self.crc != crc:
+            raise zipfile.BadZipFile(f"Bad CRC-32 of member {self.n_members}.")
+
+        self.state = "header"
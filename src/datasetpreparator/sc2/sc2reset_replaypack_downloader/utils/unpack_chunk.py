@@ -1,11 +1,89 @@
-import logging
+import os
+import shutil
+import time
 import zipfile
 from pathlib import Path
 
+from datasetpreparator.directory_flattener.directory_flattener import (
+    calculate_file_hash,
+)
+from datasetpreparator.directory_flattener.utils.manifest import ManifestEntry
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.stream_unzip import (
+    get_member_path,
+)
 
-def unpack_chunk(zip_path: Path, filenames: list[str], output_extract_path: Path):
+# Archives opened by the current worker process, shared by all of its chunks:
+_worker_zip_files: dict[str, zipfile.ZipFile] = {}
+
+
+def open_worker_zipfile(zip_path: Path) -> None:
+    """
+    Opens the archive once in a worker process, used as the initializer
+    of the worker processes so the chunks do not reopen the archive.
+
+    Parameters
+    ----------
+    zip_path : Path
+        Specifies the path to the archive file that will be extracted.
+    """
+
+    _worker_zip_files[str(zip_path)] = zipfile.ZipFile(zip_path, "r")
+
+
+def get_flattened_entry(
+    zip_info: zipfile.ZipInfo,
+    output_extract_path: Path,
+) -> ManifestEntry | None:
+    """
+    Gets the name under which directory_flattener would place an archive member,
+    if the archive was extracted to output_extract_path and flattened by path hash.
+    The size and the modification time are those of the archive member,
+    the extracted file is stamped with the same modification time.
+
+    Parameters
+    ----------
+    zip_info : zipfile.ZipInfo
+        Member of the archive.
+    output_extract_path : Path
+        Specifies the path to the flattened directory, its name is the root
+        of the original paths in the mapping.
+
+    Returns
+    -------
+    ManifestEntry | None
+        Returns the entry of the flattened member, None if the member has no name.
+    """
+
+    member_path = get_member_path(filename=zip_info.filename)
+    if member_path is None:
+        return None
+
+    root_dir_name_and_file = Path(output_extract_path.name, member_path)
+    unique_filename = calculate_file_hash(root_dir_name_and_file)
+    return ManifestEntry(
+        source=str(root_dir_name_and_file),
+        size=zip_info.file_size,
+        mtime_ns=int(time.mktime(zip_info.date_time + (0, 0, -1))) * 1_000_000_000,
+        output_name=Path(unique_filename).with_suffix(member_path.suffix).name,
+        hash_mode="path",
+        placement="copy",
+    )
+
+
+def unpack_chunk(
+    zip_path: Path,
+    filenames: list[str],
+    output_extract_path: Path,
+    flatten_extension: str | None = None,
+) -> tuple[int, list[tuple[str, str]], list[ManifestEntry]]:
     """
     Helper function for unpacking a chunk of files from an archive.
+    Uses the archive opened by the worker process if it is available.
+    A file that cannot be extracted does not stop the extraction of the chunk,
+    its error is returned instead.
+
+    If flatten_extension is set, only the files with the extension are extracted,
+    directly to the flat names that directory_flattener would give them.
 
     Parameters
     ----------
@@ -16,6 +94,16 @@ def unpack_chunk(zip_path: Path, filenames: list[str], output_extract_path: Path
         and will be extracted.
     output_extract_path : Path
         Specifies the path to which the files will be extracted to.
+    flatten_extension : str | None, optional
+        Specifies the extension of the files that are extracted to the flattened
+        layout, by default None which extracts the files with their paths.
+
+    Returns
+    -------
+    tuple[int, list[tuple[str, str]], list[ManifestEntry]]
+        Returns the uncompressed size of the processed files in bytes,
+        the names of the files that could not be extracted with their errors,
+        and the entries of the flattened files.
 
     Examples
     --------
@@ -37,12 +125,84 @@ def unpack_chunk(zip_path: Path, filenames: list[str], output_extract_path: Path
     >>> assert isinstance(path_to_extract, str)
     """
 
-    with zipfile.ZipFile(zip_path, "r") as zip_file:
-        for filename in filenames:
-            try:
-                zip_file.extract(filename, str(output_extract_path))
-            except zipfile.error as e:
-                logging.error(
-                    f"zipfile error was raised: {e}",
-                    exc_info=True,
-                )
+    zip_file = _worker_zip_files.get(str(zip_path))
+    if zip_file is None:
+        with zipfile.ZipFile(zip_path, "r") as zip_file:
+            return extract_members(
+                zip_file=zip_file,
+                filenames=filenames,
+                output_extract_path=output_extract_path,
+                flatten_extension=flatten_extension,
+            )
+
+    return extract_members(
+        zip_file=zip_file,
+        filenames=filenames,
+        output_extract_path=output_extract_path,
+        flatten_extension=flatten_extension,
+    )
+
+
+def extract_members(
+    zip_file: zipfile.ZipFile,
+    filenames: list[str],
+    output_extract_path: Path,
+    flatten_extension: str | None = None,
+) -> tuple[int, list[tuple[str, str]], list[ManifestEntry]]:
+    """
+    Extracts the files from an open archive, collecting the errors.
+
+    Parameters
+    ----------
+    zip_file : zipfile.ZipFile
+        Archive opened for reading.
+    filenames : list[str]
+        Specifies a list of the filenames which are within the archive\
+        and will be extracted.
+    output_extract_path : Path
+        Specifies the path to which the files will be extracted to.
+    flatten_extension : str | None, optional
+        Specifies the extension of the files that are extracted to the flattened
+        layout, by default None which extracts the files with their paths.
+
+    Returns
+    -------
+    tuple[int, list[tuple[str, str]], list[ManifestEntry]]
+        Returns the uncompressed size of the processed files in bytes,
+        the names of the files that could not be extracted with their errors,
+        and the entries of the flattened files.
+    """
+
+    processed_bytes = 0
+    failures: list[tuple[str, str]] = []
+    flattened_entries: list[ManifestEntry] = []
+    for filename in filenames:
+        try:
+            zip_info = zip_file.getinfo(filename)
+            processed_bytes += zip_info.file_size
+            if flatten_extension is None:
+                zip_file.extract(zip_info, str(output_extract_path))
+                continue
+
+            # Same selection of the files as in directory_flattener:
+            if zip_info.is_dir() or not filename.endswith(flatten_extension):
+                continue
+            entry = get_flattened_entry(
+                zip_info=zip_info,
+                output_extract_path=output_extract_path,
+            )
+            if entry is None:
+                continue
+            output_file_path = Path(output_extract_path, entry.output_name)
+            with (
+                zip_file.open(zip_info) as member_file,
+                output_file_path.open("wb") as output_file,
+            ):
+                shutil.copyfileobj(member_file, output_file)
+            os.utime(output_file_path, ns=(entry.mtime_ns, entry.mtime_ns))
+            flattened_entries.append(entry)
+        # Corrupted members raise errors of zipfile and of the decompressors:
+        except Exception as e:
+            failures.append((filename, repr(e)))
+
+    return processed_bytes, failures, flattened_entries
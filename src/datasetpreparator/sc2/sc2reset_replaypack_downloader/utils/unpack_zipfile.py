@@ -1,23 +1,81 @@
-import math
+import heapq
+import logging
 import zipfile
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 import tqdm
 
+from datasetpreparator.directory_flattener.utils.mapping_writer import MappingWriter
 from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.unpack_chunk import (
+    open_worker_zipfile,
     unpack_chunk,
 )
 
+# Number of chunks per worker, more chunks than workers keep all of the workers
+# busy until the end and update the progress more often:
+CHUNKS_PER_WORKER = 4
+
+
+class UnpackFailed(Exception):
+    def __init__(self, *args):
+        super().__init__(*args)
+
+
+def split_members_by_size(
+    zip_infos: list[zipfile.ZipInfo],
+    n_chunks: int,
+) -> list[list[zipfile.ZipInfo]]:
+    """
+    Splits the members of an archive into chunks of similar compressed size.
+    The largest members are assigned first, each to the currently smallest chunk.
+
+    Parameters
+    ----------
+    zip_infos : list[zipfile.ZipInfo]
+        Members of the archive.
+    n_chunks : int
+        Maximal number of chunks.
+
+    Returns
+    -------
+    list[list[zipfile.ZipInfo]]
+        Returns the non-empty chunks, the largest chunk first.
+    """
+
+    chunks: list[list[zipfile.ZipInfo]] = [[] for _ in range(max(n_chunks, 1))]
+    chunk_sizes = [(0, index) for index in range(len(chunks))]
+    for zip_info in sorted(
+        zip_infos, key=lambda info: info.compress_size, reverse=True
+    ):
+        chunk_size, index = heapq.heappop(chunk_sizes)
+        chunks[index].append(zip_info)
+        heapq.heappush(chunk_sizes, (chunk_size + zip_info.compress_size, index))
+
+    chunks = [chunk for chunk in chunks if chunk]
+    chunks.sort(
+        key=lambda chunk: sum(info.compress_size for info in chunk), reverse=True
+    )
+    return chunks
+
 
 def unpack_zipfile(
     destination_dir: Path,
     destination_subdir: Path,
     zip_path: Path,
     n_workers: int,
-) -> str:
+    flatten_extension: str | None = None,
+) -> Path:
     """
     Helper function that unpacks the content of .zip archive.
+    The members are split into chunks of similar compressed size that are
+    extracted in parallel, each of the worker processes opens the archive once.
+    The progress is reported in extracted bytes as the chunks complete.
+
+    If flatten_extension is set, the files with the extension are extracted
+    directly to the layout that directory_flattener would create from the
+    extracted directory, with the same hashed names and processed_mapping.json,
+    so the intermediate extracted directory is never written.
 
     Parameters
     ----------
@@ -29,16 +87,22 @@ def unpack_zipfile(
         Specifies the path to the zip file that will be extracted.
     n_workers : int
         Specifies the number of workers that will be used for unpacking the archive.
+    flatten_extension : str | None, optional
+        Specifies the extension of the files that are extracted to the flattened
+        layout, by default None which extracts all of the files with their paths.
 
     Returns
     -------
-    str
+    Path
         Returns a path to the extracted content.
 
     Raises
     ------
     Exception
         Raises an exception if the number of workers is less or equal to zero.
+    UnpackFailed
+        Raises an exception if any of the files could not be extracted,
+        after all of the other files were extracted.
 
     Examples
     --------
@@ -67,24 +131,76 @@ def unpack_zipfile(
     if n_workers <= 0:
         raise Exception("Number of workers cannot be equal or less than zero!")
 
-    file_list: list[str] = []
     path_to_extract = Path(destination_dir, destination_subdir)
     with zipfile.ZipFile(zip_path, "r") as zip_file:
-        # Checking the existence of the extraction output directory
-        # If it doesn't exist it will be created:
-        if not path_to_extract.exists():
-            path_to_extract.mkdir(parents=True, exist_ok=False)
-
-        file_list = zip_file.namelist()
-
-    chunksize = math.ceil(len(file_list) / n_workers)
-
-    with ProcessPoolExecutor(n_workers) as exe:
-        for index in tqdm.tqdm(
-            range(0, len(file_list), chunksize),
-            desc=f"Extracting {path_to_extract.name}: ",
-        ):
-            filenames = file_list[index : (index + chunksize)]
-            _ = exe.submit(unpack_chunk, zip_path, filenames, path_to_extract)
+        zip_infos = zip_file.infolist()
+
+    # Checking the existence of the extraction output directory
+    # If it doesn't exist it will be created. The subdirectories are created
+    # before extracting, so the workers do not race to create them:
+    path_to_extract.mkdir(parents=True, exist_ok=True)
+    mapping_writer = None
+    if flatten_extension is None:
+        for directory in {Path(info.filename).parent for info in zip_infos}:
+            Path(path_to_extract, directory).mkdir(parents=True, exist_ok=True)
+    else:
+        mapping_writer = MappingWriter(output_path=path_to_extract)
+
+    chunks = split_members_by_size(
+        zip_infos=zip_infos,
+        n_chunks=min(len(zip_infos), n_workers * CHUNKS_PER_WORKER),
+    )
+
+    failures: list[tuple[str, str]] = []
+    with (
+        ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=open_worker_zipfile,
+            initargs=(zip_path,),
+        ) as executor,
+        tqdm.tqdm(
+            desc=f"Extracting {path_to_extract.name}",
+            total=sum(info.file_size for info in zip_infos),
+            unit="B",
+            unit_scale=True,
+            unit_divisor=1024,
+        ) as progress_bar,
+    ):
+        future_to_chunk = {
+            executor.submit(
+                unpack_chunk,
+                zip_path,
+                [info.filename for info in chunk],
+                path_to_extract,
+                flatten_extension,
+            ): chunk
+            for chunk in chunks
+        }
+        for future in as_completed(future_to_chunk):
+            chunk = future_to_chunk[future]
+            try:
+                processed_bytes, chunk_failures, flattened_entries = future.result()
+            except Exception as e:
+                logging.error(f"Extracting a chunk of {str(zip_path)} failed: {e}")
+                processed_bytes = sum(info.file_size for info in chunk)
+                chunk_failures = [(info.filename, repr(e)) for info in chunk]
+                flattened_entries = []
+
+            failures.extend(chunk_failures)
+            if mapping_writer is not None:
+                for entry in flattened_entries:
+                    mapping_writer.add(entry=entry)
+                mapping_writer.flush()
+            progress_bar.update(processed_bytes)
+
+    if mapping_writer is not None:
+        mapping_writer.finalize()
+
+    if failures:
+        for filename, error in failures:
+            logging.error(f"Could not extract {filename} from {str(zip_path)}: {error}")
+        raise UnpackFailed(
+            f"{len(failures)} of {len(zip_infos)} files could not be extracted from {str(zip_path)}."
+        )
 
     return path_to_extract
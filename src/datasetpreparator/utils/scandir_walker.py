@@ -0,0 +1,67 @@
+import logging
+import os
+from collections.abc import Iterator
+from pathlib import Path
+
+
+def list_subdirectories(input_path: Path) -> list[Path]:
+    """
+    Lists the immediate subdirectories of the input path with a single
+    os.scandir call, the entry type is taken from the cached DirEntry information.
+
+    Parameters
+    ----------
+    input_path : Path
+        Specifies the path for which the subdirectories will be listed.
+
+    Returns
+    -------
+    list[Path]
+        Returns a sorted list of the immediate subdirectories.
+    """
+
+    with os.scandir(input_path) as entries:
+        subdirectories = [Path(entry.path) for entry in entries if entry.is_dir()]
+
+    return sorted(subdirectories)
+
+
+def scandir_walk(
+    root_directory: Path,
+    file_extension: str = "",
+) -> Iterator[os.DirEntry]:
+    """
+    Walks the directory tree once with os.scandir and lazily yields the entries
+    of the files that end with the selected extension. Each of the directories
+    is visited only once and the type of every entry is resolved from the
+    cached DirEntry information, so no additional stat calls are issued
+    during the discovery. Symbolic links to directories are not followed.
+
+    Parameters
+    ----------
+    root_directory : Path
+        Specifies the directory that will be walked recursively.
+    file_extension : str, optional
+        Specifies the extension of the files that will be yielded,
+        by default "" which yields all of the files.
+
+    Yields
+    ------
+    Iterator[os.DirEntry]
+        Yields the DirEntry of each of the detected files.
+    """
+
+    directories_to_visit = [str(root_directory)]
+    while directories_to_visit:
+        current_directory = directories_to_visit.pop()
+        try:
+            with os.scandir(current_directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories_to_visit.append(entry.path)
+                        continue
+
+                    if entry.name.endswith(file_extension) and entry.is_file():
+                        yield entry
+        except OSError as e:
+            logging.error(f"Could not scan directory {current_directory}: {e}")
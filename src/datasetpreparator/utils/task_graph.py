@@ -0,0 +1,232 @@
+import heapq
+import logging
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from typing import Any
+
+from tqdm import tqdm
+
+
+class PipelineTask:
+    """
+    Single task of a TaskGraph.
+
+    Parameters
+    ----------
+    name : str
+        Unique name of the task.
+    stage : str
+        Name of the stage whose worker pool runs the task.
+    function : Callable[[], Any]
+        Function that is called without arguments to run the task. If it returns
+        False, the task succeeds but the tasks that depend on it are skipped.
+    dependencies : list[str]
+        Names of the tasks that have to succeed before this task is started.
+    priority : float
+        Tasks with a higher priority are started first when they wait for
+        the same stage.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        stage: str,
+        function: Callable[[], Any],
+        dependencies: list[str],
+        priority: float,
+    ):
+        self.name = name
+        self.stage = stage
+        self.function = function
+        self.dependencies = dependencies
+        self.priority = priority
+        self.status = "pending"
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class TaskGraph:
+    """
+    Directed acyclic graph of tasks. Each of the stages has its own pool of
+    worker threads, a task is started as soon as all of its dependencies
+    succeeded and a worker of its stage is free, so the tasks of different
+    stages run at the same time. The tasks that depend on a failed task
+    are skipped, the other tasks continue.
+    """
+
+    def __init__(self):
+        self.tasks: dict[str, PipelineTask] = {}
+
+    def add_task(
+        self,
+        name: str,
+        stage: str,
+        function: Callable[[], Any],
+        dependencies: list[str] | None = None,
+        priority: float = 0.0,
+    ) -> str:
+        """
+        Adds a task to the graph.
+
+        Parameters
+        ----------
+        name : str
+            Unique name of the task.
+        stage : str
+            Name of the stage whose worker pool runs the task.
+        function : Callable[[], Any]
+            Function that is called without arguments to run the task.
+        dependencies : list[str] | None, optional
+            Names of the tasks that have to succeed first, by default None
+        priority : float, optional
+            Priority of the task within its stage, by default 0.0
+
+        Returns
+        -------
+        str
+            Returns the name of the task, to be used as a dependency.
+        """
+
+        if name in self.tasks:
+            raise ValueError(f"Task {name} is already in the graph.")
+
+        self.tasks[name] = PipelineTask(
+            name=name,
+            stage=stage,
+            function=function,
+            dependencies=list(dependencies or []),
+            priority=priority,
+        )
+        return name
+
+    def get_dependents(self) -> dict[str, list[str]]:
+        dependents = {name: [] for name in self.tasks}
+        for task in self.tasks.values():
+            for dependency in task.dependencies:
+                if dependency not in self.tasks:
+                    raise ValueError(
+                        f"Task {task.name} depends on an unknown task {dependency}."
+                    )
+                dependents[dependency].append(task.name)
+
+        return dependents
+
+    def check_acyclic(self, dependents: dict[str, list[str]]) -> None:
+        # Kahn's algorithm visits every task only if there are no cycles:
+        n_waiting = {name: len(task.dependencies) for name, task in self.tasks.items()}
+        visit = [name for name, count in n_waiting.items() if count == 0]
+        n_visited = 0
+        while visit:
+            name = visit.pop()
+            n_visited += 1
+            for waiting in dependents[name]:
+                n_waiting[waiting] -= 1
+                if n_waiting[waiting] == 0:
+                    visit.append(waiting)
+
+        if n_visited != len(self.tasks):
+            raise ValueError("The task graph contains a cycle.")
+
+    def run(self, stage_workers: dict[str, int]) -> dict[str, PipelineTask]:
+        """
+        Runs all of the tasks of the graph.
+
+        Parameters
+        ----------
+        stage_workers : dict[str, int]
+            Number of the worker threads of each of the stages.
+
+        Returns
+        -------
+        dict[str, PipelineTask]
+            Returns the tasks by their names, with their status set to
+            "succeeded", "failed" or "skipped".
+        """
+
+        for task in self.tasks.values():
+            if stage_workers.get(task.stage, 0) < 1:
+                raise ValueError(
+                    f"Task {task.name} belongs to the stage {task.stage} without workers."
+                )
+        dependents = self.get_dependents()
+        self.check_acyclic(dependents=dependents)
+
+        n_waiting = {name: len(task.dependencies) for name, task in self.tasks.items()}
+        # Tasks that can be started, ordered by their priority and insertion order:
+        ready: dict[str, list[tuple[float, int, str]]] = {
+            stage: [] for stage in stage_workers
+        }
+        order = {name: index for index, name in enumerate(self.tasks)}
+        n_running = {stage: 0 for stage in stage_workers}
+        running: dict[Future, PipelineTask] = {}
+
+        with (
+            ExitStack() as stack,
+            tqdm(
+                total=len(self.tasks), desc="Pipeline tasks", unit="task"
+            ) as progress_bar,
+        ):
+
+            def release(name: str) -> None:
+                n_waiting[name] -= 1
+                task = self.tasks[name]
+                # Tasks skipped by their other dependencies are not started:
+                if n_waiting[name] == 0 and task.status == "pending":
+                    heapq.heappush(
+                        ready[task.stage], (-task.priority, order[name], name)
+                    )
+
+            def finish(task: PipelineTask) -> None:
+                progress_bar.update(1)
+                # Tasks waiting for the result of this task run only if it succeeded:
+                to_skip = []
+                for dependent in dependents[task.name]:
+                    if task.status == "succeeded" and task.result is not False:
+                        release(name=dependent)
+                    elif self.tasks[dependent].status == "pending":
+                        self.tasks[dependent].status = "skipped"
+                        to_skip.append(self.tasks[dependent])
+                for skipped_task in to_skip:
+                    finish(task=skipped_task)
+
+            for name, task in self.tasks.items():
+                if n_waiting[name] == 0:
+                    heapq.heappush(
+                        ready[task.stage], (-task.priority, order[name], name)
+                    )
+
+            executors = {
+                stage: stack.enter_context(
+                    ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix=stage)
+                )
+                for stage, n_workers in stage_workers.items()
+            }
+            while running or any(ready.values()):
+                for stage, stage_ready in ready.items():
+                    while stage_ready and n_running[stage] < stage_workers[stage]:
+                        _, _, name = heapq.heappop(stage_ready)
+                        task = self.tasks[name]
+                        task.status = "running"
+                        logging.debug(f"Starting task {name} in stage {stage}")
+                        running[executors[stage].submit(task.function)] = task
+                        n_running[stage] += 1
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    n_running[task.stage] -= 1
+                    try:
+                        task.result = future.result()
+                    except Exception as e:
+                        # Any error of a task fails only the task and its dependents:
+                        task.status = "failed"
+                        task.error = e
+                        logging.exception(f"Task {task.name} failed.")
+                    else:
+                        task.status = "succeeded"
+                        if task.result is False:
+                            logging.debug(f"Task {task.name} skips its dependents.")
+                    finish(task=task)
+
+        return self.tasks
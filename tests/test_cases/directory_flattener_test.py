@@ -1,24 +1,72 @@
+import json
 import logging
+import multiprocessing
+import queue
+import shutil
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 from datasetpreparator.directory_flattener.directory_flattener import (
+    FLATTEN_BATCH_SIZE,
+    DirectoryFlattenJob,
+    MultiprocessFlattenArguments,
+    discover_directory,
     multiple_directory_flattener,
 )
-
+from datasetpreparator.directory_flattener.utils.manifest import (
+    MANIFEST_FILENAME,
+    FlattenerManifest,
+    ManifestEntry,
+)
+from datasetpreparator.directory_flattener.utils.mapping_writer import (
+    DUPLICATES_FILENAME,
+    MAPPING_FILENAME,
+    MAPPING_JOURNAL_FILENAME,
+    MappingWriter,
+    convert_mapping_journal,
+)
 from tests.test_settings import (
     DELETE_SCRIPT_TEST_DIR,
-    DELETE_SCRIPT_TEST_OUTPUT_DIR,
     DELETE_SCRIPT_TEST_INPUT_DIR,
+    DELETE_SCRIPT_TEST_OUTPUT_DIR,
 )
-
 from tests.test_utils import (
+    create_nested_test_directories,
     create_script_test_input_dir,
     create_script_test_output_dir,
     create_test_text_files,
-    create_nested_test_directories,
     dir_test_cleanup,
 )
 
 
+def write_mapping_until_killed(
+    output_path: Path, n_entries: int, journal_written
+) -> None:
+    # Writes a part of the mapping and waits to be killed in the middle of a line:
+    mapping_writer = MappingWriter(output_path=output_path)
+    for i in range(n_entries):
+        mapping_writer.add(
+            entry=ManifestEntry(
+                source=f"replaypack/replay_{i}.SC2Replay",
+                size=1,
+                mtime_ns=0,
+                output_name=f"{i}.SC2Replay",
+                hash_mode="path",
+                placement="copy",
+            )
+        )
+    mapping_writer.flush()
+    mapping_writer.journal.write('{"output_name": "cut')
+    mapping_writer.flush()
+
+    journal_written.set()
+    while True:
+        time.sleep(1)
+
+
 class DirectoryFlattenerTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -52,12 +100,16 @@ class DirectoryFlattenerTest(unittest.TestCase):
                 extension=".txt",
             )
 
-        # TODO: There could also be empty input directories to test or directorie
-        # with all files that are not of the selected extension.
-        # In that case to get a proper assertion each of the input directories should
-        # be remembered and the number of files in the output should be known
-        # before the assertions are made.
-        # cls.list_of_input_dirs = list(cls.input_path.iterdir())
+        # Directory with all files that are not of the selected extension,
+        # it should not be present in the output:
+        dir_without_extension = Path(cls.input_path, "dir_without_extension")
+        dir_without_extension.mkdir(exist_ok=True)
+        create_test_text_files(
+            input_path=dir_without_extension,
+            n_files=cls.n_out_of_distribution_files,
+            filenames=[],
+            extension=".txt",
+        )
 
     def test_directory_flattener(self) -> None:
         ok, list_of_output_dirs = multiple_directory_flattener(
@@ -102,7 +154,353 @@ class DirectoryFlattenerTest(unittest.TestCase):
             for file in output_dir.iterdir():
                 self.assertFalse(file.is_dir())
 
-            # TODO: Check the contents of the json mapping?
+            # Every flattened file should be mapped to its previous path:
+            with json_files[0].open() as json_file:
+                mapping = json.load(json_file)
+            self.assertEqual(
+                sorted(file.name for file in out_files), sorted(mapping.keys())
+            )
+            for previous_path in mapping.values():
+                self.assertTrue(Path(self.input_path, previous_path).is_file())
+
+    def test_directory_flattener_hardlink(self) -> None:
+        hardlink_output_path = Path(self.output_path.parent, "output_hardlink")
+        ok, list_of_output_dirs = multiple_directory_flattener(
+            input_path=self.input_path,
+            output_path=hardlink_output_path,
+            file_extension=self.file_extension,
+            n_threads=self.n_threads,
+            force_overwrite=True,
+            placement="hardlink",
+        )
+
+        self.assertTrue(ok)
+        self.assertEqual(self.n_dirs, len(list_of_output_dirs))
+
+        for output_dir in list_of_output_dirs:
+            out_files = list(output_dir.glob(f"*{self.file_extension}"))
+            self.assertEqual(self.n_nested_files, len(out_files))
+
+            # Input and output are on the same device, so the data is shared:
+            for file in out_files:
+                self.assertLess(1, file.stat().st_nlink)
+
+    def test_directory_flattener_process_backend(self) -> None:
+        process_output_path = Path(self.output_path.parent, "output_process")
+        ok, list_of_output_dirs = multiple_directory_flattener(
+            input_path=self.input_path,
+            output_path=process_output_path,
+            file_extension=self.file_extension,
+            n_threads=2,
+            force_overwrite=True,
+            backend="process",
+        )
+
+        self.assertTrue(ok)
+        self.assertEqual(self.n_dirs, len(list_of_output_dirs))
+        for output_dir in list_of_output_dirs:
+            out_files = list(output_dir.glob(f"*{self.file_extension}"))
+            self.assertEqual(self.n_nested_files, len(out_files))
+
+            with Path(output_dir, "processed_mapping.json").open() as json_file:
+                mapping = json.load(json_file)
+            self.assertEqual(self.n_nested_files, len(mapping))
+
+    def test_directory_flattener_incremental(self) -> None:
+        incremental_output_path = Path(self.output_path.parent, "output_incremental")
+
+        flattener_arguments = {
+            "input_path": self.input_path,
+            "output_path": incremental_output_path,
+            "file_extension": self.file_extension,
+            "n_threads": self.n_threads,
+            "force_overwrite": True,
+            "incremental": True,
+        }
+        ok, list_of_output_dirs = multiple_directory_flattener(**flattener_arguments)
+        self.assertTrue(ok)
+        output_inodes = {
+            file: file.stat().st_ino
+            for output_dir in list_of_output_dirs
+            for file in output_dir.glob(f"*{self.file_extension}")
+        }
+        self.assertEqual(self.n_dirs * self.n_nested_files, len(output_inodes))
+
+        # Second run should not place any of the unchanged files again:
+        ok, list_of_output_dirs = multiple_directory_flattener(**flattener_arguments)
+        self.assertTrue(ok)
+        self.assertEqual(self.n_dirs, len(list_of_output_dirs))
+        for file, inode in output_inodes.items():
+            self.assertEqual(inode, file.stat().st_ino)
+
+    def test_directory_flattener_prune_manifest(self) -> None:
+        input_path = Path(self.input_path.parent, "input_prune_manifest")
+        shutil.copytree(self.input_path, input_path, dirs_exist_ok=True)
+        output_path = Path(self.output_path.parent, "output_prune_manifest")
+        flattener_arguments = {
+            "input_path": input_path,
+            "output_path": output_path,
+            "file_extension": self.file_extension,
+            "n_threads": self.n_threads,
+            "force_overwrite": True,
+            "incremental": True,
+        }
+        ok, list_of_output_dirs = multiple_directory_flattener(**flattener_arguments)
+        self.assertTrue(ok)
+        self.assertTrue(Path(output_path, MANIFEST_FILENAME).exists())
+
+        # Copy interrupted in the output, and a replay removed from the input:
+        partial_file = Path(
+            list_of_output_dirs[0], f"interrupted{self.file_extension}.part"
+        )
+        partial_file.write_bytes(b"partial")
+        removed_replay = next(input_path.rglob(f"*{self.file_extension}"))
+        removed_source = str(removed_replay.relative_to(input_path))
+        removed_replay.unlink()
+
+        # Runs that are not incremental remove the manifest that would go stale:
+        ok, _ = multiple_directory_flattener(
+            **{**flattener_arguments, "incremental": False}
+        )
+        self.assertTrue(ok)
+        self.assertFalse(partial_file.exists())
+        self.assertFalse(Path(output_path, MANIFEST_FILENAME).exists())
+
+        ok, _ = multiple_directory_flattener(**flattener_arguments)
+        self.assertTrue(ok)
+        manifest = FlattenerManifest.load(output_path=output_path)
+        self.assertFalse(manifest.has_source(source=removed_source))
+        n_entries = sum(
+            len(directory_entries) for directory_entries in manifest.entries.values()
+        )
+        self.assertEqual(self.n_dirs * self.n_nested_files - 1, n_entries)
+
+    def test_recover_killed_mapping(self) -> None:
+        output_path = Path(self.output_path.parent, "output_killed_mapping")
+        output_path.mkdir(exist_ok=True)
+        n_entries = 3
+
+        journal_written = multiprocessing.Event()
+        process = multiprocessing.Process(
+            target=write_mapping_until_killed,
+            args=(output_path, n_entries, journal_written),
+        )
+        process.start()
+        self.assertTrue(journal_written.wait(timeout=30))
+        process.kill()
+        process.join()
+
+        # The run was killed before the mapping was converted:
+        self.assertFalse(Path(output_path, MAPPING_FILENAME).exists())
+        self.assertTrue(Path(output_path, MAPPING_JOURNAL_FILENAME).exists())
+
+        # The entries written before the kill are recovered,
+        # the line that was cut off is skipped:
+        with self.assertLogs(level=logging.WARNING):
+            mapping_path = convert_mapping_journal(output_path=output_path)
+        with mapping_path.open() as json_file:
+            mapping = json.load(json_file)
+        self.assertEqual(
+            {
+                f"{i}.SC2Replay": f"replaypack/replay_{i}.SC2Replay"
+                for i in range(n_entries)
+            },
+            mapping,
+        )
+        self.assertFalse(Path(output_path, MAPPING_JOURNAL_FILENAME).exists())
+
+    def test_discover_directory_batches(self) -> None:
+        input_directory = Path(self.input_path.parent, "input_discovery", "replaypack")
+        input_directory.mkdir(parents=True, exist_ok=True)
+        n_batches = 3
+        create_test_text_files(
+            input_path=input_directory,
+            n_files=n_batches * FLATTEN_BATCH_SIZE,
+            filenames=[],
+            extension=self.file_extension,
+        )
+        output_path = Path(self.output_path.parent, "output_discovery")
+        output_path.mkdir(parents=True, exist_ok=True)
+        job = DirectoryFlattenJob(
+            arguments=MultiprocessFlattenArguments(
+                dir_output_path=Path(output_path, input_directory.name),
+                maybe_dir=input_directory,
+                file_extension=self.file_extension,
+                force_overwrite=True,
+            )
+        )
+        completed = queue.Queue()
+        batch_slots = threading.Semaphore(1)
+        worker_blocked = threading.Event()
+
+        with (
+            ThreadPoolExecutor(max_workers=1) as executor,
+            ThreadPoolExecutor(max_workers=1) as discovery_executor,
+        ):
+            # The only worker is busy, so the first batch cannot finish:
+            executor.submit(worker_blocked.wait)
+            try:
+                discovery = discovery_executor.submit(
+                    discover_directory, job, executor, batch_slots, completed
+                )
+
+                # The first batch is handed out before the walk is finished,
+                # and the walk waits for a free slot instead of collecting every file:
+                deadline = time.monotonic() + 10
+                while job.submitted_batches < 1 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                time.sleep(0.1)
+                self.assertEqual(1, job.submitted_batches)
+                self.assertFalse(discovery.done())
+            finally:
+                worker_blocked.set()
+
+            self.assertTrue(discovery.result(timeout=10))
+
+        self.assertEqual(n_batches, job.submitted_batches)
+        n_flattened_files = 0
+        while not completed.empty():
+            _, batch_future, _ = completed.get()
+            n_flattened_files += len(batch_future.result())
+        self.assertEqual(n_batches * FLATTEN_BATCH_SIZE, n_flattened_files)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        dir_test_cleanup(
+            script_name=cls.SCRIPT_NAME,
+            delete_script_test_dir_bool=DELETE_SCRIPT_TEST_DIR,
+            delete_script_test_input_bool=DELETE_SCRIPT_TEST_INPUT_DIR,
+            delete_script_test_output_bool=DELETE_SCRIPT_TEST_OUTPUT_DIR,
+        )
+
+
+class DirectoryFlattenerContentHashTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.SCRIPT_NAME = "directory_flattener_content_hash"
+        # Create and get test input and output directories:
+        cls.input_path = create_script_test_input_dir(script_name=cls.SCRIPT_NAME)
+        cls.output_path = create_script_test_output_dir(script_name=cls.SCRIPT_NAME)
+        cls.n_threads = 1
+        cls.file_extension = ".SC2Replay"
+
+        # All of the test files have the same content,
+        # so every file after the first one is a duplicate:
+        cls.n_dirs = 2
+        nested_dirs = create_nested_test_directories(
+            input_path=cls.input_path, n_dirs=cls.n_dirs
+        )
+        cls.n_nested_files = 4
+        for directory in nested_dirs:
+            create_test_text_files(
+                input_path=directory,
+                n_files=cls.n_nested_files,
+                filenames=[],
+                extension=cls.file_extension,
+            )
+
+    def test_directory_flattener_content_hash(self) -> None:
+        ok, list_of_output_dirs = multiple_directory_flattener(
+            input_path=self.input_path,
+            output_path=self.output_path,
+            file_extension=self.file_extension,
+            n_threads=self.n_threads,
+            force_overwrite=True,
+            hash_mode="content",
+        )
+
+        self.assertTrue(ok)
+        self.assertEqual(self.n_dirs, len(list_of_output_dirs))
+
+        output_files = []
+        for output_dir in list_of_output_dirs:
+            # Duplicates within a directory are written once:
+            out_files = list(output_dir.glob(f"*{self.file_extension}"))
+            self.assertEqual(1, len(out_files))
+            output_files.extend(out_files)
+
+            with Path(output_dir, "processed_mapping.json").open() as json_file:
+                mapping = json.load(json_file)
+            with Path(output_dir, DUPLICATES_FILENAME).open() as json_file:
+                duplicates = json.load(json_file)
+
+            # Every original file is either mapped or recorded as a duplicate:
+            self.assertEqual(1, len(mapping))
+            n_recorded_paths = len(mapping) + sum(
+                len(paths) for paths in duplicates.values()
+            )
+            self.assertLessEqual(self.n_nested_files, n_recorded_paths)
+
+        # Both directories hold the same content under the same name,
+        # copied duplicates do not share the data:
+        self.assertEqual(output_files[0].name, output_files[1].name)
+        self.assertFalse(output_files[0].samefile(output_files[1]))
+
+    def test_directory_flattener_content_hash_hardlink(self) -> None:
+        ok, list_of_output_dirs = multiple_directory_flattener(
+            input_path=self.input_path,
+            output_path=Path(self.output_path.parent, "output_content_hash_hardlink"),
+            file_extension=self.file_extension,
+            n_threads=self.n_threads,
+            force_overwrite=True,
+            hash_mode="content",
+            placement="hardlink",
+        )
+
+        self.assertTrue(ok)
+
+        # Duplicates in the other directory are linked to the first copy:
+        output_files = [
+            output_file
+            for output_dir in list_of_output_dirs
+            for output_file in output_dir.glob(f"*{self.file_extension}")
+        ]
+        self.assertEqual(self.n_dirs, len(output_files))
+        self.assertTrue(output_files[0].samefile(output_files[1]))
+
+    def test_directory_flattener_prune_duplicates(self) -> None:
+        input_path = Path(self.input_path.parent, "input_prune_duplicates")
+        shutil.copytree(self.input_path, input_path, dirs_exist_ok=True)
+        flattener_arguments = {
+            "input_path": input_path,
+            "output_path": Path(self.output_path.parent, "output_prune_duplicates"),
+            "file_extension": self.file_extension,
+            "n_threads": self.n_threads,
+            "force_overwrite": True,
+            "hash_mode": "content",
+            "incremental": True,
+        }
+
+        def read_duplicates(output_dir: Path) -> list[str]:
+            with Path(output_dir, DUPLICATES_FILENAME).open() as json_file:
+                return [
+                    source
+                    for sources in json.load(json_file).values()
+                    for source in sources
+                ]
+
+        ok, list_of_output_dirs = multiple_directory_flattener(**flattener_arguments)
+        self.assertTrue(ok)
+
+        # One of the directories refers to the first copy in the other directory:
+        other_directory_names = {}
+        for output_dir in list_of_output_dirs:
+            other_directory_names[output_dir] = {
+                Path(source).parts[0]
+                for source in read_duplicates(output_dir=output_dir)
+            } - {output_dir.name}
+        referring_dir = next(
+            output_dir for output_dir, names in other_directory_names.items() if names
+        )
+        (removed_directory_name,) = other_directory_names[referring_dir]
+
+        shutil.rmtree(Path(input_path, removed_directory_name))
+        ok, _ = multiple_directory_flattener(**flattener_arguments)
+        self.assertTrue(ok)
+
+        # Only the duplicates within the remaining directory are left:
+        for source in read_duplicates(output_dir=referring_dir):
+            self.assertEqual(referring_dir.name, Path(source).parts[0])
 
     @classmethod
     def tearDownClass(cls) -> None:
@@ -1,20 +1,32 @@
+import os
+import tarfile
+import tempfile
 import unittest
 import zipfile
+from pathlib import Path
 
 from datasetpreparator.directory_packager.directory_packager import (
     multiple_dir_packager,
 )
-
+from datasetpreparator.directory_packager.utils.compression import (
+    ZIP_ZSTANDARD,
+    is_zstandard_installed,
+    is_zstd_native,
+    select_auto_compression,
+)
+from datasetpreparator.directory_packager.utils.parallel_zip import (
+    IN_MEMORY_MEMBER_SIZE,
+    compress_member,
+    write_compressed_member,
+)
 from tests.test_settings import (
     DELETE_SCRIPT_TEST_DIR,
     DELETE_SCRIPT_TEST_INPUT_DIR,
 )
-
-
 from tests.test_utils import (
+    create_nested_test_directories,
     create_script_test_input_dir,
     create_test_text_files,
-    create_nested_test_directories,
     dir_test_cleanup,
 )
 
@@ -63,6 +75,196 @@ class TestDirPackagerTest(unittest.TestCase):
         # Assert equal number of files in input vs output:
         self.assertEqual(self.n_files, files_in_archive)
 
+    def test_multiple_dir_packager_contents(self) -> None:
+        archives = multiple_dir_packager(
+            input_path=self.input_path,
+            n_threads=2,
+            force_overwrite=True,
+        )
+
+        for archive in archives:
+            with zipfile.ZipFile(archive, "r") as zip_ref:
+                # CRC of every member should match its data:
+                self.assertIsNone(zip_ref.testzip())
+                for member in zip_ref.infolist():
+                    input_file = archive.with_suffix("") / member.filename
+                    self.assertEqual(input_file.read_bytes(), zip_ref.read(member))
+
+    def test_multiple_dir_packager_compression(self) -> None:
+        for compression in ["store", "deflate", "bzip2", "lzma"]:
+            with self.subTest(compression=compression):
+                archives = multiple_dir_packager(
+                    input_path=self.input_path,
+                    n_threads=self.n_threads,
+                    force_overwrite=True,
+                    compression=compression,
+                )
+
+                with zipfile.ZipFile(archives[0], "r") as zip_ref:
+                    self.assertIsNone(zip_ref.testzip())
+                    self.assertEqual(self.n_files, len(zip_ref.namelist()))
+
+    @unittest.skipUnless(is_zstandard_installed(), "zstandard is not installed")
+    def test_multiple_dir_packager_tar_zstd(self) -> None:
+        import zstandard
+
+        archives = multiple_dir_packager(
+            input_path=self.input_path,
+            n_threads=2,
+            force_overwrite=True,
+            archive_format="tar.zst",
+        )
+
+        self.assertEqual(".zst", archives[0].suffix)
+        directory_path = self.input_path / archives[0].name.removesuffix(".tar.zst")
+        with (
+            archives[0].open("rb") as archive_file,
+            zstandard.ZstdDecompressor().stream_reader(archive_file) as zstd_stream,
+            tarfile.open(fileobj=zstd_stream, mode="r|") as tar_file,
+        ):
+            n_members = 0
+            for member in tar_file:
+                n_members += 1
+                self.assertEqual(
+                    (directory_path / member.name).read_bytes(),
+                    tar_file.extractfile(member).read(),
+                )
+
+        self.assertEqual(self.n_files, n_members)
+
+    def test_multiple_dir_packager_update(self) -> None:
+        archives = multiple_dir_packager(
+            input_path=self.input_path,
+            n_threads=self.n_threads,
+            force_overwrite=True,
+        )
+        with zipfile.ZipFile(archives[0], "r") as zip_ref:
+            header_offsets = {
+                member.filename: member.header_offset for member in zip_ref.infolist()
+            }
+
+        new_file = archives[0].with_suffix("") / "new_file.SC2Replay"
+        new_file.write_bytes(b"new file contents")
+        try:
+            archives = multiple_dir_packager(
+                input_path=self.input_path,
+                n_threads=self.n_threads,
+                force_overwrite=True,
+                update=True,
+            )
+
+            # The updated copy replaced the archive:
+            self.assertFalse(archives[0].with_name(f"{archives[0].name}.part").exists())
+            with zipfile.ZipFile(archives[0], "r") as zip_ref:
+                self.assertIsNone(zip_ref.testzip())
+                self.assertEqual(b"new file contents", zip_ref.read(new_file.name))
+
+                # Unchanged members should not be rewritten:
+                for member in zip_ref.infolist():
+                    if member.filename in header_offsets:
+                        self.assertEqual(
+                            header_offsets[member.filename], member.header_offset
+                        )
+                self.assertEqual(self.n_files + 1, len(zip_ref.namelist()))
+        finally:
+            new_file.unlink()
+
+        # Removed file should be dropped from the archive:
+        archives = multiple_dir_packager(
+            input_path=self.input_path,
+            n_threads=self.n_threads,
+            force_overwrite=True,
+            update=True,
+        )
+        with zipfile.ZipFile(archives[0], "r") as zip_ref:
+            self.assertEqual(self.n_files, len(zip_ref.namelist()))
+
+    def test_multiple_dir_packager_zstd_compression(self) -> None:
+        if not is_zstd_native():
+            # The members could not be extracted by zipfile, so the method is rejected:
+            with self.assertLogs(level="ERROR"):
+                archives = multiple_dir_packager(
+                    input_path=self.input_path,
+                    n_threads=self.n_threads,
+                    force_overwrite=True,
+                    compression="zstd",
+                )
+            self.assertEqual([], archives)
+            return
+
+        archives = multiple_dir_packager(
+            input_path=self.input_path,
+            n_threads=self.n_threads,
+            force_overwrite=True,
+            compression="zstd",
+        )
+
+        with zipfile.ZipFile(archives[0], "r") as zip_ref:
+            self.assertEqual(self.n_files, len(zip_ref.namelist()))
+            for member in zip_ref.infolist():
+                self.assertEqual(ZIP_ZSTANDARD, member.compress_type)
+
+    def test_multiple_dir_packager_auto_compression(self) -> None:
+        archives = multiple_dir_packager(
+            input_path=self.input_path,
+            n_threads=self.n_threads,
+            force_overwrite=True,
+            compression="auto",
+        )
+
+        # Replays are already compressed, so they should be stored:
+        with zipfile.ZipFile(archives[0], "r") as zip_ref:
+            for member in zip_ref.infolist():
+                self.assertEqual(zipfile.ZIP_STORED, member.compress_type)
+
+        compressible_sample = b'{"key": "value"}' * 1024
+        self.assertEqual(
+            zipfile.ZIP_DEFLATED,
+            select_auto_compression(
+                file_path=Path("mapping.json"), sample=compressible_sample
+            ),
+        )
+        self.assertEqual(
+            zipfile.ZIP_STORED,
+            select_auto_compression(
+                file_path=Path("random.bin"), sample=os.urandom(4096)
+            ),
+        )
+
+    def test_compress_member_spill(self) -> None:
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            directory = Path(temporary_directory)
+            small_file = directory / "small.bin"
+            small_file.write_bytes(os.urandom(1024))
+            large_file = directory / "large.bin"
+            large_file.write_bytes(os.urandom(IN_MEMORY_MEMBER_SIZE + 1024))
+
+            archive_path = directory / "archive.zip"
+            with zipfile.ZipFile(archive_path, "w") as zip_file:
+                for file in [small_file, large_file]:
+                    member = compress_member(
+                        file_path=file,
+                        compression="store",
+                        spill_directory=directory,
+                    )
+                    # Only the large member is written to a temporary file:
+                    self.assertEqual(file == large_file, member.data_path is not None)
+                    write_compressed_member(
+                        zip_file=zip_file,
+                        file_path=file,
+                        arcname=file.name,
+                        member=member,
+                    )
+
+            # Temporary files of the members should be removed:
+            self.assertEqual(
+                {"small.bin", "large.bin", "archive.zip"},
+                {path.name for path in directory.iterdir()},
+            )
+            with zipfile.ZipFile(archive_path, "r") as zip_file:
+                self.assertIsNone(zip_file.testzip())
+                self.assertEqual(large_file.read_bytes(), zip_file.read("large.bin"))
+
     @classmethod
     def tearDownClass(cls) -> None:
         dir_test_cleanup(
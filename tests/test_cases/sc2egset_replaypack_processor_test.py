@@ -1,26 +1,51 @@
+import json
+import os
+import threading
 import unittest
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 from datasetpreparator.sc2.sc2egset_replaypack_processor.sc2egset_replaypack_processor import (
     sc2egset_replaypack_processor,
 )
-
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.multiprocess import (
+    multiprocessing_scheduler,
+)
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.pipeline_graph import (
+    ReplaypackPipelineTasks,
+    get_stage_workers,
+)
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.processing_progress import (
+    PROCESSING_METRICS_FILENAME,
+    parse_progress,
+)
 from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.replaypack_processor_args import (
     ReplaypackProcessorArguments,
+    SC2InfoExtractorGoArguments,
+)
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.replaypack_scheduling import (
+    ProcessingHistory,
+    get_max_procs,
 )
+from datasetpreparator.sc2.sc2egset_replaypack_processor.utils.replaypack_sharding import (
+    ShardMergeError,
+    merge_counts,
+    merge_file_lists,
+)
+from datasetpreparator.utils.task_graph import TaskGraph
 from tests.test_settings import (
     DELETE_SCRIPT_TEST_DIR,
-    DELETE_SCRIPT_TEST_OUTPUT_DIR,
     DELETE_SCRIPT_TEST_INPUT_DIR,
+    DELETE_SCRIPT_TEST_OUTPUT_DIR,
 )
-
-
 from tests.test_utils import (
+    create_fake_sc2infoextractorgo,
     create_script_test_input_dir,
     create_script_test_output_dir,
     dir_test_cleanup,
 )
 
-
 # TODO: sc2_replaypack_processor by default uses another piece of software for parsing SC2 replays.
 # So it will be downloading the data from another repository.
 
@@ -69,3 +94,662 @@ class SC2ReplaypackProcessorTest(unittest.TestCase):
             delete_script_test_input_bool=DELETE_SCRIPT_TEST_INPUT_DIR,
             delete_script_test_output_bool=DELETE_SCRIPT_TEST_OUTPUT_DIR,
         )
+
+
+class SC2InfoExtractorGoSchedulerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.SCRIPT_NAME = "sc2infoextractorgo_scheduler"
+        cls.input_path = create_script_test_input_dir(script_name=cls.SCRIPT_NAME)
+        cls.output_path = create_script_test_output_dir(script_name=cls.SCRIPT_NAME)
+
+        cls.executable = create_fake_sc2infoextractorgo(
+            directory=create_script_test_output_dir(script_name=cls.SCRIPT_NAME)
+        )
+        cls.replaypacks_path = Path(cls.input_path, "replaypacks")
+        for replaypack_name, replay_names in [
+            ("2020_Pack_A", ["a", "b", "corrupt"]),
+            ("2021_Pack_B", ["c"]),
+            ("2022_Pack_crash", ["d"]),
+        ]:
+            replaypack_path = Path(cls.replaypacks_path, replaypack_name)
+            replaypack_path.mkdir(parents=True, exist_ok=True)
+            for replay_name in replay_names:
+                Path(replaypack_path, f"{replay_name}.SC2Replay").write_bytes(b"")
+
+    def test_collect_processing_results(self) -> None:
+        processed_path = Path(self.output_path, "processed")
+        arguments = ReplaypackProcessorArguments(
+            input_path=self.replaypacks_path,
+            output_path=processed_path,
+            maps_directory=Path(self.input_path, "maps"),
+            n_processes=2,
+        )
+
+        results = sc2egset_replaypack_processor(
+            arguments=arguments,
+            force_overwrite=True,
+            executable=self.executable,
+        )
+
+        results_by_name = {result.processing_input.name: result for result in results}
+        self.assertEqual(
+            {"2020_Pack_A", "2021_Pack_B", "2022_Pack_crash"}, set(results_by_name)
+        )
+        self.assertTrue(results_by_name["2020_Pack_A"].succeeded)
+        self.assertIn("Processed 2 replays", results_by_name["2020_Pack_A"].stdout)
+        self.assertTrue(Path(processed_path, "2020_Pack_A", "package_0.zip").exists())
+
+        crashed_result = results_by_name["2022_Pack_crash"]
+        self.assertFalse(crashed_result.succeeded)
+        self.assertEqual(2, crashed_result.returncode)
+        self.assertIn("Cannot process", crashed_result.stderr)
+        self.assertGreater(crashed_result.duration, 0)
+
+        # Only the successful replaypacks are recorded in the history:
+        processing_history = ProcessingHistory.load(output_path=processed_path)
+        self.assertEqual(
+            {"2020_Pack_A", "2021_Pack_B"}, set(processing_history.replaypacks)
+        )
+        self.assertEqual(3, processing_history.replaypacks["2020_Pack_A"]["n_replays"])
+
+    def test_processing_metrics(self) -> None:
+        processed_path = Path(self.output_path, "metrics")
+        arguments = ReplaypackProcessorArguments(
+            input_path=self.replaypacks_path,
+            output_path=processed_path,
+            maps_directory=Path(self.input_path, "maps"),
+            n_processes=2,
+        )
+
+        results = sc2egset_replaypack_processor(
+            arguments=arguments,
+            force_overwrite=True,
+            executable=self.executable,
+        )
+        results_by_name = {result.processing_input.name: result for result in results}
+        self.assertEqual(3, results_by_name["2020_Pack_A"].replays_processed)
+        self.assertIsNone(results_by_name["2022_Pack_crash"].replays_processed)
+
+        with Path(processed_path, PROCESSING_METRICS_FILENAME).open(
+            "r"
+        ) as metrics_file:
+            metrics = json.load(metrics_file)
+        self.assertEqual(3, metrics["n_replaypacks"])
+        self.assertEqual(1, metrics["n_failed_replaypacks"])
+        self.assertEqual(5, metrics["n_replays"])
+        # The replays of the crashed replaypack are not counted in the throughput:
+        self.assertEqual(4, metrics["n_replays_processed"])
+        self.assertAlmostEqual(4 / metrics["wall_time"], metrics["replays_per_second"])
+        self.assertGreater(metrics["wall_time"], 0)
+
+        replaypacks = {
+            replaypack["name"]: replaypack for replaypack in metrics["replaypacks"]
+        }
+        self.assertEqual(3, replaypacks["2020_Pack_A"]["n_replays"])
+        self.assertEqual(3, replaypacks["2020_Pack_A"]["replays_processed"])
+        self.assertTrue(replaypacks["2020_Pack_A"]["succeeded"])
+        self.assertEqual(1, replaypacks["2021_Pack_B"]["replays_processed"])
+        self.assertFalse(replaypacks["2022_Pack_crash"]["succeeded"])
+        self.assertEqual(2, replaypacks["2022_Pack_crash"]["returncode"])
+
+    def test_parse_progress(self) -> None:
+        self.assertEqual(12, parse_progress(line="Processing replays: 12/40\n"))
+        self.assertEqual(
+            12, parse_progress(line=" 30% |███       | (12/40, 3 it/s)", n_replays=40)
+        )
+        # The progress out of a different total is scaled to the input replays:
+        self.assertEqual(
+            24, parse_progress(line="Processing replays: 12/40", n_replays=80)
+        )
+        self.assertIsNone(parse_progress(line="2024/01/02 12:00:00 Processed replays"))
+        self.assertIsNone(parse_progress(line="Read 1.2/3.4 MB"))
+        self.assertIsNone(parse_progress(line="Processed 12 replays"))
+
+    def test_skip_processed(self) -> None:
+        arguments = ReplaypackProcessorArguments(
+            input_path=self.replaypacks_path,
+            output_path=Path(self.output_path, "skip_processed"),
+            maps_directory=Path(self.input_path, "maps"),
+            n_processes=2,
+        )
+
+        def get_processed_names() -> set[str]:
+            results = sc2egset_replaypack_processor(
+                arguments=arguments,
+                force_overwrite=True,
+                executable=self.executable,
+                skip_processed=True,
+            )
+            return {result.processing_input.name for result in results}
+
+        self.assertEqual(
+            {"2020_Pack_A", "2021_Pack_B", "2022_Pack_crash"}, get_processed_names()
+        )
+        # Only the replaypack that failed is processed again:
+        self.assertEqual({"2022_Pack_crash"}, get_processed_names())
+
+        # Changing the input of a replaypack invalidates its marker:
+        Path(self.replaypacks_path, "2021_Pack_B", "new.SC2Replay").write_bytes(b"")
+        try:
+            self.assertEqual({"2021_Pack_B", "2022_Pack_crash"}, get_processed_names())
+        finally:
+            Path(self.replaypacks_path, "2021_Pack_B", "new.SC2Replay").unlink()
+
+    def test_sharded_processing(self) -> None:
+        outputs = {}
+        for output_name, n_shards in [("unsharded", 1), ("sharded", 2)]:
+            arguments = ReplaypackProcessorArguments(
+                input_path=self.replaypacks_path,
+                output_path=Path(self.output_path, output_name),
+                maps_directory=Path(self.input_path, "maps"),
+                n_processes=2,
+            )
+            results = sc2egset_replaypack_processor(
+                arguments=arguments,
+                force_overwrite=True,
+                executable=self.executable,
+                n_shards=n_shards,
+                min_replays_per_shard=1,
+            )
+            self.assertEqual(3, len(results))
+            self.assertFalse(Path(arguments.output_path, ".shards").exists())
+            # The progress of the shards is summed:
+            results_by_name = {
+                result.processing_input.name: result for result in results
+            }
+            self.assertEqual(3, results_by_name["2020_Pack_A"].replays_processed)
+            # The history keeps the wall time and the time of all of the shards:
+            entry = ProcessingHistory.load(
+                output_path=arguments.output_path
+            ).replaypacks["2020_Pack_A"]
+            self.assertEqual(
+                results_by_name["2020_Pack_A"].wall_time, entry["duration"]
+            )
+            self.assertEqual(
+                results_by_name["2020_Pack_A"].duration, entry["process_time"]
+            )
+            outputs[output_name] = Path(arguments.output_path, "2020_Pack_A")
+
+        # The merged output of the shards matches the output of a single process:
+        unsharded_path, sharded_path = outputs["unsharded"], outputs["sharded"]
+        self.assertEqual(
+            sorted(path.name for path in unsharded_path.iterdir()),
+            sorted(path.name for path in sharded_path.iterdir()),
+        )
+        for filename in ["package_summary.json", "processed_failed.log"]:
+            self.assertEqual(
+                json.loads(Path(unsharded_path, filename).read_text()),
+                json.loads(Path(sharded_path, filename).read_text()),
+            )
+        with (
+            zipfile.ZipFile(Path(unsharded_path, "package_0.zip")) as unsharded_zip,
+            zipfile.ZipFile(Path(sharded_path, "package_0.zip")) as sharded_zip,
+        ):
+            self.assertEqual(
+                {name: unsharded_zip.read(name) for name in unsharded_zip.namelist()},
+                {name: sharded_zip.read(name) for name in sharded_zip.namelist()},
+            )
+        self.assertIn(
+            "Processed 1 replays", Path(sharded_path, "main_log.log").read_text()
+        )
+
+    def test_unmergeable_shards(self) -> None:
+        arguments = ReplaypackProcessorArguments(
+            input_path=self.replaypacks_path,
+            output_path=Path(self.output_path, "unmergeable"),
+            maps_directory=Path(self.input_path, "maps"),
+            n_processes=2,
+        )
+        os.environ["FAKE_SC2INFOEXTRACTORGO_AVERAGE"] = "1"
+        try:
+            results = sc2egset_replaypack_processor(
+                arguments=arguments,
+                force_overwrite=True,
+                executable=self.executable,
+                n_shards=2,
+                min_replays_per_shard=1,
+            )
+        finally:
+            del os.environ["FAKE_SC2INFOEXTRACTORGO_AVERAGE"]
+
+        # The replaypack with an unknown summary is processed as a whole:
+        results_by_name = {result.processing_input.name: result for result in results}
+        self.assertEqual(3, len(results))
+        self.assertTrue(results_by_name["2020_Pack_A"].succeeded)
+        summary = json.loads(
+            Path(
+                arguments.output_path, "2020_Pack_A", "package_summary.json"
+            ).read_text()
+        )
+        self.assertEqual(
+            {"Replays": 2, "Failed": 1, "AverageReplays": 1.0}, summary["Summary"]
+        )
+
+    def test_merge_rules(self) -> None:
+        self.assertEqual(
+            {"Maps": {"A": 3, "B": 1}, "Replays": 4},
+            merge_counts(
+                merged={"Maps": {"A": 1}, "Replays": 2},
+                value={"Maps": {"A": 2, "B": 1}, "Replays": 2},
+            ),
+        )
+        for merged, value in [
+            ({"Replays": 1}, {"Replays": 1.5}),
+            ({"Version": "1"}, {"Version": "1"}),
+            ({"Maps": {"A": 1}}, {"Maps": 1}),
+        ]:
+            with self.assertRaises(ShardMergeError):
+                merge_counts(merged=merged, value=value)
+
+        self.assertEqual(
+            {"processedFiles": {"a": True, "b": True}, "failed": ["c", "d"]},
+            merge_file_lists(
+                merged={"processedFiles": {"a": True}, "failed": ["c"]},
+                value={"processedFiles": {"b": True}, "failed": ["d"]},
+            ),
+        )
+        for merged, value in [
+            ({"processedFiles": {"a": True}}, {"processedFiles": {"a": True}}),
+            ({"processedFiles": 1}, {"processedFiles": 1}),
+            (None, ["a"]),
+        ]:
+            with self.assertRaises(ShardMergeError):
+                merge_file_lists(merged=merged, value=value)
+
+    def get_processing_arguments(self, output_name: str) -> list:
+        return [
+            SC2InfoExtractorGoArguments.get_sc2egset_processing_args(
+                processing_input=replaypack_path,
+                output=Path(self.output_path, output_name, replaypack_path.name),
+                maps_directory=Path(self.input_path, "maps"),
+                perform_chat_anonymization=False,
+            )
+            for replaypack_path in sorted(self.replaypacks_path.iterdir())
+        ]
+
+    def test_largest_first(self) -> None:
+        processing_arguments = self.get_processing_arguments(output_name="ordered")
+
+        results = multiprocessing_scheduler(
+            processing_arguments=processing_arguments,
+            number_of_processes=1,
+            executable=self.executable,
+            costs=[1.0, 6.0, 3.0],
+            n_cpus=4,
+        )
+
+        self.assertEqual(
+            ["2021_Pack_B", "2022_Pack_crash", "2020_Pack_A"],
+            [result.processing_input.name for result in results],
+        )
+        # The largest replaypack gets most of the cores, the last one all of them:
+        self.assertIn("max_procs=3", results[0].stdout)
+        self.assertIn("max_procs=4", results[2].stdout)
+
+    def test_history_estimates(self) -> None:
+        processing_history = ProcessingHistory(history_path=Path("history.json"))
+        processing_history.record(
+            replaypack_name="2020_Pack_A",
+            n_replays=3,
+            n_bytes=100,
+            duration=2.0,
+            process_time=6.0,
+        )
+        # Histories of the earlier versions hold only the duration:
+        processing_history.replaypacks["2021_Pack_B"] = {
+            "n_replays": 1,
+            "n_bytes": 100,
+            "duration": 2.0,
+        }
+
+        # The estimates use the process time, which is split between the shards:
+        self.assertEqual(
+            6.0,
+            processing_history.estimate_duration(
+                replaypack_name="2020_Pack_A", n_bytes=100
+            ),
+        )
+        self.assertEqual(
+            2.0,
+            processing_history.estimate_duration(
+                replaypack_name="2021_Pack_B", n_bytes=100
+            ),
+        )
+        self.assertEqual(0.04, processing_history.get_seconds_per_byte())
+
+    def test_get_max_procs(self) -> None:
+        self.assertEqual(
+            1, get_max_procs(cost=1.0, remaining_cost=10.0, n_cpus=4, procs_in_use=0)
+        )
+        self.assertEqual(
+            3, get_max_procs(cost=6.0, remaining_cost=10.0, n_cpus=4, procs_in_use=0)
+        )
+        self.assertEqual(
+            2, get_max_procs(cost=6.0, remaining_cost=10.0, n_cpus=4, procs_in_use=2)
+        )
+        self.assertEqual(
+            1, get_max_procs(cost=6.0, remaining_cost=10.0, n_cpus=4, procs_in_use=4)
+        )
+
+    def test_missing_executable(self) -> None:
+        processing_arguments = self.get_processing_arguments(
+            output_name="missing_executable"
+        )
+
+        results = multiprocessing_scheduler(
+            processing_arguments=processing_arguments,
+            number_of_processes=2,
+            executable=Path(self.input_path, "missing", "SC2InfoExtractorGo"),
+        )
+
+        self.assertEqual(len(processing_arguments), len(results))
+        for result in results:
+            self.assertFalse(result.succeeded)
+            self.assertIsNone(result.returncode)
+            self.assertNotEqual("", result.stderr)
+
+    def test_mapping_copy_failure(self) -> None:
+        replaypack_path = Path(self.input_path, "mapping_copy", "2023_Pack_mapping")
+        replaypack_path.mkdir(parents=True, exist_ok=True)
+        Path(replaypack_path, "processed_mapping.json").write_text("{}")
+        # The output path is a file, so the mapping cannot be copied into it:
+        output = Path(self.output_path, "mapping_copy_output")
+        output.write_bytes(b"")
+
+        results = multiprocessing_scheduler(
+            processing_arguments=[
+                SC2InfoExtractorGoArguments.get_sc2egset_processing_args(
+                    processing_input=replaypack_path,
+                    output=output,
+                    maps_directory=Path(self.input_path, "maps"),
+                    perform_chat_anonymization=False,
+                )
+            ],
+            number_of_processes=1,
+            executable=self.executable,
+        )
+
+        self.assertEqual(1, len(results))
+        self.assertFalse(results[0].succeeded)
+        self.assertIsNone(results[0].returncode)
+        self.assertNotEqual("", results[0].stderr)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        dir_test_cleanup(
+            script_name=cls.SCRIPT_NAME,
+            delete_script_test_dir_bool=DELETE_SCRIPT_TEST_DIR,
+            delete_script_test_input_bool=DELETE_SCRIPT_TEST_INPUT_DIR,
+            delete_script_test_output_bool=DELETE_SCRIPT_TEST_OUTPUT_DIR,
+        )
+
+
+class TaskGraphTest(unittest.TestCase):
+    def test_dependencies(self) -> None:
+        order = []
+        task_graph = TaskGraph()
+        flatten = task_graph.add_task(
+            name="flatten", stage="io", function=lambda: order.append("flatten")
+        )
+        process = task_graph.add_task(
+            name="process",
+            stage="cpu",
+            function=lambda: order.append("process"),
+            dependencies=[flatten],
+        )
+        task_graph.add_task(
+            name="package",
+            stage="io",
+            function=lambda: order.append("package"),
+            dependencies=[flatten, process],
+        )
+
+        tasks = task_graph.run(stage_workers={"io": 2, "cpu": 2})
+
+        self.assertEqual(["flatten", "process", "package"], order)
+        self.assertTrue(all(task.status == "succeeded" for task in tasks.values()))
+
+    def test_stages_overlap(self) -> None:
+        # Both of the tasks have to run at the same time to pass the barrier:
+        barrier = threading.Barrier(2, timeout=10)
+        task_graph = TaskGraph()
+        task_graph.add_task(name="flatten", stage="io", function=barrier.wait)
+        task_graph.add_task(name="process", stage="cpu", function=barrier.wait)
+
+        tasks = task_graph.run(stage_workers={"io": 1, "cpu": 1})
+
+        self.assertEqual("succeeded", tasks["flatten"].status)
+        self.assertEqual("succeeded", tasks["process"].status)
+
+    def test_priority(self) -> None:
+        order = []
+        task_graph = TaskGraph()
+        for name, priority in [("small", 1), ("large", 3), ("medium", 2)]:
+            task_graph.add_task(
+                name=name,
+                stage="cpu",
+                function=lambda name=name: order.append(name),
+                priority=priority,
+            )
+
+        task_graph.run(stage_workers={"cpu": 1})
+
+        self.assertEqual(["large", "medium", "small"], order)
+
+    def test_failure_skips_dependents(self) -> None:
+        def fail() -> None:
+            raise RuntimeError("SC2InfoExtractorGo failed")
+
+        order = []
+        task_graph = TaskGraph()
+        process_a = task_graph.add_task(name="process:A", stage="cpu", function=fail)
+        process_b = task_graph.add_task(
+            name="process:B", stage="cpu", function=lambda: order.append("process:B")
+        )
+        package_a = task_graph.add_task(
+            name="package:A",
+            stage="io",
+            function=lambda: order.append("package:A"),
+            dependencies=[process_a],
+        )
+        task_graph.add_task(
+            name="summary",
+            stage="io",
+            function=lambda: order.append("summary"),
+            dependencies=[package_a, process_b],
+        )
+        skip_b = task_graph.add_task(name="skip:B", stage="io", function=lambda: False)
+        task_graph.add_task(
+            name="package:B",
+            stage="io",
+            function=lambda: order.append("package:B"),
+            dependencies=[skip_b],
+        )
+
+        tasks = task_graph.run(stage_workers={"io": 1, "cpu": 1})
+
+        self.assertEqual(["process:B"], order)
+        self.assertEqual("failed", tasks["process:A"].status)
+        self.assertIn("SC2InfoExtractorGo failed", str(tasks["process:A"].error))
+        self.assertEqual("skipped", tasks["package:A"].status)
+        self.assertEqual("skipped", tasks["summary"].status)
+        self.assertEqual("succeeded", tasks["skip:B"].status)
+        self.assertEqual("skipped", tasks["package:B"].status)
+
+    def test_invalid_graph(self) -> None:
+        task_graph = TaskGraph()
+        task_graph.add_task(name="a", stage="io", function=print, dependencies=["b"])
+        task_graph.add_task(name="b", stage="io", function=print, dependencies=["a"])
+        with self.assertRaises(ValueError):
+            task_graph.run(stage_workers={"io": 1})
+
+        task_graph = TaskGraph()
+        task_graph.add_task(name="a", stage="io", function=print, dependencies=["c"])
+        with self.assertRaises(ValueError):
+            task_graph.run(stage_workers={"io": 1})
+
+        task_graph = TaskGraph()
+        task_graph.add_task(name="a", stage="cpu", function=print)
+        with self.assertRaises(ValueError):
+            task_graph.run(stage_workers={"io": 1})
+
+
+class ReplaypackPipelineTasksTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.SCRIPT_NAME = "sc2egset_pipeline_graph"
+        cls.input_path = create_script_test_input_dir(script_name=cls.SCRIPT_NAME)
+        cls.output_path = create_script_test_output_dir(script_name=cls.SCRIPT_NAME)
+
+    def test_replaypack_tasks(self) -> None:
+        replaypack_path = Path(self.input_path, "2020_Pack_A")
+        replaypack_path.mkdir(parents=True, exist_ok=True)
+        directory_flattener_output_path = Path(self.output_path, "directory_flattener")
+        directory_flattener_output_path.mkdir(parents=True, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=1) as compression_executor:
+            pipeline_tasks = ReplaypackPipelineTasks(
+                directory_flattener_output_path=directory_flattener_output_path,
+                sc2egset_replaypack_processor_output=Path(
+                    self.output_path, "sc2egset_replaypack_processor"
+                ),
+                sc2reset_output_path=Path(self.output_path, "SC2ReSet"),
+                sc2egset_output_path=Path(self.output_path, "SC2EGSet"),
+                maps_output_path=Path(self.input_path, "maps"),
+                n_processes=1,
+                force_overwrite=True,
+                compression_executor=compression_executor,
+            )
+            # The outputs do not exist, so they are confirmed without a prompt:
+            self.assertTrue(
+                pipeline_tasks.confirm_overwrite(input_directory=replaypack_path)
+            )
+            task_graph = TaskGraph()
+            download_maps = pipeline_tasks.add_map_download(
+                task_graph=task_graph, replaypacks_input_path=self.input_path
+            )
+            pipeline_tasks.add_replaypack(
+                task_graph=task_graph,
+                input_directory=replaypack_path,
+                download_maps=download_maps,
+            )
+
+        dependencies = {
+            name: task.dependencies for name, task in task_graph.tasks.items()
+        }
+        self.assertEqual(
+            {
+                "download_maps": [],
+                "flatten:2020_Pack_A": [],
+                "package_sc2reset:2020_Pack_A": ["flatten:2020_Pack_A"],
+                "move_sc2reset:2020_Pack_A": ["package_sc2reset:2020_Pack_A"],
+                "process:2020_Pack_A": ["flatten:2020_Pack_A", "download_maps"],
+                "rename:2020_Pack_A": ["process:2020_Pack_A"],
+                "package_sc2egset:2020_Pack_A": ["rename:2020_Pack_A"],
+                "move_sc2egset:2020_Pack_A": ["package_sc2egset:2020_Pack_A"],
+            },
+            dependencies,
+        )
+
+        # A replaypack without replays skips all of the following tasks:
+        task_graph.tasks["download_maps"].function = print
+        tasks = task_graph.run(
+            stage_workers={
+                stage: 1 for stage in {task.stage for task in task_graph.tasks.values()}
+            }
+        )
+        self.assertEqual("succeeded", tasks["flatten:2020_Pack_A"].status)
+        self.assertFalse(tasks["flatten:2020_Pack_A"].result)
+        self.assertEqual(
+            ["skipped"] * 6,
+            [
+                task.status
+                for name, task in tasks.items()
+                if name not in ["download_maps", "flatten:2020_Pack_A"]
+            ],
+        )
+
+    def test_replaypacks_overlap(self) -> None:
+        processed_a = threading.Event()
+        events = []
+
+        class RecordingPipelineTasks(ReplaypackPipelineTasks):
+            """
+            Records the order of the tasks instead of running the tools.
+            """
+
+            def flatten(self, input_directory: Path) -> bool:
+                # Pack B is flattened until pack A was processed, or the wait times out:
+                if input_directory.name == "2021_Pack_B":
+                    events.append(("processed_a", processed_a.wait(timeout=30)))
+                events.append(("flatten", input_directory.name))
+                return True
+
+            def download_maps(self, replaypacks_input_path: Path) -> None:
+                events.append(("download_maps", replaypacks_input_path.name))
+
+            def process(self, replaypack_name: str) -> bool:
+                events.append(("process", replaypack_name))
+                if replaypack_name == "2020_Pack_A":
+                    processed_a.set()
+                return True
+
+            def rename(self, replaypack_name: str) -> None:
+                pass
+
+            def package(self, directory_path: Path) -> None:
+                pass
+
+            def move(self, directory_path: Path, output_path: Path) -> None:
+                pass
+
+        replaypacks_input_path = Path(self.input_path, "overlap")
+        with ThreadPoolExecutor(max_workers=1) as compression_executor:
+            pipeline_tasks = RecordingPipelineTasks(
+                directory_flattener_output_path=Path(
+                    self.output_path, "overlap_flattened"
+                ),
+                sc2egset_replaypack_processor_output=Path(
+                    self.output_path, "overlap_processed"
+                ),
+                sc2reset_output_path=Path(self.output_path, "SC2ReSet"),
+                sc2egset_output_path=Path(self.output_path, "SC2EGSet"),
+                maps_output_path=Path(self.input_path, "maps"),
+                n_processes=1,
+                force_overwrite=True,
+                compression_executor=compression_executor,
+            )
+            task_graph = TaskGraph()
+            download_maps = pipeline_tasks.add_map_download(
+                task_graph=task_graph, replaypacks_input_path=replaypacks_input_path
+            )
+            for name in ["2020_Pack_A", "2021_Pack_B"]:
+                Path(replaypacks_input_path, name).mkdir(parents=True, exist_ok=True)
+                pipeline_tasks.add_replaypack(
+                    task_graph=task_graph,
+                    input_directory=Path(replaypacks_input_path, name),
+                    download_maps=download_maps,
+                )
+            tasks = task_graph.run(
+                stage_workers=get_stage_workers(n_processes=1, n_io_threads=2)
+            )
+
+        self.assertTrue(all(task.status == "succeeded" for task in tasks.values()))
+        # The maps are downloaded once, for all of the replaypacks:
+        self.assertEqual(1, events.count(("download_maps", "overlap")))
+        # Pack A is processed while pack B is still being flattened:
+        self.assertIn(("processed_a", True), events)
+        self.assertLess(
+            events.index(("process", "2020_Pack_A")),
+            events.index(("flatten", "2021_Pack_B")),
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        dir_test_cleanup(
+            script_name=cls.SCRIPT_NAME,
+            delete_script_test_dir_bool=DELETE_SCRIPT_TEST_DIR,
+            delete_script_test_input_bool=DELETE_SCRIPT_TEST_INPUT_DIR,
+            delete_script_test_output_bool=DELETE_SCRIPT_TEST_OUTPUT_DIR,
+        )
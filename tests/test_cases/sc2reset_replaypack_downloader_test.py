@@ -1,28 +1,92 @@
-from pathlib import Path
+import hashlib
+import io
+import json
+import tempfile
+import time
 import unittest
+import zipfile
+from pathlib import Path
 
-from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.get_md5 import (
-    get_md5,
-)
+import requests
 
+from datasetpreparator.directory_flattener.directory_flattener import (
+    multiple_directory_flattener,
+)
 from datasetpreparator.sc2.sc2reset_replaypack_downloader.sc2reset_replaypack_downloader import (
     sc2reset_replaypack_downloader,
 )
-
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_file import (
+    download_file,
+    get_part_path,
+    get_segments_path,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_replaypack import (
+    download_replaypack,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.download_session import (
+    BandwidthLimiter,
+    DownloadSession,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.file_hasher import (
+    hash_file,
+    verify_files,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.get_md5 import (
+    get_md5,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.md5_sidecar import (
+    get_md5_sidecar_path,
+    read_md5_sidecar,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.replaypack_catalog import (
+    REPLAYPACK_STATE_FILENAME,
+    ReplaypackStateCache,
+    filter_replaypacks,
+    load_replaypack_catalog,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.replaypack_pipeline import (
+    ReplaypackPipeline,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.stream_replaypack import (
+    stream_replaypack,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.stream_unzip import (
+    StreamingZipExtractor,
+    UnsupportedStreamError,
+)
+from datasetpreparator.sc2.sc2reset_replaypack_downloader.utils.unpack_zipfile import (
+    UnpackFailed,
+    split_members_by_size,
+    unpack_zipfile,
+)
 from tests.test_settings import (
     DELETE_SCRIPT_TEST_DIR,
-    DELETE_SCRIPT_TEST_OUTPUT_DIR,
     DELETE_SCRIPT_TEST_INPUT_DIR,
+    DELETE_SCRIPT_TEST_OUTPUT_DIR,
 )
-
-
 from tests.test_utils import (
     create_script_test_input_dir,
     create_script_test_output_dir,
     dir_test_cleanup,
+    start_test_file_server,
 )
 
 
+class UnseekableWriter(io.RawIOBase):
+    """
+    Writes to a file without exposing seek, as when an archive is written to a stream.
+    """
+
+    def __init__(self, file):
+        self.file = file
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self.file.write(data)
+
+
 class SC2ReSetDownloaderTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -80,3 +144,730 @@ class SC2ReSetDownloaderTest(unittest.TestCase):
             delete_script_test_input_bool=DELETE_SCRIPT_TEST_INPUT_DIR,
             delete_script_test_output_bool=DELETE_SCRIPT_TEST_OUTPUT_DIR,
         )
+
+
+class FileHasherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.SCRIPT_NAME = "file_hasher"
+
+        cls.input_path = create_script_test_input_dir(script_name=cls.SCRIPT_NAME)
+
+        # Larger than a single chunk, so the file is hashed in multiple reads:
+        cls.file_contents = bytes(range(256)) * 5000
+        cls.test_file = Path(cls.input_path, "archive.zip")
+        cls.test_file.write_bytes(cls.file_contents)
+
+    def test_hash_file(self) -> None:
+        hashes = hash_file(
+            file=self.test_file,
+            algorithms=("md5", "sha256"),
+            chunk_size=64 * 1024,
+        )
+
+        self.assertEqual(hashlib.md5(self.file_contents).hexdigest(), hashes["md5"])
+        self.assertEqual(
+            hashlib.sha256(self.file_contents).hexdigest(), hashes["sha256"]
+        )
+        self.assertEqual(hashes["md5"], get_md5(self.test_file))
+
+    def test_verify_files(self) -> None:
+        md5 = hashlib.md5(self.file_contents).hexdigest()
+
+        verified = verify_files(
+            files=[
+                (self.test_file, md5),
+                (self.test_file, "0" * 32),
+                (Path(self.input_path, "missing.zip"), md5),
+            ],
+            n_workers=2,
+        )
+
+        self.assertEqual([True, False, False], list(verified))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        dir_test_cleanup(
+            script_name=cls.SCRIPT_NAME,
+            delete_script_test_dir_bool=DELETE_SCRIPT_TEST_DIR,
+            delete_script_test_input_bool=DELETE_SCRIPT_TEST_INPUT_DIR,
+            delete_script_test_output_bool=False,
+        )
+
+
+class DownloadReplaypackTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.SCRIPT_NAME = "download_replaypack"
+
+        # Files served by the local server are in the input directory,
+        # the downloads are saved to the output directory:
+        cls.input_path = create_script_test_input_dir(script_name=cls.SCRIPT_NAME)
+        cls.output_path = create_script_test_output_dir(script_name=cls.SCRIPT_NAME)
+
+        cls.file_contents = bytes(range(256)) * 1000
+        cls.md5 = hashlib.md5(cls.file_contents).hexdigest()
+        Path(cls.input_path, "replaypack.zip").write_bytes(cls.file_contents)
+
+        cls.server, cls.base_url = start_test_file_server(directory=cls.input_path)
+
+    def test_download_replaypack(self) -> None:
+        download_arguments = {
+            "destination_dir": self.output_path,
+            "replaypack_name": "replaypack",
+            "replaypack_url": f"{self.base_url}/replaypack.zip",
+            "replaypack_md5": self.md5,
+        }
+
+        download_path, ok = download_replaypack(**download_arguments)
+        self.assertTrue(ok)
+        self.assertEqual(self.file_contents, download_path.read_bytes())
+
+        # The verified md5 should be stored next to the archive:
+        self.assertTrue(get_md5_sidecar_path(file=download_path).exists())
+        self.assertEqual(self.md5, read_md5_sidecar(file=download_path))
+
+        # The verified archive should not be downloaded again:
+        n_requests = len(self.server.requested_paths)
+        _, ok = download_replaypack(**download_arguments)
+        self.assertTrue(ok)
+        self.assertEqual(n_requests, len(self.server.requested_paths))
+
+    def test_download_replaypack_wrong_md5(self) -> None:
+        n_requests = len(self.server.requested_paths)
+        download_path, ok = download_replaypack(
+            destination_dir=self.output_path,
+            replaypack_name="replaypack_wrong_md5",
+            replaypack_url=f"{self.base_url}/replaypack.zip",
+            replaypack_md5="0" * 32,
+            max_retries=1,
+            retry_backoff=0,
+        )
+        self.assertFalse(ok)
+
+        # The download should be retried, and the invalid archive removed:
+        self.assertEqual(n_requests + 2, len(self.server.requested_paths))
+        self.assertFalse(download_path.exists())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+        dir_test_cleanup(
+            script_name=cls.SCRIPT_NAME,
+            delete_script_test_dir_bool=DELETE_SCRIPT_TEST_DIR,
+            delete_script_test_input_bool=DELETE_SCRIPT_TEST_INPUT_DIR,
+            delete_script_test_output_bool=DELETE_SCRIPT_TEST_OUTPUT_DIR,
+        )
+
+
+class ConcurrentDownloadTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.SCRIPT_NAME = "concurrent_download"
+
+        cls.input_path = create_script_test_input_dir(script_name=cls.SCRIPT_NAME)
+        cls.output_path = create_script_test_output_dir(script_name=cls.SCRIPT_NAME)
+        cls.server_path = Path(cls.input_path, "server")
+        cls.server_path.mkdir(exist_ok=True)
+        cls.download_path = Path(cls.input_path, "downloads")
+        cls.download_path.mkdir(exist_ok=True)
+
+        cls.server, cls.base_url = start_test_file_server(directory=cls.server_path)
+
+        cls.n_replays = 3
+        cls.replaypack_list = []
+        for replaypack_name in ["replaypack_0", "replaypack_1", "replaypack_2"]:
+            archive_path = Path(cls.server_path, f"{replaypack_name}.zip")
+            with zipfile.ZipFile(archive_path, "w") as zip_file:
+                for i in range(cls.n_replays):
+                    zip_file.writestr(f"replay_{i}.SC2Replay", replaypack_name * 100)
+
+            cls.replaypack_list.append(
+                (
+                    replaypack_name,
+                    f"{cls.base_url}/{archive_path.name}",
+                    hashlib.md5(archive_path.read_bytes()).hexdigest(),
+                )
+            )
+
+    def test_concurrent_downloads(self) -> None:
+        sc2reset_replaypack_downloader(
+            download_path=self.download_path,
+            unpack_path=self.output_path,
+            n_workers=1,
+            replaypack_list=self.replaypack_list,
+            n_downloads=3,
+            max_connections_per_host=2,
+        )
+
+        for replaypack_name, _, archive_md5 in self.replaypack_list:
+            archive_path = Path(self.download_path, f"{replaypack_name}.zip")
+            self.assertEqual(archive_md5, get_md5(archive_path))
+
+            unpacked_replays = list(
+                Path(self.output_path, replaypack_name).glob("*.SC2Replay")
+            )
+            self.assertEqual(self.n_replays, len(unpacked_replays))
+
+    def test_replaypack_pipeline(self) -> None:
+        pipeline_download_path = Path(self.input_path, "pipeline_downloads")
+        pipeline_download_path.mkdir(exist_ok=True)
+        pipeline_unpack_path = Path(self.output_path, "pipeline")
+
+        # A valid archive without a sidecar, an invalid archive and a missing archive:
+        Path(pipeline_download_path, "replaypack_0.zip").write_bytes(
+            Path(self.server_path, "replaypack_0.zip").read_bytes()
+        )
+        Path(pipeline_download_path, "replaypack_1.zip").write_bytes(b"invalid")
+        replaypack_list = [
+            *self.replaypack_list,
+            ("replaypack_missing", f"{self.base_url}/missing.zip", "0" * 32),
+        ]
+
+        n_requests = len(self.server.requested_paths)
+        with DownloadSession(n_downloads=2) as download_session:
+            failed_replaypacks = ReplaypackPipeline(
+                download_path=pipeline_download_path,
+                unpack_path=pipeline_unpack_path,
+                n_workers=2,
+                download_session=download_session,
+                n_downloads=2,
+            ).run(replaypack_list=replaypack_list)
+
+        self.assertEqual(["replaypack_missing"], failed_replaypacks)
+        self.assertNotIn("/replaypack_0.zip", self.server.requested_paths[n_requests:])
+        for replaypack_name, _, archive_md5 in self.replaypack_list:
+            archive_path = Path(pipeline_download_path, f"{replaypack_name}.zip")
+            self.assertEqual(archive_md5, read_md5_sidecar(file=archive_path))
+
+            unpacked_replays = list(
+                Path(pipeline_unpack_path, replaypack_name).glob("*.SC2Replay")
+            )
+            self.assertEqual(self.n_replays, len(unpacked_replays))
+
+    def test_catalog_state_cache(self) -> None:
+        catalog_download_path = Path(self.input_path, "catalog_downloads")
+        catalog_download_path.mkdir(exist_ok=True)
+        catalog_unpack_path = Path(self.output_path, "catalog")
+
+        catalog_path = Path(self.input_path, "catalog.json")
+        catalog_path.write_text(
+            json.dumps(
+                {
+                    "replaypacks": [
+                        {"name": name, "url": url, "md5": md5, "year": 2020 + i}
+                        for i, (name, url, md5) in enumerate(self.replaypack_list)
+                    ]
+                }
+            )
+        )
+
+        n_requests = len(self.server.requested_paths)
+        sc2reset_replaypack_downloader(
+            download_path=catalog_download_path,
+            unpack_path=catalog_unpack_path,
+            n_workers=1,
+            catalog_path=catalog_path,
+            years=[2020, 2021],
+            names=["*_1"],
+        )
+        # Only the replaypack matching both of the filters is downloaded:
+        self.assertEqual(
+            ["/replaypack_1.zip"], self.server.requested_paths[n_requests:]
+        )
+        self.assertEqual(
+            ["replaypack_1"],
+            [path.name for path in catalog_unpack_path.iterdir()],
+        )
+
+        state_cache = ReplaypackStateCache.load(download_path=catalog_download_path)
+        self.assertTrue(
+            state_cache.is_unpacked(
+                replaypack_name="replaypack_1",
+                replaypack_md5=self.replaypack_list[1][2],
+                unpack_path=catalog_unpack_path,
+                layout="tree",
+            )
+        )
+
+        # The cached replaypack is skipped even without its archive and sidecar:
+        for archive_path in catalog_download_path.glob("replaypack_1.zip*"):
+            archive_path.unlink()
+        n_requests = len(self.server.requested_paths)
+        sc2reset_replaypack_downloader(
+            download_path=catalog_download_path,
+            unpack_path=catalog_unpack_path,
+            n_workers=1,
+            catalog_path=catalog_path,
+            names=["replaypack_1"],
+        )
+        self.assertEqual([], self.server.requested_paths[n_requests:])
+        self.assertFalse(Path(catalog_download_path, "replaypack_1.zip").exists())
+        self.assertTrue(Path(catalog_download_path, REPLAYPACK_STATE_FILENAME).exists())
+
+    def test_bandwidth_limiter(self) -> None:
+        bandwidth_limiter = BandwidthLimiter(max_bytes_per_second=500_000)
+
+        start = time.monotonic()
+        for _ in range(3):
+            bandwidth_limiter.consume(n_bytes=50_000)
+
+        # The first chunk is consumed immediately, the next two wait 0.1s each:
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+        dir_test_cleanup(
+            script_name=cls.SCRIPT_NAME,
+            delete_script_test_dir_bool=DELETE_SCRIPT_TEST_DIR,
+            delete_script_test_input_bool=DELETE_SCRIPT_TEST_INPUT_DIR,
+            delete_script_test_output_bool=DELETE_SCRIPT_TEST_OUTPUT_DIR,
+        )
+
+
+class ReplaypackCatalogTest(unittest.TestCase):
+    def test_default_catalog(self) -> None:
+        replaypacks = load_replaypack_catalog()
+
+        replaypack_names = [replaypack.name for replaypack in replaypacks]
+        self.assertEqual(len(replaypack_names), len(set(replaypack_names)))
+        for replaypack in replaypacks:
+            self.assertEqual(32, len(replaypack.md5))
+            self.assertTrue(replaypack.name.startswith(str(replaypack.year)))
+
+    def test_filter_replaypacks(self) -> None:
+        replaypacks = load_replaypack_catalog()
+
+        selected = filter_replaypacks(replaypacks=replaypacks, years=[2016])
+        self.assertNotEqual(0, len(selected))
+        self.assertTrue(all(replaypack.year == 2016 for replaypack in selected))
+
+        selected = filter_replaypacks(
+            replaypacks=replaypacks, names=["2016_IEM_10_Taipei", "*HomeStory_Cup*"]
+        )
+        self.assertIn(
+            "2016_IEM_10_Taipei", [replaypack.name for replaypack in selected]
+        )
+        self.assertTrue(
+            all(
+                replaypack.name == "2016_IEM_10_Taipei"
+                or "HomeStory_Cup" in replaypack.name
+                for replaypack in selected
+            )
+        )
+
+        self.assertEqual(
+            [],
+            filter_replaypacks(replaypacks=replaypacks, years=[2016], names=["2024_*"]),
+        )
+
+    def test_load_toml_catalog(self) -> None:
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            catalog_path = Path(temporary_dir, "catalog.toml")
+            catalog_path.write_text(
+                "[[replaypacks]]\n"
+                'name = "2020_Example"\n'
+                'url = "https://example.com/2020_Example.zip"\n'
+                'md5 = "00000000000000000000000000000000"\n'
+                "year = 2020\n"
+                "size = 1024\n"
+            )
+
+            try:
+                replaypacks = load_replaypack_catalog(catalog_path=catalog_path)
+            except ImportError:
+                self.skipTest("Neither tomllib nor tomli is available.")
+
+        self.assertEqual(1, len(replaypacks))
+        self.assertEqual(
+            (
+                "2020_Example",
+                "https://example.com/2020_Example.zip",
+                "00000000000000000000000000000000",
+            ),
+            replaypacks[0].to_tuple(),
+        )
+        self.assertEqual(1024, replaypacks[0].size)
+
+
+class ResumableDownloadTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.SCRIPT_NAME = "resumable_download"
+
+        cls.input_path = create_script_test_input_dir(script_name=cls.SCRIPT_NAME)
+        cls.output_path = create_script_test_output_dir(script_name=cls.SCRIPT_NAME)
+
+        cls.file_contents = bytes(range(256)) * 4000
+        cls.md5 = hashlib.md5(cls.file_contents).hexdigest()
+        Path(cls.input_path, "replaypack.zip").write_bytes(cls.file_contents)
+
+        cls.server, cls.base_url = start_test_file_server(directory=cls.input_path)
+        cls.file_url = f"{cls.base_url}/replaypack.zip"
+
+    def setUp(self) -> None:
+        self.server.requested_ranges.clear()
+        self.server.accept_ranges = True
+        self.server.failing_responses = 0
+
+    def test_resume_download(self) -> None:
+        offset = 100_000
+        for accept_ranges in (True, False):
+            with self.subTest(accept_ranges=accept_ranges):
+                self.server.accept_ranges = accept_ranges
+                download_filepath = Path(
+                    self.output_path, f"resume_{accept_ranges}.zip"
+                )
+                part_path = get_part_path(download_filepath=download_filepath)
+                part_path.write_bytes(self.file_contents[:offset])
+
+                _, md5 = download_file(
+                    file_url=self.file_url, download_filepath=download_filepath
+                )
+
+                # The md5 should include the bytes downloaded before resuming:
+                self.assertEqual(self.md5, md5)
+                self.assertEqual(self.file_contents, download_filepath.read_bytes())
+                self.assertFalse(part_path.exists())
+                self.assertEqual(f"bytes={offset}-", self.server.requested_ranges[-1])
+
+    def test_segmented_download(self) -> None:
+        download_filepath = Path(self.output_path, "segmented.zip")
+
+        _, md5 = download_file(
+            file_url=self.file_url,
+            download_filepath=download_filepath,
+            n_segments=4,
+            min_segment_size=1024,
+        )
+
+        self.assertEqual(self.md5, md5)
+        self.assertEqual(self.file_contents, download_filepath.read_bytes())
+        self.assertEqual(4, len(self.server.requested_ranges))
+        self.assertFalse(get_part_path(download_filepath=download_filepath).exists())
+        self.assertFalse(
+            get_segments_path(download_filepath=download_filepath).exists()
+        )
+
+    def test_segmented_download_connection_limit(self) -> None:
+        download_filepath = Path(self.output_path, "segmented_limited.zip")
+
+        # The segments wait for each other's connections instead of all opening at once:
+        with DownloadSession(
+            n_downloads=4, max_connections_per_host=2
+        ) as download_session:
+            _, md5 = download_file(
+                file_url=self.file_url,
+                download_filepath=download_filepath,
+                download_session=download_session,
+                n_segments=4,
+                min_segment_size=1024,
+            )
+
+        self.assertEqual(self.md5, md5)
+        self.assertEqual(self.file_contents, download_filepath.read_bytes())
+        self.assertEqual(4, len(self.server.requested_ranges))
+
+    def test_retry_after_dropped_connection(self) -> None:
+        self.server.failing_responses = 1
+
+        download_path, ok = download_replaypack(
+            destination_dir=self.output_path,
+            replaypack_name="dropped",
+            replaypack_url=self.file_url,
+            replaypack_md5=self.md5,
+            max_retries=1,
+            retry_backoff=0,
+        )
+
+        self.assertTrue(ok)
+        self.assertEqual(self.file_contents, download_path.read_bytes())
+
+        # The retry should resume the download instead of starting over:
+        self.assertEqual(2, len(self.server.requested_ranges))
+        self.assertIsNotNone(self.server.requested_ranges[-1])
+
+    def test_resume_segmented_download(self) -> None:
+        download_filepath = Path(self.output_path, "segmented_dropped.zip")
+        download_arguments = {
+            "file_url": self.file_url,
+            "download_filepath": download_filepath,
+            "n_segments": 4,
+            "min_segment_size": 1024,
+        }
+
+        self.server.failing_responses = 1
+        with self.assertRaises(requests.RequestException):
+            download_file(**download_arguments)
+        self.assertTrue(get_segments_path(download_filepath=download_filepath).exists())
+
+        # Only the interrupted segment should be downloaded again:
+        _, md5 = download_file(**download_arguments)
+        self.assertEqual(self.md5, md5)
+        self.assertEqual(self.file_contents, download_filepath.read_bytes())
+        self.assertEqual(5, len(self.server.requested_ranges))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+        dir_test_cleanup(
+            script_name=cls.SCRIPT_NAME,
+            delete_script_test_dir_bool=DELETE_SCRIPT_TEST_DIR,
+            delete_script_test_input_bool=DELETE_SCRIPT_TEST_INPUT_DIR,
+            delete_script_test_output_bool=DELETE_SCRIPT_TEST_OUTPUT_DIR,
+        )
+
+
+class UnpackZipfileTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.SCRIPT_NAME = "unpack_zipfile"
+
+        cls.input_path = create_script_test_input_dir(script_name=cls.SCRIPT_NAME)
+        cls.output_path = create_script_test_output_dir(script_name=cls.SCRIPT_NAME)
+
+        # Members of different sizes in nested directories:
+        cls.members = {
+            f"dir_{i % 3}/nested/replay_{i}.SC2Replay": bytes([i]) * (1000 * (i + 1))
+            for i in range(12)
+        }
+        cls.zip_path = Path(cls.input_path, "replaypack.zip")
+        with zipfile.ZipFile(cls.zip_path, "w") as zip_file:
+            for filename, data in cls.members.items():
+                zip_file.writestr(filename, data)
+
+    def test_split_members_by_size(self) -> None:
+        zip_infos = []
+        for i in range(1, 9):
+            zip_info = zipfile.ZipInfo(f"replay_{i}.SC2Replay")
+            zip_info.compress_size = i
+            zip_infos.append(zip_info)
+
+        chunks = split_members_by_size(zip_infos=zip_infos, n_chunks=2)
+
+        self.assertEqual(2, len(chunks))
+        self.assertEqual(
+            [18, 18], [sum(info.compress_size for info in chunk) for chunk in chunks]
+        )
+
+    def test_unpack_zipfile(self) -> None:
+        path_to_extract = unpack_zipfile(
+            destination_dir=self.output_path,
+            destination_subdir=Path("replaypack"),
+            zip_path=self.zip_path,
+            n_workers=2,
+        )
+
+        for filename, data in self.members.items():
+            self.assertEqual(data, Path(path_to_extract, filename).read_bytes())
+
+    def test_unpack_zipfile_flattened(self) -> None:
+        # The replays unpacked and then flattened are the reference:
+        reference_input = Path(self.output_path, "reference_input")
+        reference_output = Path(self.output_path, "reference_output")
+        reference_output.mkdir(exist_ok=True)
+        unpack_zipfile(
+            destination_dir=reference_input,
+            destination_subdir=Path("replaypack"),
+            zip_path=self.zip_path,
+            n_workers=1,
+        )
+        multiple_directory_flattener(
+            input_path=reference_input,
+            output_path=reference_output,
+            file_extension=".SC2Replay",
+            n_threads=1,
+            force_overwrite=True,
+        )
+
+        flattened_path = unpack_zipfile(
+            destination_dir=Path(self.output_path, "flattened"),
+            destination_subdir=Path("replaypack"),
+            zip_path=self.zip_path,
+            n_workers=2,
+            flatten_extension=".SC2Replay",
+        )
+
+        reference_path = Path(reference_output, "replaypack")
+        self.assertEqual(
+            sorted(file.name for file in reference_path.iterdir()),
+            sorted(file.name for file in flattened_path.iterdir()),
+        )
+        for file in reference_path.glob("*.SC2Replay"):
+            self.assertEqual(
+                file.read_bytes(), Path(flattened_path, file.name).read_bytes()
+            )
+        with (
+            Path(reference_path, "processed_mapping.json").open() as reference_file,
+            Path(flattened_path, "processed_mapping.json").open() as flattened_file,
+        ):
+            self.assertEqual(json.load(reference_file), json.load(flattened_file))
+
+    def test_unpack_zipfile_corrupted_member(self) -> None:
+        # Changing the stored data of a member makes its CRC check fail:
+        corrupted_path = Path(self.input_path, "corrupted.zip")
+        corrupted_name = "dir_0/nested/replay_3.SC2Replay"
+        with zipfile.ZipFile(self.zip_path, "r") as zip_file:
+            data_offset = zip_file.getinfo(corrupted_name).header_offset + 30
+            data_offset += len(corrupted_name)
+        archive = bytearray(self.zip_path.read_bytes())
+        archive[data_offset] ^= 0xFF
+        corrupted_path.write_bytes(archive)
+
+        with self.assertRaises(UnpackFailed):
+            unpack_zipfile(
+                destination_dir=self.output_path,
+                destination_subdir=Path("corrupted"),
+                zip_path=corrupted_path,
+                n_workers=2,
+            )
+
+        # The other members should still be extracted:
+        for filename, data in self.members.items():
+            if filename == corrupted_name:
+                continue
+            self.assertEqual(
+                data, Path(self.output_path, "corrupted", filename).read_bytes()
+            )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        dir_test_cleanup(
+            script_name=cls.SCRIPT_NAME,
+            delete_script_test_dir_bool=DELETE_SCRIPT_TEST_DIR,
+            delete_script_test_input_bool=DELETE_SCRIPT_TEST_INPUT_DIR,
+            delete_script_test_output_bool=DELETE_SCRIPT_TEST_OUTPUT_DIR,
+        )
+
+
+class StreamUnpackTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.SCRIPT_NAME = "stream_unpack"
+
+        cls.input_path = create_script_test_input_dir(script_name=cls.SCRIPT_NAME)
+        cls.output_path = create_script_test_output_dir(script_name=cls.SCRIPT_NAME)
+
+        cls.members = {
+            f"dir_{i % 2}/replay_{i}.SC2Replay": bytes([i]) * (5000 * i)
+            for i in range(6)
+        }
+        cls.zip_path = Path(cls.input_path, "replaypack.zip")
+        with zipfile.ZipFile(cls.zip_path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+            for filename, data in cls.members.items():
+                z.writestr(filename, data)
+        cls.md5 = get_md5(file=cls.zip_path)
+
+        cls.server, cls.base_url = start_test_file_server(directory=cls.input_path)
+
+    def test_streaming_zip_extractor(self) -> None:
+        # Archives written to a stream have data descriptors after the members:
+        with tempfile.TemporaryFile() as stream:
+            with zipfile.ZipFile(
+                UnseekableWriter(stream), "w", compression=zipfile.ZIP_DEFLATED
+            ) as zip_file:
+                for filename, data in self.members.items():
+                    zip_file.writestr(filename, data)
+            stream.seek(0)
+            streamed_archive = stream.read()
+
+        for name, archive in (
+            ("seekable", self.zip_path.read_bytes()),
+            ("streamed", streamed_archive),
+        ):
+            with self.subTest(archive=name):
+                extract_path = Path(self.output_path, f"extractor_{name}")
+                extractor = StreamingZipExtractor(destination_path=extract_path)
+                for i in range(0, len(archive), 1000):
+                    extractor.feed(data=archive[i : i + 1000])
+                extractor.close()
+
+                for filename, data in self.members.items():
+                    self.assertEqual(data, Path(extract_path, filename).read_bytes())
+
+    def test_stream_replaypack(self) -> None:
+        extract_path, ok = stream_replaypack(
+            destination_dir=self.output_path,
+            replaypack_name="replaypack",
+            replaypack_url=f"{self.base_url}/replaypack.zip",
+            replaypack_md5=self.md5,
+        )
+
+        self.assertTrue(ok)
+        for filename, data in self.members.items():
+            self.assertEqual(data, Path(extract_path, filename).read_bytes())
+        self.assertEqual(self.md5, read_md5_sidecar(file=extract_path))
+
+    def test_stream_replaypack_wrong_md5(self) -> None:
+        extract_path, ok = stream_replaypack(
+            destination_dir=self.output_path,
+            replaypack_name="replaypack_wrong_md5",
+            replaypack_url=f"{self.base_url}/replaypack.zip",
+            replaypack_md5="0" * 32,
+            max_retries=0,
+        )
+
+        # Nothing should be left of the extracted files:
+        self.assertFalse(ok)
+        self.assertFalse(extract_path.exists())
+        self.assertEqual([], list(self.output_path.glob(".replaypack_wrong_md5*")))
+
+    def test_stream_unpack_fallback(self) -> None:
+        # Stored members written to a stream have data descriptors,
+        # so their size is not known when they are extracted from a stream:
+        archive_path = Path(self.input_path, "replaypack_stored.zip")
+        with archive_path.open("wb") as archive_file:
+            with zipfile.ZipFile(
+                UnseekableWriter(archive_file), "w", compression=zipfile.ZIP_STORED
+            ) as zip_file:
+                for filename, data in self.members.items():
+                    zip_file.writestr(filename, data)
+        replaypack_url = f"{self.base_url}/replaypack_stored.zip"
+        archive_md5 = get_md5(file=archive_path)
+
+        with self.assertRaises(UnsupportedStreamError):
+            stream_replaypack(
+                destination_dir=self.output_path,
+                replaypack_name="replaypack_stored",
+                replaypack_url=replaypack_url,
+                replaypack_md5=archive_md5,
+            )
+        self.assertEqual([], list(self.output_path.glob(".replaypack_stored*")))
+
+        # The pipeline downloads the archive and unpacks it instead:
+        download_path = Path(self.output_path, "fallback_downloads")
+        download_path.mkdir(exist_ok=True)
+        unpack_path = Path(self.output_path, "fallback_unpacked")
+        with DownloadSession() as download_session:
+            failed_replaypacks = ReplaypackPipeline(
+                download_path=download_path,
+                unpack_path=unpack_path,
+                n_workers=1,
+                download_session=download_session,
+                stream_unpack=True,
+            ).run(replaypack_list=[("replaypack_stored", replaypack_url, archive_md5)])
+
+        self.assertEqual([], failed_replaypacks)
+        for filename, data in self.members.items():
+            self.assertEqual(
+                data, Path(unpack_path, "replaypack_stored", filename).read_bytes()
+            )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+        dir_test_cleanup(
+            script_name=cls.SCRIPT_NAME,
+            delete_script_test_dir_bool=DELETE_SCRIPT_TEST_DIR,
+            delete_script_test_input_bool=DELETE_SCRIPT_TEST_INPUT_DIR,
+            delete_script_test_output_bool=DELETE_SCRIPT_TEST_OUTPUT_DIR,
+        )
@@ -1,6 +1,13 @@
+import io
 import json
 import logging
 import shutil
+import stat
+import sys
+import threading
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
 from tests.test_settings import TEST_DIR_NAME, TEST_FILES_NAME, TEST_WORKSPACE
@@ -366,3 +373,169 @@ def dir_test_cleanup(
     if delete_script_test_output_bool:
         logging.info(f"{delete_script_test_output_bool=}, deleting script test output.")
         delete_script_test_output(script_name=script_name)
+
+
+class TestFileRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serves the test files and records the requested paths and ranges on the server.
+    Supports single byte range requests if server.accept_ranges is set, and drops
+    the connection in the middle of the response for the next
+    server.failing_responses responses.
+    """
+
+    def do_GET(self) -> None:
+        self.server.requested_paths.append(self.path)
+        self.server.requested_ranges.append(self.headers.get("Range"))
+        super().do_GET()
+
+    def send_head(self) -> io.BytesIO | None:
+        file_path = Path(self.translate_path(self.path))
+        if not file_path.is_file():
+            return super().send_head()
+
+        data = file_path.read_bytes()
+        start, end = 0, len(data)
+        status = HTTPStatus.OK
+
+        range_header = self.headers.get("Range")
+        if range_header and self.server.accept_ranges:
+            first, _, last = range_header.removeprefix("bytes=").partition("-")
+            start = int(first)
+            end = min(int(last) + 1, len(data)) if last else len(data)
+            if start >= len(data):
+                self.send_error(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                return None
+            status = HTTPStatus.PARTIAL_CONTENT
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start))
+        if self.server.accept_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == HTTPStatus.PARTIAL_CONTENT:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+        self.end_headers()
+
+        body = data[start:end]
+        if self.command == "GET" and self.server.failing_responses > 0:
+            self.server.failing_responses -= 1
+            body = body[: len(body) // 2]
+            self.close_connection = True
+
+        return io.BytesIO(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logging.debug(format % args)
+
+
+def start_test_file_server(directory: Path) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Starts a local HTTP server that serves the files of a directory,
+    used as a stand-in for the remote servers in the download tests.
+
+    Parameters
+    ----------
+    directory : Path
+        Directory whose files will be served.
+
+    Returns
+    -------
+    tuple[ThreadingHTTPServer, str]
+        Returns the running server and its base url. The server should be
+        stopped with shutdown() and server_close().
+    """
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0),
+        partial(TestFileRequestHandler, directory=str(directory)),
+    )
+    server.requested_paths = []
+    server.requested_ranges = []
+    server.accept_ranges = True
+    server.failing_responses = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
+
+
+FAKE_SC2INFOEXTRACTORGO = """
+import json
+import os
+import sys
+import zipfile
+from pathlib import Path
+
+arguments = dict(
+    argument.lstrip("-").split("=", 1)
+    for argument in sys.argv[1:]
+    if "=" in argument
+)
+input_path = Path(arguments["input"])
+output_path = Path(arguments["output"])
+
+if "crash" in input_path.name:
+    print(f"Cannot process {input_path.name}", file=sys.stderr)
+    sys.exit(2)
+
+replays = sorted(input_path.glob("*.SC2Replay"))
+processed = [str(replay) for replay in replays if "corrupt" not in replay.name]
+failed = [str(replay) for replay in replays if "corrupt" in replay.name]
+
+for index in range(1, len(replays) + 1):
+    print(
+        f"\\rProcessing replays: {index}/{len(replays)}",
+        end="",
+        file=sys.stderr,
+        flush=True,
+    )
+print(file=sys.stderr)
+
+output_path.mkdir(parents=True, exist_ok=True)
+with zipfile.ZipFile(Path(output_path, "package_0.zip"), "w") as zip_file:
+    for replay in processed:
+        zip_file.writestr(
+            Path(replay).stem + ".json", json.dumps({"replay": Path(replay).name})
+        )
+summary = {"Replays": len(processed), "Failed": len(failed)}
+if os.environ.get("FAKE_SC2INFOEXTRACTORGO_AVERAGE"):
+    # Averages cannot be merged by summing the shards:
+    summary["AverageReplays"] = len(processed) / 2
+Path(output_path, "package_summary.json").write_text(json.dumps({"Summary": summary}))
+Path(output_path, "processed_failed.log").write_text(
+    json.dumps(
+        {
+            "processedFiles": {replay: True for replay in processed},
+            "failedToProcess": {replay: "corrupted" for replay in failed},
+        }
+    )
+)
+Path(output_path, "main_log.log").write_text(f"Processed {len(processed)} replays")
+print(f"Processed {len(processed)} replays with max_procs={arguments['max_procs']}")
+"""
+
+
+def create_fake_sc2infoextractorgo(directory: Path) -> Path:
+    """
+    Creates an executable that stands in for SC2InfoExtractorGo in the tests.
+    It writes a data package, a package summary and the processed_failed log for
+    the .SC2Replay files of the input directory. Replays with "corrupt" in their
+    name fail to process, input directories with "crash" in their name make
+    the executable exit with an error.
+
+    Parameters
+    ----------
+    directory : Path
+        Directory in which the executable will be created.
+
+    Returns
+    -------
+    Path
+        Returns the path to the executable.
+    """
+
+    executable_path = Path(directory, "SC2InfoExtractorGo")
+    executable_path.write_text(f"#!{sys.executable}\n{FAKE_SC2INFOEXTRACTORGO}")
+    executable_path.chmod(executable_path.stat().st_mode | stat.S_IEXEC)
+
+    return executable_path